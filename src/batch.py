@@ -0,0 +1,283 @@
+#
+# batch.py
+# 화면 없이 분석 결과를 파일로 만드는 명령행 배치입니다. cron 등으로 매일 리포트를 만들 때 사용합니다.
+# streamlit을 import하지 않으므로 빠르게 시작하며, 화면이 없는 서버에서도 실행됩니다.
+# - db: 앱과 같은 로컬 DB(db_config.DB_PATH, 환경 변수 SJ_DB_PATH)를 Stage별로 분석합니다. 분석 경로 선택은 탭과 같습니다.
+# - csv: 검사 장비 CSV 내보내기 파일을 조각 단위로 읽으면서 분석합니다.
+# 결과는 두 개의 표로 씁니다.
+# - summary: Stage/지그/날짜별 테스트 수, PASS, 가성불량, 진성불량, FAIL, 합격률(%)
+# - serials: Stage/지그별 시리얼 목록 (목록 이름, SNumber)
+# 형식은 csv(엑셀용 BOM 포함), json(레코드 목록), parquet(pyarrow 필요) 중에서 여러 개를 고를 수 있습니다.
+#
+# 사용 예:
+#   python -m src.batch db --days 1 --out reports/2024-03-02
+#   python -m src.batch db --stages fw rftx --jigs Fw_PC1 --start 2024-03-01 --end 2024-03-07 --format csv parquet
+#   python -m src.batch csv Fw exports/fw.csv --out reports/fw
+
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+
+from src.db.cache_utils import HAS_PYARROW
+from src.db.catalog_utils import get_stage_catalog, catalog_jigs, catalog_date_bounds, estimate_catalog_rows
+from src.db.db_config import DB_PATH
+from src.db.index_utils import needs_indexing, ensure_indexes
+from src.db.query_utils import get_table_columns
+from src.services.analysis_service import AnalysisResult
+from src.services.csv_service import analyze_stage_csv_stream
+from src.services.report_export import REPORT_METRICS, SERIAL_LIST_LABELS
+from src.services.stage_analysis import run_stage_analysis, analyze_stages_parallel
+from src.services.stage_registry import TAB_STAGES, get_stage_spec
+from src.utils.instrumentation import Trace, span
+
+OUTPUT_FORMATS = ['csv', 'json', 'parquet']
+SUMMARY_COLUMNS = ['stage', 'jig', 'date'] + [key for _, key in REPORT_METRICS] + ['pass_rate']
+SERIAL_COLUMNS = ['stage', 'jig', 'list', 'SNumber']
+
+def _log(message):
+    print(message, file=sys.stderr)
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"날짜는 YYYY-MM-DD 형식이어야 합니다: {value}")
+
+def _tab_key(stage):
+    """탭 키나 Stage 이름('Fw', 'fw')을 탭 키로 바꿉니다."""
+    stage_name = get_stage_spec(stage)['stage']
+    return next(key for key, name in TAB_STAGES.items() if name == stage_name)
+
+def _date_range(args, bounds=(None, None)):
+    """명령행의 날짜 조건을 (시작, 끝)으로 정합니다. 지정하지 않은 쪽은 bounds를 씁니다."""
+    if args.days is not None:
+        end_date = args.end or date.today()
+        return end_date - timedelta(days=args.days - 1), end_date
+    return args.start or bounds[0], args.end or bounds[1]
+
+def summary_rows(stage, result, jigs=None, start_date=None, end_date=None):
+    """
+    AnalysisResult의 요약을 Stage/지그/날짜 한 행씩 돌려줍니다.
+    Args:
+        jigs (set | None): 남길 지그 (문자열). None이면 모든 지그.
+        start_date, end_date (date | None): 남길 날짜 구간 (양 끝 포함).
+    """
+    for jig in sorted(result.summary, key=str):
+        if jigs is not None and str(jig) not in jigs:
+            continue
+        for day, point in sorted(result.summary[jig].items()):
+            day_date = date.fromisoformat(day)
+            if (start_date and day_date < start_date) or (end_date and day_date > end_date):
+                continue
+            total = point['total_test']
+            yield [stage, jig, day] + [point[key] for _, key in REPORT_METRICS] + \
+                [round(100 * point['pass'] / total, 1) if total else 0.0]
+
+def serial_rows(stage, result, jigs=None):
+    """AnalysisResult의 시리얼 목록을 Stage/지그/목록 이름/SNumber 한 행씩 돌려줍니다."""
+    for jig in sorted(result.serials or {}, key=str):
+        if jigs is not None and str(jig) not in jigs:
+            continue
+        for _, key in SERIAL_LIST_LABELS:
+            for s_number in result.serials[jig].get(key, []):
+                yield [stage, jig, key, s_number]
+
+def _csv_serials(summary, start_date=None, end_date=None):
+    """
+    CSV 분석 결과에는 날짜별 가성불량 시리얼만 있으므로, 기간 안의 가성불량 목록만 만듭니다 (처음 나온 순서).
+    Returns:
+        dict: {jig: {'false_defect': [...]}}
+    """
+    serials = {}
+    for jig, days in summary.items():
+        seen = {}
+        for day, point in sorted(days.items()):
+            day_date = date.fromisoformat(day)
+            if (start_date and day_date < start_date) or (end_date and day_date > end_date):
+                continue
+            seen.update(dict.fromkeys(point['false_defect_sns']))
+        serials[jig] = {'false_defect': list(seen)}
+    return serials
+
+def write_table(rows, columns, out_dir, name, formats):
+    """
+    표 하나를 고른 형식마다 '<out_dir>/<name>.<형식>'으로 씁니다.
+    Returns:
+        list: 쓴 파일 경로.
+    """
+    df = pd.DataFrame(rows, columns=columns)
+    # Pcb처럼 숫자 지그와 문자열 지그가 섞여도 한 컬럼에 쓸 수 있도록 문자열로 맞춥니다.
+    df['jig'] = df['jig'].astype(str)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        if fmt == 'csv':
+            df.to_csv(path, index=False, encoding='utf-8-sig')
+        elif fmt == 'json':
+            df.to_json(path, orient='records', force_ascii=False, indent=1)
+        else:
+            df.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+def open_database(db_path):
+    """
+    배치용 SQLite 연결을 엽니다. 앱과 달리 파일을 내려받지 않으며, 인덱스가 없으면 한 번 만들어 둡니다.
+    Returns:
+        sqlite3.Connection
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"DB 파일이 없습니다: {db_path} (앱을 한 번 실행하거나 SJ_DB_PATH를 지정하세요)")
+    conn = sqlite3.connect(db_path)
+    try:
+        if needs_indexing(conn):
+            _log("조회 속도 향상을 위한 인덱스를 생성합니다. (파일당 최초 1회)")
+            with span('build_indexes'):
+                ensure_indexes(conn)
+    except sqlite3.Error as e:
+        _log(f"인덱스 생성에 실패했습니다. 인덱스 없이 계속합니다: {e}")
+    return conn
+
+def run_db(args):
+    """DB의 Stage들을 분석해 (summary 행, serials 행, 실패한 Stage 수)를 돌려줍니다."""
+    conn = open_database(args.db)
+    table_columns = get_table_columns(conn)
+    jobs = {}
+    for stage in args.stages or list(TAB_STAGES):
+        tab_key = _tab_key(stage)
+        spec = get_stage_spec(tab_key)
+        if spec['date_col'] not in table_columns:
+            _log(f"[{tab_key}] 날짜 컬럼 '{spec['date_col']}'을 찾을 수 없어 건너뜁니다.")
+            continue
+        jig_col = spec['db_jig_col'] if spec['db_jig_col'] in table_columns else 'SNumber'
+        catalog = get_stage_catalog(conn, tab_key, jig_col)
+        start_date, end_date = _date_range(args, catalog_date_bounds(catalog))
+        if start_date is None:
+            _log(f"[{tab_key}] 날짜가 있는 데이터가 없어 건너뜁니다.")
+            continue
+        jig = None
+        if args.jigs and len(args.jigs) == 1:
+            # 지그가 하나면 분석 단계에서 거릅니다. Pcb처럼 숫자 지그는 카탈로그의 값(타입)으로 바꿔 넘깁니다.
+            jig = {str(value): value for value in catalog_jigs(catalog)}.get(args.jigs[0], args.jigs[0])
+        jobs[tab_key] = dict(stage=tab_key, date_col=f"{spec['date_col']}_dt", jig_col=jig_col,
+                             start_date=start_date, end_date=end_date, jig=jig, mode=args.mode,
+                             estimated_rows=estimate_catalog_rows(catalog, start_date, end_date, jig))
+
+    if args.parallel and len(jobs) > 1:
+        conn.close()
+        outcomes = analyze_stages_parallel(args.db, jobs)
+    else:
+        outcomes = {}
+        for tab_key, job in jobs.items():
+            try:
+                with span(f"analyze {tab_key}"):
+                    outcomes[tab_key] = run_stage_analysis(conn, **job)
+            except Exception as e:
+                outcomes[tab_key] = e
+        conn.close()
+
+    # 지그가 여럿이면 모든 지그를 분석한 뒤 결과에서 거릅니다.
+    jigs = set(args.jigs) if args.jigs and len(args.jigs) > 1 else None
+    summary, serials, failed = [], [], 0
+    for tab_key, outcome in outcomes.items():
+        job = jobs[tab_key]
+        if isinstance(outcome, Exception):
+            _log(f"[{tab_key}] 분석 중 오류가 발생했습니다: {outcome}")
+            failed += 1
+            continue
+        for message in outcome.warnings:
+            _log(f"[{tab_key}] {message}")
+        stage_summary = list(summary_rows(tab_key, outcome.result, jigs))
+        summary.extend(stage_summary)
+        serials.extend(serial_rows(tab_key, outcome.result, jigs))
+        _log(f"[{tab_key}] {job['start_date']} ~ {job['end_date']}: {len(stage_summary)}행 ({outcome.source})")
+    return summary, serials, failed
+
+def run_csv(args):
+    """CSV 파일들을 분석해 (summary 행, serials 행, 실패한 파일 수)를 돌려줍니다."""
+    spec = get_stage_spec(args.stage)
+    stage = _tab_key(args.stage)
+    start_date, end_date = _date_range(args)
+    jigs = set(args.jigs) if args.jigs else None
+    summary, serials, failed = [], [], 0
+    for path in args.files:
+        try:
+            with span(f"analyze {os.path.basename(path)}"):
+                analysis = analyze_stage_csv_stream(path, spec['stage'])
+        except Exception as e:
+            _log(f"[{path}] 분석 중 오류가 발생했습니다: {e}")
+            failed += 1
+            continue
+        if analysis is None:
+            _log(f"[{path}] 헤더를 찾을 수 없습니다.")
+            failed += 1
+            continue
+        summary_data, all_dates = analysis
+        result = AnalysisResult(summary_data, all_dates, None, _csv_serials(summary_data, start_date, end_date))
+        file_summary = list(summary_rows(stage, result, jigs, start_date, end_date))
+        summary.extend(file_summary)
+        serials.extend(serial_rows(stage, result, jigs))
+        _log(f"[{path}] {len(file_summary)}행")
+    return summary, serials, failed
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src.batch',
+                                     description="화면 없이 분석 결과(요약 표, 시리얼 목록)를 파일로 씁니다.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--jigs', nargs='+', help="결과에 남길 지그 (기본: 모든 지그)")
+    common.add_argument('--start', type=_parse_date, help="시작 날짜 YYYY-MM-DD (포함)")
+    common.add_argument('--end', type=_parse_date, help="끝 날짜 YYYY-MM-DD (포함)")
+    common.add_argument('--days', type=int, help="끝 날짜(기본: 오늘)까지 최근 N일. --start보다 우선합니다.")
+    common.add_argument('--out', default='.', help="결과 파일을 쓸 폴더 (기본: 현재 폴더)")
+    common.add_argument('--format', nargs='+', choices=OUTPUT_FORMATS, default=['csv'], dest='formats',
+                        help="출력 형식 (여러 개 가능, 기본: csv)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    db_parser = subparsers.add_parser('db', parents=[common], help="로컬 DB의 Stage들을 분석합니다.")
+    db_parser.add_argument('--db', default=DB_PATH, help=f"SQLite 파일 경로 (기본: {DB_PATH}, 환경 변수 SJ_DB_PATH)")
+    db_parser.add_argument('--stages', nargs='+', help=f"분석할 Stage (탭 키 또는 Stage 이름, 기본: {' '.join(TAB_STAGES)})")
+    db_parser.add_argument('--mode', choices=['auto', 'pandas', 'sql'], default='auto',
+                           help="분석 방식 (기본: auto, 일일 집계 → SQL 집계 → 메모리 순서로 선택)")
+    db_parser.add_argument('--parallel', action='store_true', help="Stage마다 작업 프로세스 하나로 동시에 분석합니다.")
+
+    csv_parser = subparsers.add_parser('csv', parents=[common], help="검사 장비 CSV 내보내기 파일을 분석합니다.")
+    csv_parser.add_argument('stage', help="파일의 Stage (예: Fw, RfTx, SemiAssy, Batadc, Pcb)")
+    csv_parser.add_argument('files', nargs='+', help="CSV 파일 경로")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if 'parquet' in args.formats and not HAS_PYARROW:
+        parser.error("parquet 형식에는 pyarrow가 필요합니다.")
+    if args.days is not None and args.days < 1:
+        parser.error("--days는 1 이상이어야 합니다.")
+    try:
+        if args.command == 'csv':
+            get_stage_spec(args.stage)
+        else:
+            for stage in args.stages or []:
+                get_stage_spec(stage)
+    except KeyError as e:
+        parser.error(e.args[0])
+
+    with Trace(f"배치 {args.command}"):
+        try:
+            summary, serials, failed = run_db(args) if args.command == 'db' else run_csv(args)
+        except (OSError, sqlite3.Error) as e:
+            _log(f"오류: {e}")
+            return 2
+        os.makedirs(args.out, exist_ok=True)
+        with span('write_outputs'):
+            paths = write_table(summary, SUMMARY_COLUMNS, args.out, 'summary', args.formats)
+            paths += write_table(serials, SERIAL_COLUMNS, args.out, 'serials', args.formats)
+    for path in paths:
+        print(path)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
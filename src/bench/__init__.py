@@ -0,0 +1,2 @@
+# 이 파일은 src/bench 디렉토리를 파이썬 패키지로 만들어줍니다.
+# 성능 측정용 가상 데이터 생성기와 벤치마크가 들어 있습니다.
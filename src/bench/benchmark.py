@@ -0,0 +1,276 @@
+#
+# benchmark.py
+# 가상 데이터(synthetic.py)로 분석 경로의 단계별 시간과 최대 메모리를 측정합니다.
+# - DB: 조회(load) → 날짜 변환(parse) → 정리(clean) → 분석(analyze) → 화면 준비(render_prep) → 내보내기(export),
+#   SQL 집계(analyze_sql), 롤업(rollup_build/analyze_rollup), pyarrow가 있으면 컬럼형 캐시(cache_build/load_cache)
+# - CSV: 읽기(load) → 정리(clean) → 날짜 변환(parse), 전체 분석(analyze), 조각 단위 분석(analyze_stream)
+# 결과는 JSON Lines 파일에 한 줄씩 쌓이며, 실행할 때마다 직전 실행과 비교한 배율을 함께 출력합니다.
+# 최대 메모리(peak_mb)는 단계 실행 중 프로세스 RSS가 시작 시점보다 가장 많이 늘어난 양입니다.
+# SQLite/pyarrow 내부 할당까지 포함되며, /proc가 없는 OS에서는 기록하지 않습니다.
+#
+# 사용 예: python -m src.bench.benchmark --rows 100k 1m --stages fw semi
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from src.bench.synthetic import parse_rows, write_history_db, write_stage_csv
+from src.db.aggregate_utils import analyze_stage_sql
+from src.db.cache_utils import HAS_PYARROW, build_history_cache, open_history_cache, read_stage_frame, date_cache_column
+from src.db.query_utils import get_stage_columns, query_stage_data
+from src.db.rollup_utils import rollup_path_for, refresh_rollup, load_rollup_analysis
+from src.services.analysis_service import analyze_data
+from src.services.csv_service import (read_csv_with_dynamic_header_for_stage, clean_string_frame, analyze_stage_data,
+                                      analyze_stage_csv_stream)
+from src.services.report_export import report_table, export_report_bundle
+from src.services.stage_registry import TAB_STAGES, get_stage_spec
+from src.services.stage_schema import (parse_stage_timestamps, apply_measurement_dtypes, compact_stage_frame,
+                                       resolve_timestamp_format, parse_timestamps)
+
+RESULTS_PATH = 'bench_results.jsonl'
+WORK_DIR = 'bench_data'
+
+def _source_version():
+    """측정한 코드의 git 커밋. git 저장소가 아니면 None."""
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def _row_count(value):
+    return len(value) if isinstance(value, pd.DataFrame) else None
+
+STATM_PATH = '/proc/self/statm'
+# RSS를 읽는 간격(초)
+RSS_SAMPLE_INTERVAL = 0.002
+
+def _current_rss():
+    with open(STATM_PATH, 'rb') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+class PeakRss:
+    """with 블록 안에서 RSS를 주기적으로 읽어 시작 시점 대비 최대 증가량(peak_bytes)을 구합니다."""
+
+    def __init__(self):
+        self.enabled = os.path.exists(STATM_PATH)
+        self.peak_bytes = None
+        self._stop = threading.Event()
+
+    def _sample(self, start):
+        peak = start
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            peak = max(peak, _current_rss())
+        self.peak_bytes = max(peak, _current_rss()) - start
+
+    def __enter__(self):
+        if self.enabled:
+            self._thread = threading.Thread(target=self._sample, args=(_current_rss(),), daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            self._stop.set()
+            self._thread.join()
+        return False
+
+class StepRecorder:
+    """단계 하나를 실행하면서 시간과 최대 메모리를 재고 기록을 모읍니다."""
+
+    def __init__(self, base, track_memory=True):
+        self.base = base
+        self.track_memory = track_memory
+        self.records = []
+
+    def run(self, source, stage, step, fn):
+        probe = PeakRss() if self.track_memory else None
+        started = time.perf_counter()
+        if probe is not None:
+            with probe:
+                value = fn()
+        else:
+            value = fn()
+        seconds = time.perf_counter() - started
+        peak = probe.peak_bytes if probe is not None else None
+        record = dict(self.base, source=source, stage=stage, step=step, seconds=round(seconds, 4),
+                      peak_mb=round(peak / 2 ** 20, 1) if peak is not None else None, out_rows=_row_count(value))
+        self.records.append(record)
+        print(f"  {source:<3} {stage:<8} {step:<14} {seconds:9.3f}s"
+              + (f" {record['peak_mb']:9.1f}MB" if peak is not None else ""))
+        return value
+
+def _render_prep(result):
+    """display_analysis_result()가 화면에 그리기 전에 만드는 표와 그래프 데이터."""
+    tables = {jig: report_table(result, jig) for jig in sorted(result.summary)}
+    charts = [table.set_index('지표').T[['총 테스트 수', 'PASS', 'FAIL']] for table in tables.values()]
+    return tables, charts
+
+def bench_db_stage(recorder, conn, stage):
+    spec = get_stage_spec(stage)
+    date_col = date_cache_column(spec['date_col'])
+    jig_col = spec['db_jig_col']
+    columns = get_stage_columns(conn, stage)
+
+    df = recorder.run('db', stage, 'load', lambda: query_stage_data(conn, stage, columns))
+
+    def parse():
+        df[date_col] = parse_stage_timestamps(df[spec['date_col']], stage, source='db')
+        return df
+    recorder.run('db', stage, 'parse', parse)
+
+    def clean():
+        apply_measurement_dtypes(df, stage)
+        valid = df[df[date_col].notna()].copy()
+        compact_stage_frame(valid, stage, [jig_col])
+        return valid
+    valid = recorder.run('db', stage, 'clean', clean)
+
+    result = recorder.run('db', stage, 'analyze', lambda: analyze_data(valid, date_col, jig_col, spec['pass_col']))
+    recorder.run('db', stage, 'render_prep', lambda: _render_prep(result))
+    recorder.run('db', stage, 'export', lambda: export_report_bundle(result))
+    recorder.run('db', stage, 'analyze_sql', lambda: analyze_stage_sql(conn, stage))
+
+    if result.dates:
+        start_date, end_date = result.dates[0], result.dates[-1]
+        recorder.run('db', stage, 'rollup_build', lambda: refresh_rollup(conn, stage))
+        recorder.run('db', stage, 'analyze_rollup', lambda: load_rollup_analysis(conn, stage, start_date, end_date))
+
+def bench_cache(recorder, db_path, stages):
+    table = recorder.run('db', '*', 'cache_build', lambda: (build_history_cache(db_path), open_history_cache(db_path))[1])
+    for stage in stages:
+        spec = get_stage_spec(stage)
+        columns = [col for col in ['SNumber', spec['date_col'], spec['pass_col'], spec['db_jig_col'],
+                                   date_cache_column(spec['date_col'])] if col in table.schema.names]
+        recorder.run('db', stage, 'load_cache', lambda: read_stage_frame(table, stage, columns))
+
+def bench_csv_stage(recorder, csv_path, stage):
+    spec = get_stage_spec(stage)
+    df = recorder.run('csv', stage, 'load', lambda: read_csv_with_dynamic_header_for_stage(csv_path, stage))
+    if df is None:
+        print(f"  csv {stage}: 헤더를 찾지 못했습니다.")
+        return
+
+    # 정리/날짜 변환은 단계별 시간을 보기 위한 것이며, analyze는 원본에서 전체 과정을 다시 수행합니다.
+    cleaned = recorder.run('csv', stage, 'clean',
+                           lambda: clean_string_frame(df.copy(), spec['clean_columns'], spec['clean_rule']))
+
+    def parse():
+        fmt = spec['timestamp_format'] or resolve_timestamp_format(cleaned[spec['date_col']], spec)
+        return parse_timestamps(cleaned[spec['date_col']], fmt).to_frame()
+    recorder.run('csv', stage, 'parse', parse)
+
+    recorder.run('csv', stage, 'analyze', lambda: analyze_stage_data(df, stage))
+    recorder.run('csv', stage, 'analyze_stream', lambda: analyze_stage_csv_stream(csv_path, stage))
+
+def prepare_data(work_dir, rows, stages, with_csv, seed=0):
+    """측정에 쓸 DB/CSV 파일을 만듭니다. 같은 행 수와 seed의 파일이 이미 있으면 그대로 씁니다."""
+    os.makedirs(work_dir, exist_ok=True)
+    db_path = os.path.join(work_dir, f"history_{rows}_s{seed}.sqlite3")
+    if not os.path.exists(db_path):
+        print(f"DB 생성: {db_path}")
+        write_history_db(db_path + '.tmp', rows, seed)
+        os.replace(db_path + '.tmp', db_path)
+    csv_paths = {}
+    if with_csv:
+        for stage in stages:
+            path = os.path.join(work_dir, f"{stage}_{rows}_s{seed}.csv")
+            if not os.path.exists(path):
+                print(f"CSV 생성: {path}")
+                write_stage_csv(path + '.tmp', stage, rows, seed)
+                os.replace(path + '.tmp', path)
+            csv_paths[stage] = path
+    return db_path, csv_paths
+
+def run_benchmark(rows, stages, work_dir=WORK_DIR, with_csv=True, track_memory=True, seed=0):
+    """
+    행 수 하나에 대해 모든 단계를 측정합니다.
+    Returns:
+        list: 단계별 기록 (dict).
+    """
+    db_path, csv_paths = prepare_data(work_dir, rows, stages, with_csv, seed)
+    base = {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'version': _source_version(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'rows': rows,
+    }
+    recorder = StepRecorder(base, track_memory)
+    # 롤업은 처음부터 만드는 시간을 재도록 이전 실행의 파일을 지웁니다.
+    if os.path.exists(rollup_path_for(db_path)):
+        os.remove(rollup_path_for(db_path))
+    print(f"[{rows:,}행]")
+    conn = sqlite3.connect(db_path)
+    try:
+        for stage in stages:
+            bench_db_stage(recorder, conn, stage)
+    finally:
+        conn.close()
+    if HAS_PYARROW:
+        bench_cache(recorder, db_path, stages)
+    for stage, path in csv_paths.items():
+        bench_csv_stage(recorder, path, stage)
+    return recorder.records
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def append_results(path, records):
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def compare_results(previous, records):
+    """
+    이번 기록을 같은 (행 수, 원본, Stage, 단계)의 직전 기록과 비교합니다.
+    Returns:
+        pd.DataFrame: seconds/peak_mb와 직전 값, 배율(ratio = 이번 / 직전).
+    """
+    key_cols = ['rows', 'source', 'stage', 'step']
+    current = pd.DataFrame(records)
+    if not previous:
+        return current[key_cols + ['seconds', 'peak_mb']]
+    before = pd.DataFrame(previous).drop_duplicates(key_cols, keep='last')
+    merged = current.merge(before[key_cols + ['seconds', 'peak_mb', 'version']], on=key_cols, how='left',
+                           suffixes=('', '_prev'))
+    merged['ratio'] = (merged['seconds'] / merged['seconds_prev']).round(2)
+    return merged[key_cols + ['seconds', 'seconds_prev', 'ratio', 'peak_mb', 'peak_mb_prev', 'version_prev']]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="가상 데이터로 분석 단계별 시간과 최대 메모리를 측정합니다.")
+    parser.add_argument('--rows', nargs='+', default=['100k'], help="행 수 (100k, 1m, 10m 또는 숫자)")
+    parser.add_argument('--stages', nargs='+', default=list(TAB_STAGES),
+                        help="측정할 Stage 또는 탭 키 (기본: 전체)")
+    parser.add_argument('--work-dir', default=WORK_DIR, help="가상 데이터 파일을 둘 폴더")
+    parser.add_argument('--results', default=RESULTS_PATH, help="결과를 쌓을 JSON Lines 파일")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-csv', action='store_true', help="CSV 단계는 측정하지 않습니다.")
+    parser.add_argument('--no-memory', action='store_true', help="메모리는 재지 않고 시간만 측정합니다.")
+    args = parser.parse_args(argv)
+
+    stages = [get_stage_spec(stage)['stage'] for stage in args.stages]
+    previous = load_results(args.results)
+    records = []
+    for rows in args.rows:
+        records += run_benchmark(parse_rows(rows), stages, args.work_dir, not args.no_csv, not args.no_memory, args.seed)
+
+    append_results(args.results, records)
+    with pd.option_context('display.width', 200, 'display.max_rows', None):
+        print(compare_results(previous, records).to_string(index=False))
+    print(f"결과 저장: {args.results}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#
+# synthetic.py
+# 성능 측정용 가상 데이터를 만듭니다. 같은 seed로 만들면 항상 같은 파일이 나옵니다.
+# - historyinspection SQLite 파일: 모든 Stage의 날짜/지그/합격/측정값 컬럼
+# - Stage별 CSV 내보내기 파일: 앞부분 안내 행, '="..."' 래퍼, SemiAssy 헤더 공백까지 실제 파일 형태를 따릅니다.
+# 제품 하나가 여러 번 재검사되며(앞선 시도는 FAIL, 마지막 시도는 대부분 PASS) 여러 지그와 여러 날짜에 걸쳐 있습니다.
+# 행은 chunk_rows 단위로 만들어 바로 기록하므로 1,000만 행도 메모리 사용량이 일정합니다.
+#
+# 사용 예: python -m src.bench.synthetic bench/history_1m.sqlite3 --rows 1m --csv-dir bench/csv
+
+import argparse
+import csv
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from src.db.query_utils import HISTORY_TABLE, quote_identifier
+from src.services.stage_registry import STAGE_SPECS, get_stage_spec
+
+# 명령행에서 쓰는 크기 이름 → 행 수
+ROW_PRESETS = {'100k': 100000, '1m': 1000000, '10m': 10000000}
+CHUNK_ROWS = 50000
+START_DATE = '2024-03-01'
+DAYS = 30
+JIGS_PER_STAGE = 4
+MEASUREMENT_COLUMNS = 3
+# historyinspection 테이블의 날짜 형식. CSV 형식은 Stage 설정(timestamp_format)을 따릅니다.
+DB_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+CSV_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# 재검사 횟수 분포 (1회, 2회, 3회)
+ATTEMPT_WEIGHTS = [0.85, 0.12, 0.03]
+# 마지막 시도가 PASS일 확률, 앞선 시도가 FAIL일 확률
+FINAL_PASS_RATE = 0.93
+RETEST_FAIL_RATE = 0.7
+# 해당 Stage를 거치지 않은 행(날짜가 빈 행)의 비율
+SKIP_RATE = 0.03
+
+def parse_rows(value):
+    """'100k', '1m', '10m' 또는 숫자 문자열을 행 수로 바꿉니다."""
+    text = str(value).strip().lower()
+    if text in ROW_PRESETS:
+        return ROW_PRESETS[text]
+    return int(text.replace('_', '').replace(',', ''))
+
+def _jig_values(spec):
+    # Pcb는 측정값 컬럼(PcbMaxIrPwr)을 지그로 사용하므로 숫자 값을 씁니다.
+    if spec['stage'] == 'Pcb':
+        return np.array([11.5 + 0.5 * i for i in range(JIGS_PER_STAGE)])
+    return np.array([f"{spec['stage']}_PC{i + 1}" for i in range(JIGS_PER_STAGE)], dtype=object)
+
+def _measurement_names(stage):
+    return [f"{stage}Value{i + 1}" for i in range(MEASUREMENT_COLUMNS)]
+
+def _chunk_attempts(rng, n_rows, unit_offset):
+    """
+    한 조각의 행마다 (제품 번호, 마지막 시도 여부)를 정합니다. 한 제품의 재검사 행은 연달아 놓입니다.
+    제품 번호는 조각의 첫 행 위치에서 시작하므로 조각끼리 겹치지 않습니다.
+    """
+    attempts = rng.choice(len(ATTEMPT_WEIGHTS), size=n_rows, p=ATTEMPT_WEIGHTS) + 1
+    attempts = attempts[:np.searchsorted(np.cumsum(attempts), n_rows) + 1]
+    units = np.repeat(np.arange(len(attempts)), attempts)[:n_rows]
+    starts = np.repeat(np.cumsum(attempts) - attempts, attempts)[:n_rows]
+    order = np.arange(n_rows) - starts
+    is_last = order == np.repeat(attempts - 1, attempts)[:n_rows]
+    return unit_offset + units, is_last
+
+def generate_history_chunks(rows, seed=0, days=DAYS, chunk_rows=CHUNK_ROWS):
+    """
+    historyinspection 테이블 형태의 DataFrame을 chunk_rows 행씩 만듭니다.
+    시각은 행 순서대로 start부터 days일에 걸쳐 늘어나며, Stage마다 조금씩 늦게 찍힙니다.
+    Args:
+        rows (int): 전체 행 수.
+        seed (int): 난수 seed. 조각마다 (seed, 조각 번호)로 난수를 만들어 결과가 항상 같습니다.
+        days (int): 데이터가 걸쳐 있는 일수.
+        chunk_rows (int): 조각 하나의 행 수.
+    Yields:
+        pd.DataFrame: 날짜는 DB_TIMESTAMP_FORMAT 문자열, 합격 컬럼은 'O'/'X'.
+    """
+    start = pd.Timestamp(START_DATE)
+    span_seconds = days * 86400
+    for chunk_index, offset in enumerate(range(0, rows, chunk_rows)):
+        n_rows = min(chunk_rows, rows - offset)
+        rng = np.random.default_rng([seed, chunk_index])
+        units, is_last = _chunk_attempts(rng, n_rows, offset)
+
+        frame = {'SNumber': np.char.add('SN', np.char.zfill(units.astype(str), 9)).astype(object)}
+        base_seconds = (offset + np.arange(n_rows)) * span_seconds // max(rows, 1)
+        for stage_index, stage in enumerate(STAGE_SPECS):
+            spec = get_stage_spec(stage)
+            seconds = np.minimum(base_seconds + stage_index * 300 + rng.integers(0, 600, n_rows), span_seconds - 1)
+            stamps = (start + pd.to_timedelta(seconds, unit='s')).strftime(DB_TIMESTAMP_FORMAT).to_numpy(dtype=object)
+            skipped = rng.random(n_rows) < SKIP_RATE
+            stamps[skipped] = None
+
+            passed = np.where(is_last, rng.random(n_rows) < FINAL_PASS_RATE, rng.random(n_rows) >= RETEST_FAIL_RATE)
+            status = np.where(passed, 'O', 'X').astype(object)
+            status[skipped] = None
+
+            frame[spec['date_col']] = stamps
+            frame[spec['db_jig_col']] = rng.choice(_jig_values(spec), n_rows)
+            if spec['jig_col'] != spec['db_jig_col']:
+                # CSV 기준 지그 컬럼(SemiAssyMaxSolarVolt)은 지그마다 고정된 측정값입니다.
+                frame[spec['jig_col']] = rng.choice(4.8 + 0.2 * np.arange(JIGS_PER_STAGE), n_rows).round(1)
+            frame[spec['pass_col']] = status
+            for name in _measurement_names(stage):
+                frame[name] = np.round(rng.normal(1.0, 0.1, n_rows), 4)
+        yield pd.DataFrame(frame)
+
+def write_history_db(path, rows, seed=0, days=DAYS, chunk_rows=CHUNK_ROWS, table_name=HISTORY_TABLE):
+    """
+    가상 historyinspection 테이블을 가진 SQLite 파일을 만듭니다. 이미 있으면 덮어씁니다.
+    Returns:
+        str: 만든 파일 경로.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        # 생성 중에는 안전성보다 속도를 우선합니다.
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        for chunk in generate_history_chunks(rows, seed, days, chunk_rows):
+            chunk.to_sql(table_name, conn, if_exists='append', index=False)
+        conn.execute(f"ANALYZE {quote_identifier(table_name)}")
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+def _wrap_excel(values):
+    """'="값"' 형태로 감쌉니다. 빈 값은 그대로 둡니다."""
+    wrapped = pd.Series(values, dtype=object)
+    notna = wrapped.notna()
+    wrapped[notna] = '="' + wrapped[notna].astype(str) + '"'
+    return wrapped
+
+def _csv_chunk(chunk, spec):
+    """historyinspection 조각에서 Stage CSV 내보내기 형태의 조각을 만듭니다."""
+    date_col = spec['date_col']
+    stamps = pd.to_datetime(chunk[date_col], format=DB_TIMESTAMP_FORMAT)
+    text = stamps.dt.strftime(spec['timestamp_format'] or CSV_TIMESTAMP_FORMAT)
+
+    frame = pd.DataFrame({'SNumber': chunk['SNumber']})
+    frame[date_col] = text
+    frame[spec['jig_col']] = chunk[spec['jig_col']]
+    frame[spec['pass_col']] = chunk[spec['pass_col']]
+    for col in spec['jig_fallback_cols']:
+        if col in chunk.columns:
+            frame[col] = chunk[col]
+    for name in _measurement_names(spec['stage']):
+        frame[name] = chunk[name]
+
+    for col in ['SNumber', date_col, spec['pass_col']]:
+        frame[col] = _wrap_excel(frame[col])
+    if not pd.api.types.is_numeric_dtype(frame[spec['jig_col']]):
+        frame[spec['jig_col']] = _wrap_excel(frame[spec['jig_col']])
+    if spec['tidy_header']:
+        # SemiAssy 파일: 빈 첫 컬럼과 값 앞의 공백
+        frame.insert(0, '', '')
+        frame.columns = [f" {col}" if col else col for col in frame.columns]
+    return frame
+
+def write_stage_csv(path, stage, rows, seed=0, days=DAYS, chunk_rows=CHUNK_ROWS):
+    """
+    Stage 하나의 검사 장비 CSV 내보내기 파일을 만듭니다. 같은 seed의 write_history_db()와 같은 검사 기록입니다.
+    헤더 앞에 장비 정보 행이 있고, SNumber/날짜/합격 값은 '="..."'로 감싸져 있습니다.
+    Returns:
+        str: 만든 파일 경로.
+    """
+    spec = get_stage_spec(stage)
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        f.write(f"Model,SJ_TM2360E\nStation,{spec['stage']}\nExported,{START_DATE}\n\n")
+        header = True
+        for chunk in generate_history_chunks(rows, seed, days, chunk_rows):
+            frame = _csv_chunk(chunk, spec)
+            if spec['skipinitialspace']:
+                frame = frame.astype(object).where(frame.isna(), ' ' + frame.astype(str))
+            # 래퍼의 따옴표를 다시 감싸지 않도록 그대로 씁니다.
+            frame.to_csv(f, index=False, header=header, quoting=csv.QUOTE_NONE)
+            header = False
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="성능 측정용 가상 historyinspection DB/CSV 파일을 만듭니다.")
+    parser.add_argument('db_path', help="만들 SQLite 파일 경로")
+    parser.add_argument('--rows', default='100k', help="행 수 (100k, 1m, 10m 또는 숫자)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--days', type=int, default=DAYS)
+    parser.add_argument('--csv-dir', help="지정하면 Stage별 CSV 파일도 이 폴더에 만듭니다.")
+    args = parser.parse_args(argv)
+
+    rows = parse_rows(args.rows)
+    write_history_db(args.db_path, rows, args.seed, args.days)
+    print(f"{args.db_path}: {rows:,}행")
+    if args.csv_dir:
+        os.makedirs(args.csv_dir, exist_ok=True)
+        for stage in STAGE_SPECS:
+            path = os.path.join(args.csv_dir, f"{stage}_{rows}.csv")
+            write_stage_csv(path, stage, rows, args.seed, args.days)
+            print(f"{path}: {rows:,}행")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#
+# aggregate_utils.py
+# 분석 집계를 SQLite 안에서 GROUP BY로 처리합니다.
+# (지그, 날짜, SNumber) 단위로 PASS/FAIL 여부를 먼저 묶고 다시 (지그, 날짜) 단위로 세므로,
+# 파이썬으로 넘어오는 것은 최종 요약 행뿐입니다. 몇 년치 구간도 pandas로 원본 행을 읽지 않고 분석할 수 있습니다.
+# 집계 기준은 analysis_service.analyze_data()와 같습니다 (고유 SNumber 기준).
+
+from datetime import date
+
+from src.db.query_utils import (HISTORY_TABLE, quote_identifier, get_table_columns, detect_timestamp_layout,
+                                day_expression, build_stage_query)
+from src.services.analysis_service import AnalysisResult, empty_serial_lists
+from src.services.stage_registry import get_stage_spec
+
+# 분석 방식: auto는 예상 행 수로 pandas/SQL 중 하나를 고릅니다.
+ANALYSIS_MODES = ('auto', 'pandas', 'sql')
+# 이 행 수를 넘으면 auto에서 SQL 집계를 사용합니다.
+SQL_ANALYSIS_MIN_ROWS = 1000000
+
+TOTAL_GROUP_COL = '__total_group__'
+TOTAL_GROUP_LABEL = '전체'
+
+def _analysis_source(conn, stage, start_date, end_date, jig, jig_col, table_name):
+    """
+    집계에 쓸 하위 쿼리와 식을 준비합니다.
+    Returns:
+        dict | None: 날짜 형식을 알 수 없으면 None.
+    """
+    spec = get_stage_spec(stage)
+    table_columns = get_table_columns(conn, table_name)
+    if spec['date_col'] not in table_columns or 'SNumber' not in table_columns:
+        return None
+    layout = detect_timestamp_layout(conn, spec['date_col'], table_name)
+    if layout is None:
+        return None
+
+    jig_col = jig_col or spec['db_jig_col']
+    columns = list(dict.fromkeys(col for col in ['SNumber', spec['date_col'], spec['pass_col'], jig_col]
+                                 if col in table_columns))
+    base_query, params = build_stage_query(conn, spec['stage'], columns, start_date, end_date, jig, jig_col, table_name)
+
+    used_jig_col = jig_col
+    if jig_col in table_columns:
+        # 구간 안의 지그 값이 모두 비어 있으면 analyze_data()처럼 '전체' 하나로 묶습니다.
+        has_jig = conn.execute(
+            f"SELECT 1 FROM ({base_query}) WHERE {quote_identifier(jig_col)} IS NOT NULL LIMIT 1", params
+        ).fetchone()
+        if has_jig is None:
+            used_jig_col = TOTAL_GROUP_COL
+    else:
+        used_jig_col = TOTAL_GROUP_COL
+
+    if spec['pass_col'] in table_columns:
+        status = f"UPPER(TRIM(COALESCE(CAST({quote_identifier(spec['pass_col'])} AS TEXT), ''), ' ' || char(9, 10, 13)))"
+    else:
+        status = "''"
+    return {
+        'base_query': base_query,
+        'params': params,
+        'jig': f"'{TOTAL_GROUP_LABEL}'" if used_jig_col == TOTAL_GROUP_COL else quote_identifier(jig_col),
+        'day': day_expression(layout, spec['date_col']),
+        'status': status,
+        'used_jig_col': used_jig_col,
+    }
+
+def _serial_day_query(source):
+    """(지그, 날짜, SNumber)별 PASS/FAIL 여부를 구하는 하위 쿼리."""
+    return (
+        f"SELECT {source['jig']} AS jig, {source['day']} AS day, SNumber, "
+        f"MAX(status = 'O') AS has_pass, MAX(status = 'X') AS has_fail "
+        f"FROM (SELECT *, {source['status']} AS status FROM ({source['base_query']})) "
+        f"GROUP BY 1, 2, 3"
+    )
+
+def estimate_stage_rows(conn, stage, start_date=None, end_date=None, jig=None, jig_col=None, table_name=HISTORY_TABLE):
+    """분석 대상 행 수. 날짜/지그 인덱스만 읽어 셉니다."""
+    spec = get_stage_spec(stage)
+    table_columns = get_table_columns(conn, table_name)
+    columns = [spec['date_col']] if spec['date_col'] in table_columns else None
+    query, params = build_stage_query(conn, spec['stage'], columns, start_date, end_date, jig, jig_col, table_name)
+    return conn.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+
+def choose_analysis_mode(estimated_rows, mode='auto'):
+    """'auto'이면 예상 행 수로 'pandas' 또는 'sql'을 고릅니다."""
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"알 수 없는 분석 방식입니다: {mode}")
+    if mode != 'auto':
+        return mode
+    return 'sql' if estimated_rows >= SQL_ANALYSIS_MIN_ROWS else 'pandas'
+
+def analyze_stage_sql(conn, stage, start_date=None, end_date=None, jig=None, jig_col=None, table_name=HISTORY_TABLE):
+    """
+    analyze_data()와 같은 형태의 결과를 SQLite 집계로 만듭니다.
+    날짜는 저장된 타임스탬프의 날짜 부분으로 정합니다.
+    Returns:
+        AnalysisResult | None: 지그별 시리얼 목록(load_serial_lists_sql())까지 담은 결과.
+            날짜 형식을 SQL로 해석할 수 없으면 None (pandas로 분석해야 합니다).
+    """
+    source = _analysis_source(conn, stage, start_date, end_date, jig, jig_col, table_name)
+    if source is None:
+        return None
+
+    # SNumber가 없는 행은 PASS 시리얼로 인정하지 않습니다. 지그가 빈 행은 날짜 목록에만 반영됩니다.
+    rows = conn.execute(
+        f"SELECT jig, day, COUNT(*), "
+        f"SUM(has_pass AND SNumber IS NOT NULL), "
+        f"SUM(has_pass AND SNumber IS NOT NULL AND has_fail), "
+        f"SUM(NOT (has_pass AND SNumber IS NOT NULL) AND has_fail) "
+        f"FROM ({_serial_day_query(source)}) WHERE day IS NOT NULL "
+        f"GROUP BY jig, day ORDER BY jig, day",
+        source['params'],
+    ).fetchall()
+
+    summary_data = {}
+    days = set()
+    for jig_value, day, total_test, pass_count, false_defect, true_defect in rows:
+        days.add(day)
+        if jig_value is None:
+            continue
+        summary_data.setdefault(jig_value, {})[day] = {
+            'total_test': total_test,
+            'pass': pass_count,
+            'false_defect': false_defect,
+            'true_defect': true_defect,
+            'fail': total_test - pass_count,
+        }
+    all_dates = [date.fromisoformat(day) for day in sorted(days)]
+    serials = load_serial_lists_sql(conn, stage, start_date, end_date, jig, jig_col, table_name)
+    return AnalysisResult(summary_data, all_dates, source['used_jig_col'], serials)
+
+def load_serial_lists_sql(conn, stage, start_date=None, end_date=None, jig=None, jig_col=None, table_name=HISTORY_TABLE):
+    """
+    기간 전체의 지그별 PASS/가성불량/진성불량/FAIL 시리얼 목록을 SQLite 집계로 만듭니다.
+    형태와 기준은 rollup_utils.load_rollup_serials()와 같습니다.
+    Returns:
+        dict | None: {jig: {'pass': [...], 'false_defect': [...], 'true_defect': [...], 'fail': [...]}}.
+            날짜 형식을 SQL로 해석할 수 없으면 None.
+    """
+    source = _analysis_source(conn, stage, start_date, end_date, jig, jig_col, table_name)
+    if source is None:
+        return None
+
+    rows = conn.execute(
+        f"SELECT jig, SNumber, MAX(has_pass), MAX(has_fail) FROM ({_serial_day_query(source)}) "
+        f"WHERE jig IS NOT NULL AND day IS NOT NULL AND SNumber IS NOT NULL "
+        f"GROUP BY jig, SNumber ORDER BY jig, SNumber",
+        source['params'],
+    )
+    serials = {}
+    for jig_value, serial, has_pass, has_fail in rows:
+        lists = serials.setdefault(jig_value, empty_serial_lists())
+        if has_pass:
+            lists['pass'].append(serial)
+            if has_fail:
+                lists['false_defect'].append(serial)
+        else:
+            lists['fail'].append(serial)
+            if has_fail:
+                lists['true_defect'].append(serial)
+    return serials
@@ -0,0 +1,230 @@
+#
+# cache_utils.py
+# historyinspection 테이블을 DB 파일 옆에 Arrow IPC 파일('<DB>.arrow')로 저장해 두고 메모리 매핑으로 읽습니다.
+# 컬럼은 타입이 정해진 상태로 저장되며, Stage별 날짜 컬럼은 '<날짜 컬럼>_dt'로 미리 변환해 둡니다.
+# 캐시에는 DB 파일의 크기/수정 시각이 기록되어 있어, DB가 갱신되면 자동으로 다시 만들어집니다.
+# pyarrow는 선택 의존성입니다. 설치되어 있지 않으면 HAS_PYARROW가 False이고 호출한 쪽은 SQLite 조회를 사용합니다.
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    HAS_PYARROW = True
+except ImportError:
+    pa = None
+    pc = None
+    HAS_PYARROW = False
+
+from src.db.query_utils import HISTORY_TABLE, quote_identifier, get_table_columns, _to_date
+from src.services.stage_registry import STAGE_SPECS, get_stage_spec
+from src.services.stage_schema import parse_timestamps, resolve_timestamp_format
+
+# 캐시 구성이 바뀌면 이 값을 올립니다. 기존 캐시는 다음 연결 때 다시 만들어집니다.
+CACHE_FORMAT_VERSION = 2
+CACHE_SUFFIX = '.arrow'
+BATCH_ROWS = 100000
+# 타입 판별 쿼리 하나에 넣을 컬럼 수 (SQLite 결과 컬럼 수 제한 대비)
+TYPE_SCAN_COLUMNS = 200
+
+def cache_path_for(db_path):
+    return db_path + CACHE_SUFFIX
+
+def db_cache_key(db_path):
+    """DB 파일의 크기와 수정 시각으로 만든 캐시 키. 파일이 바뀌면 값도 바뀝니다."""
+    stat = os.stat(db_path)
+    return f"{CACHE_FORMAT_VERSION}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def date_cache_column(date_col):
+    """날짜 컬럼을 미리 변환해 둔 캐시 컬럼 이름."""
+    return f"{date_col}_dt"
+
+def _read_cache_key(path):
+    with pa.memory_map(path, 'r') as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return metadata.get(b'db_key', b'').decode()
+
+def is_cache_fresh(db_path):
+    """캐시 파일이 있고 현재 DB 파일로 만든 것이면 True."""
+    path = cache_path_for(db_path)
+    if not HAS_PYARROW or not os.path.exists(path):
+        return False
+    try:
+        return _read_cache_key(path) == db_cache_key(db_path)
+    except (OSError, pa.ArrowInvalid):
+        return False
+
+def _scan_column_types(conn, table_name, columns):
+    """
+    SQLite는 행마다 값의 타입이 다를 수 있으므로, 한 번의 스캔으로 컬럼별로 실제 저장된 타입을 확인해 Arrow 타입을 정합니다.
+    텍스트가 하나라도 있으면 문자열, 실수가 있으면 float64, 정수만 있으면 int64, 값이 없으면 문자열입니다.
+    """
+    types = {}
+    table = quote_identifier(table_name)
+    for offset in range(0, len(columns), TYPE_SCAN_COLUMNS):
+        part = columns[offset:offset + TYPE_SCAN_COLUMNS]
+        expressions = []
+        for col in part:
+            column = quote_identifier(col)
+            expressions += [f"MAX(typeof({column}) IN ('text', 'blob'))", f"MAX(typeof({column}) = 'real')"]
+        row = conn.execute(f"SELECT {', '.join(expressions)} FROM {table}").fetchone()
+        for i, col in enumerate(part):
+            has_text, has_real = row[2 * i], row[2 * i + 1]
+            if has_text or has_text is None:
+                types[col] = pa.string()
+            elif has_real:
+                types[col] = pa.float64()
+            else:
+                types[col] = pa.int64()
+    return types
+
+def _to_arrow_column(values, arrow_type):
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # 문자열 컬럼에 숫자가 섞여 있는 경우
+        return pa.array([None if v is None else str(v) for v in values], type=arrow_type)
+
+def _stage_date_columns(columns):
+    """테이블에 있는 Stage별 날짜 컬럼 → Stage 설정."""
+    date_specs = {}
+    for stage in STAGE_SPECS:
+        spec = get_stage_spec(stage)
+        if spec['date_col'] in columns and spec['date_col'] not in date_specs:
+            date_specs[spec['date_col']] = spec
+    return date_specs
+
+def _measurement_dtypes(columns):
+    """Stage 설정에 dtype이 지정된 측정값 컬럼 → dtype."""
+    dtypes = {}
+    for stage in STAGE_SPECS:
+        for col, dtype in get_stage_spec(stage)['measurement_dtypes'].items():
+            if col in columns:
+                dtypes[col] = dtype
+    return dtypes
+
+def build_history_cache(db_path, table_name=HISTORY_TABLE, progress_callback=None):
+    """
+    DB 테이블 전체를 Arrow IPC 캐시 파일로 만듭니다. 임시 파일에 쓴 뒤 교체하므로 만드는 도중에는 기존 캐시가 유지됩니다.
+    Args:
+        db_path (str): SQLite 파일 경로.
+        table_name (str): 캐시할 테이블.
+        progress_callback (callable | None): (처리한 행 수, 전체 행 수)를 받는 함수.
+    Returns:
+        str: 캐시 파일 경로.
+    """
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow가 설치되어 있지 않아 캐시를 만들 수 없습니다.")
+
+    key = db_cache_key(db_path)
+    path = cache_path_for(db_path)
+    tmp_path = path + '.tmp'
+
+    conn = sqlite3.connect(db_path)
+    try:
+        columns = get_table_columns(conn, table_name)
+        types = _scan_column_types(conn, table_name, columns)
+        measurement_dtypes = _measurement_dtypes(columns)
+        for col, dtype in measurement_dtypes.items():
+            types[col] = pa.from_numpy_dtype(pd.api.types.pandas_dtype(dtype))
+        date_specs = _stage_date_columns(columns)
+        date_cols = list(date_specs)
+        # 날짜 형식은 첫 조각에서 한 번 정해 모든 조각에 같은 형식을 사용합니다.
+        date_formats = {}
+        fields = [pa.field(col, types[col]) for col in columns]
+        fields += [pa.field(date_cache_column(col), pa.timestamp('ns')) for col in date_cols]
+        schema = pa.schema(fields, metadata={'db_key': key, 'built_at': datetime.now().isoformat()})
+
+        total_rows = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+        cursor = conn.execute(
+            f"SELECT {', '.join(quote_identifier(col) for col in columns)} FROM {quote_identifier(table_name)}"
+        )
+        done_rows = 0
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            while True:
+                rows = cursor.fetchmany(BATCH_ROWS)
+                if not rows:
+                    break
+                values = list(zip(*rows))
+                arrays = []
+                for i, col in enumerate(columns):
+                    if col in measurement_dtypes:
+                        numeric = pd.to_numeric(pd.Series(values[i]), errors='coerce').astype(measurement_dtypes[col])
+                        arrays.append(pa.array(numeric, type=types[col], from_pandas=True))
+                    else:
+                        arrays.append(_to_arrow_column(list(values[i]), types[col]))
+                for date_col in date_cols:
+                    raw = pd.Series(values[columns.index(date_col)])
+                    if date_formats.get(date_col) is None:
+                        date_formats[date_col] = resolve_timestamp_format(raw, date_specs[date_col], source='db')
+                    parsed = parse_timestamps(raw, date_formats[date_col])
+                    arrays.append(pa.array(parsed, type=pa.timestamp('ns'), from_pandas=True))
+                writer.write_batch(pa.record_batch(arrays, schema=schema))
+                done_rows += len(rows)
+                if progress_callback is not None:
+                    progress_callback(done_rows, total_rows)
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, path)
+    return path
+
+def open_history_cache(db_path):
+    """
+    캐시 파일을 메모리 매핑으로 엽니다. 데이터는 필요한 부분만 디스크에서 읽히며, 같은 파일을 연 프로세스끼리 페이지를 공유합니다.
+    Returns:
+        pyarrow.Table | None: 캐시가 없거나 오래되었으면 None.
+    """
+    if not is_cache_fresh(db_path):
+        return None
+    source = pa.memory_map(cache_path_for(db_path), 'r')
+    return pa.ipc.open_file(source).read_all()
+
+def read_stage_frame(table, stage, columns=None, start_date=None, end_date=None, jig=None, jig_col=None):
+    """
+    캐시 테이블에서 Stage 조건에 맞는 행과 컬럼만 DataFrame으로 가져옵니다. query_stage_data()와 같은 조건을 사용하며,
+    날짜 구간은 미리 변환한 '<날짜 컬럼>_dt' 컬럼으로 거릅니다.
+    Args:
+        table (pyarrow.Table): open_history_cache()의 결과.
+        stage (str): Stage 이름 또는 탭 키.
+        columns (list | None): 가져올 컬럼. None이면 전체 컬럼.
+        start_date, end_date (date | None): 조회할 날짜 구간 (양 끝 포함).
+        jig: 지그 값. None이면 모든 지그.
+        jig_col (str | None): 지그 컬럼. None이면 Stage 설정의 db_jig_col.
+    Returns:
+        pd.DataFrame
+    """
+    spec = get_stage_spec(stage)
+    names = table.schema.names
+    mask = None
+
+    def combine(condition):
+        return condition if mask is None else pc.and_(mask, condition)
+
+    dt_col = date_cache_column(spec['date_col'])
+    if dt_col in names:
+        if start_date is not None:
+            start = pd.Timestamp(_to_date(start_date))
+            mask = combine(pc.greater_equal(table[dt_col], pa.scalar(start, type=pa.timestamp('ns'))))
+        if end_date is not None:
+            end = pd.Timestamp(_to_date(end_date) + timedelta(days=1))
+            mask = combine(pc.less(table[dt_col], pa.scalar(end, type=pa.timestamp('ns'))))
+
+    jig_col = jig_col or spec['db_jig_col']
+    if jig is not None and jig_col in names:
+        value = jig.item() if hasattr(jig, 'item') else jig
+        mask = combine(pc.equal(table[jig_col], pa.scalar(value).cast(table.schema.field(jig_col).type)))
+
+    if columns is not None:
+        unknown = [col for col in columns if col not in names]
+        if unknown:
+            raise KeyError(f"캐시에 없는 컬럼입니다: {unknown}")
+        table = table.select(columns)
+    if mask is not None:
+        # 조건에 맞지 않는 날짜(NULL)는 제외합니다.
+        table = table.filter(pc.fill_null(mask, False))
+    return table.to_pandas()
@@ -0,0 +1,165 @@
+#
+# catalog_utils.py
+# Stage별 메타데이터 카탈로그(지그별 행 수, 최소/최대 타임스탬프, 날짜별 행 수)를 DB 옆의 '<DB>.catalog.json'에 저장합니다.
+# DB 버전(파일 크기/수정 시각)마다 한 번만 만들며, 이후에는 PC 목록과 날짜 범위를 테이블을 읽지 않고 바로 꺼냅니다.
+# 날짜별 행 수로 분석 전에 대상 행 수를 추정할 수 있습니다.
+
+import json
+import os
+import threading
+from datetime import date
+
+from src.db.cache_utils import db_cache_key
+from src.db.query_utils import (HISTORY_TABLE, quote_identifier, database_path, get_table_columns,
+                                detect_timestamp_layout, day_expression, _parse_date_value)
+from src.services.stage_registry import STAGE_SPECS, get_stage_spec
+
+CATALOG_SUFFIX = '.catalog.json'
+# 카탈로그 구성이 바뀌면 이 값을 올립니다. 기존 카탈로그는 다음 조회 때 다시 만들어집니다.
+CATALOG_VERSION = 1
+
+_lock = threading.Lock()
+# DB 경로 → 읽어 둔 카탈로그. 같은 프로세스에서는 파일을 다시 읽지 않습니다.
+_catalogs = {}
+
+def catalog_path_for(db_path):
+    return db_path + CATALOG_SUFFIX
+
+def catalog_key(db_path):
+    return f"{CATALOG_VERSION}:{db_cache_key(db_path)}"
+
+def _entry_key(stage, jig_col):
+    return f"{stage}|{jig_col}"
+
+def _sorted_jigs(rows):
+    try:
+        return sorted(rows, key=lambda row: row[0])
+    except TypeError:
+        # 숫자와 문자가 섞인 지그 컬럼
+        return sorted(rows, key=lambda row: str(row[0]))
+
+def build_stage_entry(conn, stage, jig_col=None, table_name=HISTORY_TABLE):
+    """
+    Stage 하나의 카탈로그 항목을 만듭니다. 해당 Stage의 날짜 컬럼에 값이 있는 행만 셉니다.
+    Returns:
+        dict: {'stage', 'jig_col', 'rows', 'jigs': [[지그, 행 수], ...], 'min_timestamp', 'max_timestamp',
+            'min_date', 'max_date', 'daily_counts': {'YYYY-MM-DD': 행 수}}
+    """
+    spec = get_stage_spec(stage)
+    jig_col = jig_col or spec['db_jig_col']
+    table_columns = get_table_columns(conn, table_name)
+    table = quote_identifier(table_name)
+    entry = {
+        'stage': spec['stage'], 'jig_col': jig_col, 'rows': 0, 'jigs': [],
+        'min_timestamp': None, 'max_timestamp': None, 'min_date': None, 'max_date': None, 'daily_counts': {},
+    }
+    if spec['date_col'] not in table_columns:
+        return entry
+
+    column = quote_identifier(spec['date_col'])
+    has_date = f"{column} IS NOT NULL AND {column} != ''"
+    rows, min_value, max_value = conn.execute(f"SELECT COUNT(*), MIN({column}), MAX({column}) FROM {table} WHERE {has_date}").fetchone()
+    entry.update({'rows': rows, 'min_timestamp': min_value, 'max_timestamp': max_value})
+    min_date, max_date = _parse_date_value(min_value), _parse_date_value(max_value)
+    if min_date is not None and max_date is not None:
+        entry.update({'min_date': min_date.isoformat(), 'max_date': max_date.isoformat()})
+
+    if jig_col in table_columns:
+        jig = quote_identifier(jig_col)
+        jig_rows = conn.execute(
+            f"SELECT {jig}, COUNT(*) FROM {table} WHERE {has_date} AND {jig} IS NOT NULL GROUP BY {jig}"
+        ).fetchall()
+        entry['jigs'] = [list(row) for row in _sorted_jigs(jig_rows)]
+
+    layout = detect_timestamp_layout(conn, spec['date_col'], table_name)
+    if layout is not None:
+        day = day_expression(layout, spec['date_col'])
+        day_rows = conn.execute(
+            f"SELECT {day} AS day, COUNT(*) FROM {table} WHERE {has_date} GROUP BY day HAVING day IS NOT NULL ORDER BY day"
+        ).fetchall()
+        entry['daily_counts'] = dict(day_rows)
+    return entry
+
+def _read_catalog(db_path, key):
+    try:
+        with open(catalog_path_for(db_path), 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return catalog if catalog.get('db_key') == key else None
+
+def _write_catalog(db_path, catalog):
+    tmp_path = catalog_path_for(db_path) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False)
+    os.replace(tmp_path, catalog_path_for(db_path))
+
+def _current_catalog(db_path):
+    """현재 DB 버전의 카탈로그. 메모리 → 파일 순으로 찾고, 없으면 빈 카탈로그를 만듭니다. _lock 안에서 호출합니다."""
+    key = catalog_key(db_path)
+    catalog = _catalogs.get(db_path)
+    if catalog is None or catalog['db_key'] != key:
+        catalog = _read_catalog(db_path, key) or {'db_key': key, 'stages': {}}
+        _catalogs[db_path] = catalog
+    return catalog
+
+def is_catalog_fresh(db_path):
+    """모든 Stage의 기본 항목이 현재 DB 버전으로 만들어져 있으면 True."""
+    with _lock:
+        stages = _current_catalog(db_path)['stages']
+    return all(_entry_key(name, get_stage_spec(name)['db_jig_col']) in stages for name in STAGE_SPECS)
+
+def get_stage_catalog(conn, stage, jig_col=None, table_name=HISTORY_TABLE):
+    """
+    Stage의 카탈로그 항목을 반환합니다. 현재 DB 버전에 항목이 없을 때만 테이블을 읽어 만들고 저장합니다.
+    Args:
+        conn: SQLite 연결.
+        stage (str): Stage 이름 또는 탭 키.
+        jig_col (str | None): 지그 컬럼. None이면 Stage 설정의 db_jig_col.
+    Returns:
+        dict: build_stage_entry()의 결과.
+    """
+    spec = get_stage_spec(stage)
+    jig_col = jig_col or spec['db_jig_col']
+    db_path = database_path(conn)
+    key = _entry_key(spec['stage'], jig_col)
+    with _lock:
+        catalog = _current_catalog(db_path)
+        if key not in catalog['stages']:
+            catalog['stages'][key] = build_stage_entry(conn, stage, jig_col, table_name)
+            _write_catalog(db_path, catalog)
+        return catalog['stages'][key]
+
+def build_catalog(conn, table_name=HISTORY_TABLE, progress_callback=None):
+    """모든 Stage의 기본 지그 컬럼 항목을 미리 만들어 둡니다."""
+    stages = list(STAGE_SPECS)
+    for i, stage in enumerate(stages):
+        get_stage_catalog(conn, stage, table_name=table_name)
+        if progress_callback is not None:
+            progress_callback(i + 1, len(stages))
+
+def catalog_date_bounds(entry):
+    """카탈로그 항목의 (최소 date, 최대 date). 값이 없으면 (None, None)."""
+    if entry['min_date'] is None:
+        return None, None
+    return date.fromisoformat(entry['min_date']), date.fromisoformat(entry['max_date'])
+
+def catalog_jigs(entry):
+    """카탈로그 항목의 지그 값 목록 (정렬됨)."""
+    return [jig for jig, _ in entry['jigs']]
+
+def estimate_catalog_rows(entry, start_date=None, end_date=None, jig=None):
+    """
+    날짜별 행 수로 분석 대상 행 수를 추정합니다. 지그를 지정하면 전체 중 그 지그의 비율만큼 줄입니다.
+    Returns:
+        int | None: 날짜별 행 수가 없으면 None.
+    """
+    if not entry['daily_counts']:
+        return None
+    start = start_date.isoformat() if start_date is not None else ''
+    end = end_date.isoformat() if end_date is not None else '9999-12-31'
+    rows = sum(count for day, count in entry['daily_counts'].items() if start <= day <= end)
+    if jig is not None and entry['rows']:
+        jig_rows = next((count for value, count in entry['jigs'] if value == jig), 0)
+        rows = round(rows * jig_rows / entry['rows'])
+    return rows
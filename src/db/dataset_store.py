@@ -0,0 +1,128 @@
+#
+# dataset_store.py
+# 프로세스 전체에서 공유하는 historyinspection 데이터셋을 관리합니다.
+# DB 버전(파일 크기/수정 시각)마다 한 번만 읽고, 모든 세션은 같은 데이터셋에서 필요한 행만 골라 갑니다.
+# DB가 갱신되면 새 버전을 다 읽은 뒤 참조 하나만 바꿔 끼우므로, 읽는 동안에도 기존 버전으로 계속 조회할 수 있습니다.
+# 공유 데이터는 수정하지 않습니다. select_stage_rows()는 항상 새 DataFrame을 돌려줍니다.
+
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.db.cache_utils import (HAS_PYARROW, is_cache_fresh, build_history_cache, open_history_cache,
+                                read_stage_frame, db_cache_key, date_cache_column)
+from src.db.query_utils import HISTORY_TABLE, quote_identifier, _to_date
+from src.services.stage_registry import STAGE_SPECS, get_stage_spec
+from src.services.stage_schema import parse_stage_timestamps, apply_measurement_dtypes
+
+# version: db_cache_key(), table: pyarrow.Table(메모리 매핑) 또는 None, frame: pyarrow가 없을 때의 DataFrame
+Dataset = namedtuple('Dataset', ['version', 'table', 'frame', 'loaded_at'])
+
+_lock = threading.Lock()
+_current = None
+
+def current_dataset():
+    """지금 공유 중인 데이터셋. 아직 읽지 않았으면 None."""
+    return _current
+
+def _load_frame(db_path, table_name):
+    """pyarrow가 없을 때: 테이블을 한 번 읽고 Stage별 날짜 컬럼을 '<날짜 컬럼>_dt'로 변환해 둡니다."""
+    conn = sqlite3.connect(db_path)
+    try:
+        frame = pd.read_sql_query(f"SELECT * FROM {quote_identifier(table_name)}", conn)
+    finally:
+        conn.close()
+    for stage in STAGE_SPECS:
+        apply_measurement_dtypes(frame, stage)
+        date_col = get_stage_spec(stage)['date_col']
+        if date_col in frame.columns and date_cache_column(date_col) not in frame.columns:
+            frame[date_cache_column(date_col)] = parse_stage_timestamps(frame[date_col], stage, source='db')
+    return frame
+
+def _load_dataset(db_path, version, table_name):
+    table, frame = None, None
+    if HAS_PYARROW:
+        if not is_cache_fresh(db_path):
+            build_history_cache(db_path, table_name)
+        table = open_history_cache(db_path)
+    if table is None:
+        frame = _load_frame(db_path, table_name)
+    return Dataset(version, table, frame, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+def get_dataset(db_path, table_name=HISTORY_TABLE):
+    """
+    현재 DB 버전의 공유 데이터셋을 반환합니다. 버전이 바뀌었으면 새로 읽어 교체합니다.
+    동시에 여러 세션이 호출해도 버전마다 한 번만 읽습니다.
+    Returns:
+        Dataset
+    """
+    global _current
+    version = db_cache_key(db_path)
+    dataset = _current
+    if dataset is not None and dataset.version == version:
+        return dataset
+
+    with _lock:
+        if _current is not None and _current.version == version:
+            return _current
+        dataset = _load_dataset(db_path, version, table_name)
+        # 참조 교체는 원자적입니다. 이전 버전은 사용 중인 세션이 없어지면 해제됩니다.
+        _current = dataset
+    return dataset
+
+def open_mapped_dataset(db_path):
+    """
+    현재 DB 버전의 컬럼형 캐시가 있을 때만 메모리 매핑으로 열어 Dataset으로 돌려줍니다.
+    캐시를 만들거나 테이블 전체를 읽지 않으므로, 여러 작업 프로세스가 같은 파일을 읽기 전용으로 나눠 쓸 때 사용합니다.
+    Returns:
+        Dataset | None: pyarrow가 없거나 캐시가 오래되었으면 None.
+    """
+    if not HAS_PYARROW:
+        return None
+    table = open_history_cache(db_path)
+    if table is None:
+        return None
+    return Dataset(db_cache_key(db_path), table, None, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+def dataset_columns(dataset):
+    return dataset.table.schema.names if dataset.table is not None else list(dataset.frame.columns)
+
+def select_stage_rows(dataset, stage, columns=None, start_date=None, end_date=None, jig=None, jig_col=None):
+    """
+    공유 데이터셋에서 Stage 조건에 맞는 행과 컬럼만 새 DataFrame으로 꺼냅니다. 조건은 query_stage_data()와 같습니다.
+    Args:
+        dataset (Dataset): get_dataset()의 결과.
+        stage (str): Stage 이름 또는 탭 키.
+        columns (list | None): 가져올 컬럼. None이면 전체 컬럼.
+        start_date, end_date (date | None): 조회할 날짜 구간 (양 끝 포함).
+        jig: 지그 값. None이면 모든 지그.
+        jig_col (str | None): 지그 컬럼. None이면 Stage 설정의 db_jig_col.
+    Returns:
+        pd.DataFrame: 호출한 쪽이 자유롭게 수정해도 되는 복사본.
+    """
+    if dataset.table is not None:
+        return read_stage_frame(dataset.table, stage, columns, start_date, end_date, jig, jig_col)
+
+    frame = dataset.frame
+    spec = get_stage_spec(stage)
+    mask = pd.Series(True, index=frame.index)
+    dt_col = date_cache_column(spec['date_col'])
+    if dt_col in frame.columns:
+        if start_date is not None:
+            mask &= frame[dt_col] >= pd.Timestamp(_to_date(start_date))
+        if end_date is not None:
+            mask &= frame[dt_col] < pd.Timestamp(_to_date(end_date) + timedelta(days=1))
+
+    jig_col = jig_col or spec['db_jig_col']
+    if jig is not None and jig_col in frame.columns:
+        mask &= frame[jig_col] == jig
+
+    if columns is not None:
+        unknown = [col for col in columns if col not in frame.columns]
+        if unknown:
+            raise KeyError(f"데이터셋에 없는 컬럼입니다: {unknown}")
+    selected = frame.loc[mask, columns if columns is not None else frame.columns]
+    return selected.reset_index(drop=True)
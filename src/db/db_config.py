@@ -0,0 +1,10 @@
+#
+# db_config.py
+# DB 파일의 원격 주소와 로컬 경로입니다. streamlit을 import하지 않으므로 앱과 명령행 배치(src/batch.py)가 같은 설정을 씁니다.
+# 로컬 HTTP 서버로 시험하거나 다른 위치의 DB를 쓸 때는 환경 변수 SJ_DB_URL / SJ_DB_PATH로 바꿀 수 있습니다.
+
+import os
+
+DB_URL = os.environ.get('SJ_DB_URL', 'https://storage.googleapis.com/webdb5/SJ_TM2360E/SJ_TM2360E.sqlite3')
+DB_PATH = os.environ.get('SJ_DB_PATH', "./src/db/SJ_TM2360E.sqlite3")
+MIN_DB_SIZE = 10000000
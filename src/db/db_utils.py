@@ -2,10 +2,19 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 import os
-import requests
 import warnings
 import gdown
 
+from src.db.db_config import DB_URL, DB_PATH, MIN_DB_SIZE
+from src.db.query_utils import query_stage_data
+from src.db.index_utils import needs_indexing, ensure_indexes
+from src.db.download_utils import download_file, is_sqlite_file
+from src.db.refresh_utils import record_download, load_local_meta, check_remote_update, refresh_database
+from src.db.cache_utils import HAS_PYARROW, is_cache_fresh, build_history_cache
+from src.db.dataset_store import get_dataset, current_dataset
+from src.db.catalog_utils import is_catalog_fresh, build_catalog
+from src.utils.instrumentation import span
+
 # 경고 무시
 warnings.filterwarnings('ignore')
 
@@ -14,38 +23,28 @@ def get_connection():
     """
     구글 클라우드 스토리지에서 파일을 다운로드하고 SQLite 연결을 반환합니다.
     """
-    # GCS에서 다운로드할 파일 URL과 로컬 저장 경로를 정의합니다.
-    gcs_url = 'https://storage.googleapis.com/webdb5/SJ_TM2360E/SJ_TM2360E.sqlite3'
-    db_path = "./src/db/SJ_TM2360E.sqlite3"
+    db_path = DB_PATH
 
     # src/db 디렉터리가 없으면 생성합니다.
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
     # 1단계: 파일이 존재하지 않거나 유효하지 않을 경우 다운로드를 시도합니다.
-    if not os.path.exists(db_path) or os.path.getsize(db_path) < 10000000:
+    # 다운로드는 임시 파일에 받아 검증 후 교체하므로, 중단된 경우 다음 실행 때 이어받습니다.
+    if not os.path.exists(db_path) or os.path.getsize(db_path) < MIN_DB_SIZE or not is_sqlite_file(db_path):
         st.info("🔄 유효한 로컬 파일이 없습니다. Google Cloud Storage에서 다운로드를 시작합니다...")
         try:
-            with requests.get(gcs_url, stream=True, timeout=600) as r:
-                r.raise_for_status()
-                
-                download_progress = st.progress(0)
-                downloaded_size = 0
-                total_size = int(r.headers.get('content-length', 0))
-
-                with open(db_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        download_progress.progress(downloaded_size / total_size)
-            
-            st.success("✅ GCS 다운로드 완료!")
-            
-            if os.path.exists(db_path) and os.path.getsize(db_path) > 10000000:
-                pass
-            else:
-                st.error("❌ 다운로드 실패 또는 파일 크기가 유효하지 않습니다.")
-                st.stop()
-                return None
+            download_progress = st.progress(0)
+            with span('download') as sp:
+                info = download_file(
+                    DB_URL, db_path,
+                    progress_callback=lambda done, total: download_progress.progress(done / total),
+                    validate=is_sqlite_file,
+                )
+                sp.set(bytes=info['size'], resumed_bytes=info['resumed_bytes'])
+            record_download(db_path, info)
+            if info['resumed_bytes']:
+                st.info(f"이전에 받은 {info['resumed_bytes'] / 1e6:,.1f}MB에 이어서 받았습니다.")
+            st.success(f"✅ GCS 다운로드 완료! ({info['elapsed']:.1f}초)")
         except Exception as e:
             st.error(f"❌ GCS 다운로드 중 오류 발생: {e}")
             st.stop()
@@ -56,22 +55,127 @@ def get_connection():
     # 2단계: 다운로드한 파일에 연결을 시도합니다.
     try:
         conn = sqlite3.connect(db_path, check_same_thread=False)
-        return conn
     except Exception as e:
         st.error(f"❌ 데이터베이스 연결에 실패했습니다: {e}")
         st.stop()
         return None
-    
-def read_data_from_db(conn, table_name):
+
+    # 3단계: 새로 받은 파일이면 조회/집계용 인덱스를 한 번 만들어 둡니다.
+    try:
+        if needs_indexing(conn):
+            st.info("🔄 조회 속도 향상을 위한 인덱스를 생성합니다. (파일당 최초 1회)")
+            index_progress = st.progress(0)
+            with span('build_indexes'):
+                ensure_indexes(conn, progress_callback=lambda done, total: index_progress.progress(done / total))
+            st.success("✅ 인덱스 생성 완료!")
+    except Exception as e:
+        st.warning(f"⚠️ 인덱스 생성에 실패했습니다. 인덱스 없이 계속합니다: {e}")
+
+    # 4단계: pyarrow가 있으면 컬럼형 캐시를 만들어 둡니다. DB 파일이 바뀐 경우에만 다시 만듭니다.
+    if HAS_PYARROW and not is_cache_fresh(db_path):
+        try:
+            st.info("🔄 빠른 조회를 위한 컬럼형 캐시를 생성합니다. (DB 버전당 최초 1회)")
+            cache_progress = st.progress(0)
+            with span('build_cache'):
+                build_history_cache(db_path, progress_callback=lambda done, total: cache_progress.progress(done / max(total, 1)))
+            st.success("✅ 캐시 생성 완료!")
+        except Exception as e:
+            st.warning(f"⚠️ 캐시 생성에 실패했습니다. DB에서 직접 조회합니다: {e}")
+
+    # 5단계: PC 목록/날짜 범위/날짜별 행 수 카탈로그를 만들어 둡니다. DB 버전당 한 번만 만듭니다.
+    if not is_catalog_fresh(db_path):
+        try:
+            catalog_progress = st.progress(0)
+            with span('build_catalog'):
+                build_catalog(conn, progress_callback=lambda done, total: catalog_progress.progress(done / total))
+        except Exception as e:
+            st.warning(f"⚠️ 메타데이터 카탈로그 생성에 실패했습니다. 탭을 열 때 만듭니다: {e}")
+
+    return conn
+
+def get_shared_dataset():
+    """
+    프로세스 전체가 공유하는 현재 DB 버전의 데이터셋을 반환합니다 (dataset_store.get_dataset()).
+    접속한 사용자 수와 관계없이 메모리에는 DB 버전당 한 벌만 올라갑니다. 읽기에 실패하면 None.
+    """
+    try:
+        with st.spinner("데이터셋을 준비하는 중... (DB 버전당 최초 1회)"), span('shared_dataset'):
+            return get_dataset(DB_PATH)
+    except Exception as e:
+        st.warning(f"⚠️ 공유 데이터셋을 준비하지 못했습니다. DB에서 직접 조회합니다: {e}")
+        return None
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _remote_has_update():
+    """원격 DB가 바뀌었는지 10분에 한 번만 조건부 요청으로 확인합니다."""
+    try:
+        return check_remote_update(DB_URL, DB_PATH) is not None
+    except Exception:
+        return False
+
+def render_database_refresh():
+    """
+    사이드바에 DB 갱신 상태와 '업데이트 확인' 버튼을 표시합니다.
+    갱신이 끝나기 전까지는 기존 파일로 계속 조회하고, 끝나면 연결과 캐시를 새로 만듭니다.
+    """
+    meta = load_local_meta(DB_PATH)
+    with st.sidebar:
+        st.markdown("### 데이터베이스")
+        if meta.get('refreshed_at'):
+            st.caption(f"마지막 갱신: {meta['refreshed_at']} ({'증분' if meta.get('source') == 'delta' else '전체'})")
+        dataset = current_dataset()
+        if dataset is not None:
+            st.caption(f"공유 데이터셋 적재: {dataset.loaded_at}")
+        if _remote_has_update():
+            st.info("새 데이터가 있습니다.")
+
+        if st.button("🔄 DB 업데이트 확인", key="db_refresh_btn"):
+            try:
+                progress = st.progress(0)
+                with st.spinner("최신 데이터를 확인하는 중..."):
+                    result = refresh_database(
+                        DB_PATH, DB_URL,
+                        progress_callback=lambda done, total: progress.progress(done / total),
+                    )
+            except Exception as e:
+                st.error(f"❌ DB 업데이트 중 오류 발생: {e}")
+                return
+
+            if result['status'] == 'current':
+                st.success("✅ 이미 최신 데이터입니다.")
+                return
+            if result['status'] == 'delta':
+                st.success(f"✅ 증분 업데이트 완료: {result['rows']:,}행 반영 ({result['elapsed']:.1f}초)")
+            else:
+                st.success(f"✅ 전체 업데이트 완료 ({result['elapsed']:.1f}초)")
+            # 새 파일/데이터로 다시 연결합니다. 기존 연결은 다른 세션이 아직 쓰고 있을 수 있으므로 닫지 않고
+            # 캐시에서만 빼며, 더 이상 쓰는 곳이 없으면 정리됩니다.
+            # 데이터셋/카탈로그/일일 집계는 DB 버전으로 구분되므로 따로 비우지 않아도 다시 만들어집니다.
+            get_connection.clear()
+            _remote_has_update.clear()
+            st.rerun()
+
+def read_data_from_db(conn, table_name, columns=None, stage=None, start_date=None, end_date=None, jig=None, jig_col=None):
     """
     데이터베이스에서 지정된 테이블의 데이터를 읽어 DataFrame으로 반환합니다.
+    stage를 지정하면 날짜 구간/지그 조건을 SQL WHERE 절로, columns를 SELECT 절로 넘겨
+    SQLite가 필요한 행과 컬럼만 돌려주도록 합니다.
+    Args:
+        conn: SQLite 연결.
+        table_name (str): 조회할 테이블.
+        columns (list | None): 가져올 컬럼. None이면 전체 컬럼.
+        stage (str | None): Stage 이름 또는 탭 키 (예: 'Fw', 'fw').
+        start_date, end_date (date | None): 조회할 날짜 구간 (양 끝 포함).
+        jig: 지그 값. None이면 모든 지그.
+        jig_col (str | None): 지그 컬럼. None이면 Stage 설정의 지그 컬럼.
     """
     if conn is None:
         return pd.DataFrame()
         
     try:
-        query = f"SELECT * FROM {table_name}"
-        df = pd.read_sql_query(query, conn)
+        with span('read_data_from_db', stage=stage) as sp:
+            df = query_stage_data(conn, stage, columns, start_date, end_date, jig, jig_col, table_name)
+            sp.set_frame(df)
         return df
     except Exception as e:
         st.error(f"테이블 '{table_name}'에서 데이터를 불러오는 중 오류가 발생했습니다: {e}")
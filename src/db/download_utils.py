@@ -0,0 +1,252 @@
+#
+# download_utils.py
+# DB 파일을 HTTP Range 요청으로 여러 구간에 나눠 병렬로 내려받습니다.
+# 받는 동안에는 '<파일>.part'에 쓰고 진행 상황을 '<파일>.part.json'에 기록하므로, 중단되어도 이어받을 수 있습니다.
+# 크기와 체크섬 검증을 통과한 경우에만 최종 경로로 원자적으로 교체하므로, 덜 받은 파일이 열리는 일이 없습니다.
+# Streamlit에 의존하지 않으므로 로컬 HTTP 서버를 띄워 그대로 시험할 수 있습니다.
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+DEFAULT_WORKERS = 4
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+MAX_SEGMENT_SIZE = 64 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+SEGMENT_RETRIES = 3
+
+SQLITE_MAGIC = b'SQLite format 3\x00'
+
+class DownloadError(Exception):
+    """다운로드 또는 검증에 실패했을 때 발생합니다."""
+
+def is_sqlite_file(path):
+    """파일이 SQLite 헤더로 시작하면 True."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+def segment_size_for(total_size, workers=DEFAULT_WORKERS):
+    """
+    파일 크기에 맞춰 구간 크기를 정합니다. 작업자마다 4개 정도의 구간이 돌아가도록 나누되,
+    너무 잘게 쪼개지거나 한 구간이 지나치게 커지지 않도록 범위를 제한합니다.
+    """
+    target = total_size // max(workers * 4, 1)
+    return max(MIN_SEGMENT_SIZE, min(MAX_SEGMENT_SIZE, target))
+
+def _expected_md5(headers):
+    """응답 헤더(x-goog-hash, Content-MD5)에서 MD5 값을 16진수 문자열로 꺼냅니다. 없으면 None."""
+    values = []
+    for name in ('x-goog-hash', 'Content-MD5'):
+        if headers.get(name):
+            values += [part.strip() for part in headers[name].split(',')]
+    for value in values:
+        if value.startswith('md5='):
+            value = value[len('md5='):]
+        elif '=' in value.rstrip('='):
+            # crc32c 등 다른 알고리즘
+            continue
+        try:
+            return base64.b64decode(value).hex()
+        except ValueError:
+            continue
+    return None
+
+def probe_remote_file(url, session=None, timeout=30):
+    """
+    HEAD 요청으로 원격 파일 정보를 확인합니다.
+    Returns:
+        dict: {'size', 'ranges', 'etag', 'last_modified', 'md5'}. 크기를 알 수 없으면 size는 None.
+    """
+    session = session or requests
+    response = session.head(url, timeout=timeout, allow_redirects=True)
+    response.raise_for_status()
+    headers = response.headers
+    size = headers.get('Content-Length')
+    return {
+        'size': int(size) if size is not None else None,
+        'ranges': headers.get('Accept-Ranges', '').lower() == 'bytes',
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'md5': _expected_md5(headers),
+    }
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _load_state(state_path, remote):
+    """이전 다운로드 기록이 같은 원격 파일(크기/ETag)에 대한 것이면 완료된 구간 목록을 반환합니다."""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('size') != remote['size'] or state.get('etag') != remote['etag']:
+        return None
+    return state
+
+def _save_state(state_path, state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+def _discard(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _download_segment(session, url, part_path, start, end, etag, timeout, on_bytes):
+    """[start, end] 구간을 받아 part 파일의 같은 위치에 씁니다. 실패하면 몇 번 다시 시도합니다."""
+    headers = {'Range': f'bytes={start}-{end}'}
+    if etag:
+        # 받는 도중 원격 파일이 바뀌면 206 대신 전체 응답(200)이 오므로 다른 버전의 구간이 섞이지 않습니다.
+        headers['If-Range'] = etag
+
+    last_error = None
+    for attempt in range(SEGMENT_RETRIES):
+        written = 0
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as r:
+                if r.status_code == 429 or r.status_code >= 500:
+                    # 서버의 일시적인 오류이므로 연결 오류와 같이 잠시 뒤 다시 시도합니다.
+                    raise requests.HTTPError(f"HTTP {r.status_code}", response=r)
+                if r.status_code != 206:
+                    # 200은 원격 파일이 바뀌었거나(If-Range 불일치) Range를 지원하지 않는 경우, 416은 구간이 맞지 않는
+                    # 경우이므로 다시 시도해도 소용없습니다.
+                    raise DownloadError(f"구간 요청에 부분 응답(206)이 오지 않았습니다: HTTP {r.status_code}")
+                with open(part_path, 'r+b') as f:
+                    f.seek(start)
+                    for chunk in r.iter_content(chunk_size=READ_CHUNK_SIZE):
+                        f.write(chunk)
+                        written += len(chunk)
+                        on_bytes(len(chunk))
+            if written == end - start + 1:
+                return
+            last_error = f"구간 크기가 맞지 않습니다: {written} / {end - start + 1} bytes"
+        except (requests.RequestException, OSError) as e:
+            last_error = e
+        # 다시 받을 구간만큼 진행률을 되돌립니다.
+        on_bytes(-written)
+        time.sleep(min(2 ** attempt, 10))
+    raise DownloadError(f"구간 {start}-{end} 다운로드 실패: {last_error}")
+
+def _download_single(session, url, part_path, timeout, on_bytes):
+    """Range를 지원하지 않는 서버에서 한 번에 받습니다."""
+    with session.get(url, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        with open(part_path, 'wb') as f:
+            for chunk in r.iter_content(chunk_size=READ_CHUNK_SIZE):
+                f.write(chunk)
+                on_bytes(len(chunk))
+        return _expected_md5(r.headers)
+
+def download_file(url, dest_path, workers=DEFAULT_WORKERS, progress_callback=None, validate=None,
+                  expected_md5=None, session=None, timeout=600):
+    """
+    원격 파일을 병렬 구간 다운로드로 받아 검증 후 dest_path로 교체합니다.
+    Args:
+        url (str): 받을 파일 URL.
+        dest_path (str): 최종 저장 경로. 검증을 통과한 경우에만 교체됩니다.
+        workers (int): 동시에 받을 구간 수.
+        progress_callback (callable | None): (받은 바이트, 전체 바이트)를 받는 함수. 호출한 스레드에서 실행됩니다.
+        validate (callable | None): 임시 파일 경로를 받아 사용할 수 있으면 True를 반환하는 함수.
+        expected_md5 (str | None): 기대하는 MD5(16진수). None이면 서버가 알려 준 값을 사용합니다.
+        session (requests.Session | None): 재사용할 HTTP 세션.
+        timeout (int): 요청별 제한 시간(초).
+    Returns:
+        dict: probe_remote_file() 결과에 'resumed_bytes', 'elapsed'를 더한 정보.
+    """
+    session = session or requests.Session()
+    part_path = dest_path + '.part'
+    state_path = part_path + '.json'
+    started = time.time()
+
+    remote = probe_remote_file(url, session, timeout=min(timeout, 30))
+    total = remote['size']
+
+    lock = threading.Lock()
+    received = [0]
+
+    def on_bytes(n):
+        with lock:
+            received[0] += n
+
+    def report():
+        if progress_callback is not None and total:
+            progress_callback(min(received[0], total), total)
+
+    resumed_bytes = 0
+    if remote['ranges'] and total:
+        state = _load_state(state_path, remote)
+        if state is None or not os.path.exists(part_path):
+            state = {'url': url, 'size': total, 'etag': remote['etag'],
+                     'segment_size': segment_size_for(total, workers), 'done': []}
+            with open(part_path, 'wb') as f:
+                f.truncate(total)
+            _save_state(state_path, state)
+
+        # 이어받을 때는 처음 정한 구간 크기를 그대로 사용해야 완료 기록과 구간이 맞습니다.
+        step = state['segment_size']
+        segments = [(start, min(start + step, total) - 1) for start in range(0, total, step)]
+        done = {tuple(seg) for seg in state['done']}
+        pending = [seg for seg in segments if seg not in done]
+        resumed_bytes = sum(end - start + 1 for start, end in done)
+        received[0] = resumed_bytes
+
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                pool.submit(_download_segment, session, url, part_path, start, end, remote['etag'], timeout, on_bytes): (start, end)
+                for start, end in pending
+            }
+            not_done = set(futures)
+            while not_done:
+                finished, not_done = wait(not_done, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    # 예외가 있으면 여기서 전달됩니다. 완료된 구간 기록은 남겨 두어 다음에 이어받습니다.
+                    future.result()
+                    state['done'].append(list(futures[future]))
+                if finished:
+                    _save_state(state_path, state)
+                report()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        md5 = expected_md5 or remote['md5']
+    else:
+        # Range를 쓸 수 없으면 이어받기 없이 한 번에 받습니다.
+        served_md5 = _download_single(session, url, part_path, timeout, on_bytes)
+        md5 = expected_md5 or served_md5 or remote['md5']
+        report()
+
+    part_size = os.path.getsize(part_path)
+    if total is not None and part_size != total:
+        _discard(part_path, state_path)
+        raise DownloadError(f"파일 크기가 맞지 않습니다: {part_size} / {total} bytes")
+    if md5 and file_md5(part_path) != md5.lower():
+        _discard(part_path, state_path)
+        raise DownloadError("체크섬(MD5)이 일치하지 않습니다. 파일을 다시 받아야 합니다.")
+    if validate is not None and not validate(part_path):
+        _discard(part_path, state_path)
+        raise DownloadError("받은 파일이 올바른 형식이 아닙니다.")
+
+    os.replace(part_path, dest_path)
+    _discard(state_path)
+
+    remote['resumed_bytes'] = resumed_bytes
+    remote['elapsed'] = time.time() - started
+    return remote
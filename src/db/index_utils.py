@@ -0,0 +1,130 @@
+#
+# index_utils.py
+# 내려받은 SQLite 파일에 조회/집계용 인덱스를 만들고 ANALYZE를 실행합니다.
+# 작업 완료 여부는 파일 안의 app_meta 테이블에 기록하므로, 새로 내려받은 파일에서만 한 번 실행됩니다.
+
+import sqlite3
+import uuid
+
+from src.db.query_utils import HISTORY_TABLE, quote_identifier, get_table_columns, serial_index_table
+from src.services.stage_registry import STAGE_SPECS, get_stage_spec
+
+# 인덱스 구성이 바뀌면 이 값을 올립니다. 기존 파일도 다음 연결 때 다시 인덱싱됩니다.
+INDEX_SCHEMA_VERSION = 3
+
+META_TABLE = 'app_meta'
+
+def get_meta(conn, key, default=None):
+    """app_meta 테이블에서 값을 읽습니다. 테이블이 없으면 default를 반환합니다."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (META_TABLE,)
+    ).fetchone()
+    if not exists:
+        return default
+    row = conn.execute(f"SELECT value FROM {META_TABLE} WHERE key=?", (key,)).fetchone()
+    return default if row is None else row[0]
+
+def set_meta(conn, key, value):
+    """app_meta 테이블에 값을 기록합니다. 커밋은 호출한 쪽에서 합니다."""
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute(f"INSERT OR REPLACE INTO {META_TABLE} (key, value) VALUES (?, ?)", (key, str(value)))
+
+def planned_indexes(conn, table_name=HISTORY_TABLE):
+    """
+    테이블에 실제로 있는 컬럼만으로 만들 인덱스 목록을 반환합니다.
+    Returns:
+        list: (인덱스명, 컬럼 목록) 튜플 목록.
+    """
+    table_columns = set(get_table_columns(conn, table_name))
+    indexes = []
+
+    def add(name, columns):
+        columns = [col for col in columns if col in table_columns]
+        if columns:
+            indexes.append((f"idx_{table_name}_{name}", columns))
+
+    if 'SNumber' in table_columns:
+        add('snumber', ['SNumber'])
+
+    for stage in STAGE_SPECS:
+        spec = get_stage_spec(stage)
+        if spec['date_col'] not in table_columns:
+            continue
+        # 날짜 구간 조회 + 분석 컬럼을 인덱스만으로 읽을 수 있는 커버링 인덱스
+        add(f"{stage.lower()}_date", [spec['date_col'], spec['db_jig_col'], spec['serial_col'], spec['pass_col']])
+        # 지그 목록(DISTINCT)과 지그 + 날짜 조건 조회용 인덱스
+        add(f"{stage.lower()}_jig", [spec['db_jig_col'], spec['date_col']])
+    return indexes
+
+def build_serial_index(conn, table_name=HISTORY_TABLE):
+    """
+    고유 SNumber만 담은 검색용 테이블을 다시 만듭니다.
+    FTS5 trigram을 지원하면 부분 문자열 검색용 전문 인덱스로, 아니면 일반 테이블로 만듭니다.
+    Returns:
+        str | None: 'fts' 또는 'table'. SNumber 컬럼이 없으면 None.
+    """
+    if 'SNumber' not in get_table_columns(conn, table_name):
+        return None
+
+    serial_table = quote_identifier(serial_index_table(table_name))
+    conn.execute(f"DROP TABLE IF EXISTS {serial_table}")
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE {serial_table} USING fts5(SNumber, tokenize='trigram')")
+        kind = 'fts'
+    except sqlite3.OperationalError:
+        conn.execute(f"CREATE TABLE {serial_table} (SNumber TEXT PRIMARY KEY)")
+        # 검색은 대소문자를 구분하지 않으므로(= ... COLLATE NOCASE, LIKE) NOCASE 인덱스를 따로 둡니다.
+        # 기본 키는 BINARY 그대로 두어 대소문자만 다른 시리얼도 각각 남깁니다.
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote_identifier(serial_index_table(table_name) + '_nocase')} "
+            f"ON {serial_table} (SNumber COLLATE NOCASE)"
+        )
+        kind = 'table'
+
+    conn.execute(
+        f"INSERT INTO {serial_table} (SNumber) "
+        f"SELECT DISTINCT SNumber FROM {quote_identifier(table_name)} WHERE SNumber IS NOT NULL"
+    )
+    return kind
+
+def needs_indexing(conn):
+    """현재 파일의 인덱스 버전이 INDEX_SCHEMA_VERSION보다 낮으면 True."""
+    return int(get_meta(conn, 'index_version', 0)) < INDEX_SCHEMA_VERSION
+
+def ensure_indexes(conn, table_name=HISTORY_TABLE, progress_callback=None):
+    """
+    필요한 인덱스와 SNumber 검색용 테이블을 만들고 ANALYZE를 실행한 뒤 완료 사실을 기록합니다. 이미 완료된 파일이면 아무것도 하지 않습니다.
+    Args:
+        conn: 쓰기 가능한 SQLite 연결.
+        table_name (str): 인덱스를 만들 테이블.
+        progress_callback (callable | None): (완료한 단계 수, 전체 단계 수)를 받는 함수.
+    Returns:
+        bool: 이번 호출에서 인덱스를 만들었으면 True.
+    """
+    if not needs_indexing(conn):
+        return False
+
+    indexes = planned_indexes(conn, table_name)
+    total_steps = len(indexes) + 2
+    for step, (index_name, columns) in enumerate(indexes, start=1):
+        column_list = ', '.join(quote_identifier(col) for col in columns)
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote_identifier(index_name)} "
+            f"ON {quote_identifier(table_name)} ({column_list})"
+        )
+        if progress_callback is not None:
+            progress_callback(step, total_steps)
+
+    build_serial_index(conn, table_name)
+    if progress_callback is not None:
+        progress_callback(total_steps - 1, total_steps)
+
+    conn.execute("ANALYZE")
+    if get_meta(conn, 'db_id') is None:
+        # 내려받은 파일마다 고유한 값. 델타 반영으로는 바뀌지 않으므로 파생 데이터(롤업 등)가 같은 파일인지 확인하는 데 씁니다.
+        set_meta(conn, 'db_id', uuid.uuid4().hex)
+    set_meta(conn, 'index_version', INDEX_SCHEMA_VERSION)
+    conn.commit()
+    if progress_callback is not None:
+        progress_callback(total_steps, total_steps)
+    return True
@@ -0,0 +1,256 @@
+#
+# query_utils.py
+# historyinspection 조회용 SQL을 만드는 함수 모음입니다.
+# 날짜/지그 조건과 컬럼 선택을 SQLite에서 처리하도록 하여 필요한 행과 컬럼만 pandas로 가져옵니다.
+# Streamlit에 의존하지 않으므로 배치 작업에서도 그대로 사용할 수 있습니다.
+
+import re
+import pandas as pd
+from datetime import date, datetime, timedelta
+
+from src.services.stage_registry import get_stage_spec
+
+HISTORY_TABLE = 'historyinspection'
+
+# SNumber 검색 방식
+SEARCH_MODES = ('contains', 'prefix', 'exact')
+
+# 텍스트 타임스탬프의 앞부분 형식 → 날짜 경계값을 만들 strftime 형식
+_TEXT_TIMESTAMP_LAYOUTS = [
+    (re.compile(r'^\d{8}'), '%Y%m%d'),
+    (re.compile(r'^\d{4}-\d{2}-\d{2}'), '%Y-%m-%d'),
+    (re.compile(r'^\d{4}/\d{2}/\d{2}'), '%Y/%m/%d'),
+]
+
+def quote_identifier(name):
+    """테이블/컬럼명을 SQL 식별자로 안전하게 감쌉니다."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def database_path(conn):
+    """연결된 main DB 파일 경로."""
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+def get_table_columns(conn, table_name=HISTORY_TABLE):
+    """테이블의 컬럼명 목록을 반환합니다."""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")]
+
+def detect_timestamp_layout(conn, date_col, table_name=HISTORY_TABLE):
+    """
+    날짜 컬럼의 저장 형식을 값 하나로 판별합니다.
+    Returns:
+        dict | None: {'kind': 'text' | 'number', 'format': 날짜 부분 strftime 형식, 'width': 전체 자릿수}.
+            알 수 없는 형식이면 None (이 경우 날짜 조건은 pandas에서 처리해야 합니다).
+    """
+    column = quote_identifier(date_col)
+    row = conn.execute(
+        f"SELECT {column} FROM {quote_identifier(table_name)} "
+        f"WHERE {column} IS NOT NULL AND {column} != '' LIMIT 1"
+    ).fetchone()
+    if row is None:
+        return None
+
+    value = row[0]
+    if isinstance(value, (int, float)):
+        digits = str(int(value))
+        if len(digits) >= 8:
+            return {'kind': 'number', 'format': '%Y%m%d', 'width': len(digits)}
+        return None
+
+    for pattern, fmt in _TEXT_TIMESTAMP_LAYOUTS:
+        if pattern.match(str(value)):
+            return {'kind': 'text', 'format': fmt, 'width': len(str(value))}
+    return None
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.to_datetime(value).date()
+
+def date_range_predicate(layout, date_col, start_date=None, end_date=None):
+    """
+    [start_date, end_date] 구간(양 끝 포함)을 인덱스를 탈 수 있는 범위 조건으로 만듭니다.
+    Returns:
+        tuple: (SQL 조건 목록, 파라미터 목록).
+    """
+    clauses, params = [], []
+    if layout is None:
+        return clauses, params
+
+    column = quote_identifier(date_col)
+
+    def bound(d):
+        text = d.strftime(layout['format'])
+        if layout['kind'] == 'number':
+            return int(text.ljust(layout['width'], '0'))
+        return text
+
+    if start_date is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(bound(_to_date(start_date)))
+    if end_date is not None:
+        clauses.append(f"{column} < ?")
+        params.append(bound(_to_date(end_date) + timedelta(days=1)))
+    return clauses, params
+
+def day_expression(layout, date_col):
+    """날짜 컬럼 값에서 'YYYY-MM-DD' 날짜를 꺼내는 SQL 식. 해석할 수 없는 값은 NULL이 됩니다."""
+    column = quote_identifier(date_col)
+    if layout['kind'] == 'number':
+        column = f"printf('%d', {column})"
+    if layout['format'] == '%Y%m%d':
+        return f"date(substr({column}, 1, 4) || '-' || substr({column}, 5, 2) || '-' || substr({column}, 7, 2))"
+    if layout['format'] == '%Y/%m/%d':
+        return f"date(replace(substr({column}, 1, 10), '/', '-'))"
+    return f"date(substr({column}, 1, 10))"
+
+def get_stage_columns(conn, stage, jig_col=None, table_name=HISTORY_TABLE):
+    """SNumber, 지그 컬럼, 해당 Stage 접두어로 시작하는 컬럼을 테이블 순서대로 반환합니다."""
+    spec = get_stage_spec(stage)
+    wanted = {spec['serial_col'], spec['date_col'], spec['pass_col'], jig_col or spec['db_jig_col']}
+    return [col for col in get_table_columns(conn, table_name) if col in wanted or col.startswith(spec['stage'])]
+
+def build_stage_query(conn, stage=None, columns=None, start_date=None, end_date=None, jig=None, jig_col=None,
+                      table_name=HISTORY_TABLE):
+    """
+    Stage 설정으로 파라미터화된 SELECT 문을 만듭니다.
+    Args:
+        conn: SQLite 연결.
+        stage (str | None): Stage 이름 또는 탭 키. None이면 날짜/지그 조건 없이 컬럼 선택만 합니다.
+        columns (list | None): 가져올 컬럼. None이면 전체 컬럼.
+        start_date, end_date (date | None): 조회할 날짜 구간 (양 끝 포함).
+        jig: 지그 값. None이면 모든 지그.
+        jig_col (str | None): 지그 컬럼. None이면 Stage 설정의 db_jig_col.
+        table_name (str): 조회할 테이블.
+    Returns:
+        tuple: (SQL 문, 파라미터 목록).
+    """
+    table_columns = get_table_columns(conn, table_name)
+    if columns is None:
+        select_list = '*'
+    else:
+        unknown = [col for col in columns if col not in table_columns]
+        if unknown:
+            raise KeyError(f"테이블 '{table_name}'에 없는 컬럼입니다: {unknown}")
+        select_list = ', '.join(quote_identifier(col) for col in columns)
+
+    clauses, params = [], []
+    if stage is not None:
+        spec = get_stage_spec(stage)
+        date_col = spec['date_col']
+        if (start_date is not None or end_date is not None) and date_col in table_columns:
+            layout = detect_timestamp_layout(conn, date_col, table_name)
+            date_clauses, date_params = date_range_predicate(layout, date_col, start_date, end_date)
+            clauses += date_clauses
+            params += date_params
+
+        jig_col = jig_col or spec['db_jig_col']
+        if jig is not None and jig_col in table_columns:
+            clauses.append(f"{quote_identifier(jig_col)} = ?")
+            # numpy 스칼라는 sqlite3가 바인딩하지 못하므로 파이썬 값으로 바꿉니다.
+            params.append(jig.item() if hasattr(jig, 'item') else jig)
+
+    query = f"SELECT {select_list} FROM {quote_identifier(table_name)}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    return query, params
+
+def query_stage_data(conn, stage=None, columns=None, start_date=None, end_date=None, jig=None, jig_col=None,
+                     table_name=HISTORY_TABLE):
+    """build_stage_query()로 만든 SQL을 실행해 DataFrame으로 반환합니다."""
+    query, params = build_stage_query(conn, stage, columns, start_date, end_date, jig, jig_col, table_name)
+    return pd.read_sql_query(query, conn, params=params)
+
+def serial_index_table(table_name=HISTORY_TABLE):
+    """고유 SNumber 검색용 테이블 이름 (index_utils.build_serial_index()가 생성)."""
+    return f"{table_name}_sn"
+
+def _serial_index_kind(conn, table_name):
+    """검색용 테이블이 FTS5 trigram이면 'fts', 일반 테이블이면 'table', 없으면 None."""
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (serial_index_table(table_name),)
+    ).fetchone()
+    if row is None:
+        return None
+    return 'fts' if 'fts5' in (row[0] or '').lower() else 'table'
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_snumber(conn, query, mode='contains', table_name=HISTORY_TABLE):
+    """
+    SNumber 검색 결과의 전체 검사 이력을 반환합니다. 대소문자는 구분하지 않습니다.
+    고유 SNumber 검색용 테이블(FTS5 trigram)에서 먼저 시리얼을 찾고, SNumber 인덱스로 이력을 가져옵니다.
+    Args:
+        conn: SQLite 연결.
+        query (str): 검색어.
+        mode (str): 'contains'(포함), 'prefix'(앞부분 일치), 'exact'(정확히 일치).
+        table_name (str): 검사 이력 테이블.
+    Returns:
+        pd.DataFrame: 일치하는 시리얼들의 모든 행.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"알 수 없는 검색 방식입니다: {mode} (사용 가능: {', '.join(SEARCH_MODES)})")
+
+    if mode == 'exact':
+        condition, params = "SNumber = ? COLLATE NOCASE", [query]
+    elif mode == 'prefix':
+        condition, params = "SNumber LIKE ? ESCAPE '\\'", [_escape_like(query) + '%']
+    else:
+        condition, params = "SNumber LIKE ? ESCAPE '\\'", ['%' + _escape_like(query) + '%']
+
+    table = quote_identifier(table_name)
+    index_kind = _serial_index_kind(conn, table_name)
+    if index_kind is None:
+        # 검색용 테이블이 없으면 이력 테이블 전체를 검색합니다.
+        return pd.read_sql_query(f"SELECT * FROM {table} WHERE {condition}", conn, params=params)
+
+    serial_table = quote_identifier(serial_index_table(table_name))
+    if index_kind == 'fts' and len(query) >= 3:
+        # trigram 인덱스로 후보를 좁힌 뒤 검색 방식 조건을 적용합니다.
+        condition = f"{serial_table} MATCH ? AND {condition}"
+        params = ['"' + query.replace('"', '""') + '"'] + params
+
+    return pd.read_sql_query(
+        f"SELECT * FROM {table} WHERE SNumber IN (SELECT SNumber FROM {serial_table} WHERE {condition})",
+        conn, params=params,
+    )
+
+def get_distinct_values(conn, column, table_name=HISTORY_TABLE):
+    """컬럼의 NULL이 아닌 고유값 목록을 반환합니다."""
+    column = quote_identifier(column)
+    rows = conn.execute(
+        f"SELECT DISTINCT {column} FROM {quote_identifier(table_name)} WHERE {column} IS NOT NULL"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+def get_date_bounds(conn, date_col, table_name=HISTORY_TABLE):
+    """
+    날짜 컬럼의 최소/최대 날짜를 반환합니다.
+    Returns:
+        tuple: (최소 date, 최대 date). 값이 없거나 해석할 수 없으면 (None, None).
+    """
+    column = quote_identifier(date_col)
+    row = conn.execute(
+        f"SELECT MIN({column}), MAX({column}) FROM {quote_identifier(table_name)} "
+        f"WHERE {column} IS NOT NULL AND {column} != ''"
+    ).fetchone()
+    if row is None:
+        return None, None
+
+    bounds = [_parse_date_value(value) for value in row]
+    if None in bounds:
+        return None, None
+    return bounds[0], bounds[1]
+
+def _parse_date_value(value):
+    """DB에 저장된 타임스탬프 값 하나를 date로 바꿉니다. 해석할 수 없으면 None."""
+    if value is None:
+        return None
+    text = str(int(value)) if isinstance(value, (int, float)) else str(value).strip()
+    if re.match(r'^\d{8}', text):
+        parsed = pd.to_datetime(text[:8], format='%Y%m%d', errors='coerce')
+    else:
+        parsed = pd.to_datetime(text, errors='coerce')
+    return None if pd.isna(parsed) else parsed.date()
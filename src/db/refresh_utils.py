@@ -0,0 +1,266 @@
+#
+# refresh_utils.py
+# 로컬 DB 파일을 원격 최신본과 맞춥니다.
+# 1) 조건부 요청(ETag/Last-Modified)으로 바뀐 것이 없으면 아무것도 받지 않습니다.
+# 2) 서버가 델타 목록(manifest)을 제공하면 로컬 워터마크 이후의 배치만 받아 한 트랜잭션으로 반영합니다.
+# 3) 그 외에는 전체 파일을 옆 경로에 받아 인덱싱까지 마친 뒤 원자적으로 교체합니다.
+# 반영이 끝나기 전까지 앱은 기존 파일을 그대로 사용합니다. Streamlit에 의존하지 않습니다.
+#
+# 델타 목록 형식 (JSON):
+#   {"target_etag": "<반영 후 원격 파일의 ETag>",
+#    "deltas": [{"url": "...", "from_watermark": 100, "to_watermark": 250, "md5": "<선택>"}, ...]}
+# 각 델타는 historyinspection 테이블에 (from_watermark, to_watermark] 구간의 행을 담은 SQLite 파일입니다.
+# 델타의 rowid는 원격 DB의 rowid와 같아야 합니다. 이미 있는 rowid의 행은 새 값으로 바뀌고, 없는 rowid는 추가됩니다.
+
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from urllib.parse import urljoin
+
+import requests
+
+from src.db.download_utils import download_file, file_md5, is_sqlite_file, probe_remote_file
+from src.db.index_utils import ensure_indexes, get_meta, set_meta
+from src.db.query_utils import HISTORY_TABLE, quote_identifier, get_table_columns, serial_index_table
+
+META_SUFFIX = '.meta.json'
+DELTA_MANIFEST_SUFFIX = '.deltas.json'
+
+def load_local_meta(db_path):
+    """DB 파일 옆의 메타 정보(ETag, Last-Modified, MD5 등)를 읽습니다. 없으면 빈 dict."""
+    try:
+        with open(db_path + META_SUFFIX, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_local_meta(db_path, meta):
+    tmp_path = db_path + META_SUFFIX + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, db_path + META_SUFFIX)
+
+def record_download(db_path, info):
+    """download_file() 결과를 로컬 메타 정보로 저장합니다."""
+    meta = {
+        'etag': info.get('etag'),
+        'last_modified': info.get('last_modified'),
+        'md5': info.get('md5'),
+        'size': info.get('size'),
+        'refreshed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'source': 'full',
+    }
+    save_local_meta(db_path, meta)
+    return meta
+
+def check_remote_update(url, db_path, session=None, timeout=30):
+    """
+    조건부 HEAD 요청으로 원격 파일이 로컬 파일과 달라졌는지 확인합니다.
+    Returns:
+        dict | None: 달라졌으면 원격 파일 정보, 같으면 None.
+    """
+    session = session or requests
+    meta = load_local_meta(db_path)
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+
+    response = session.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+
+    remote = probe_remote_file(url, session, timeout=timeout)
+    if meta.get('etag') and remote['etag'] == meta['etag']:
+        return None
+    if not meta and remote['md5'] and os.path.exists(db_path) and file_md5(db_path) == remote['md5']:
+        # 메타 정보가 없던 기존 파일: 내용이 같으면 기록만 남기고 최신으로 간주합니다.
+        record_download(db_path, remote)
+        return None
+    return remote
+
+def get_watermark(conn, table_name=HISTORY_TABLE):
+    """로컬 DB에 반영된 마지막 행 번호. 기록이 없으면 테이블의 최대 rowid."""
+    value = get_meta(conn, 'watermark')
+    if value is not None:
+        return int(value)
+    row = conn.execute(f"SELECT MAX(rowid) FROM {quote_identifier(table_name)}").fetchone()
+    return int(row[0] or 0)
+
+def fetch_delta_manifest(manifest_url, session=None, timeout=30):
+    """델타 목록을 가져옵니다. 서버가 제공하지 않으면 None."""
+    session = session or requests
+    try:
+        response = session.get(manifest_url, timeout=timeout)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+def plan_deltas(manifest, watermark):
+    """
+    로컬 워터마크부터 끊김 없이 이어지는 델타 목록을 고릅니다.
+    Returns:
+        list | None: 반영할 델타 목록. 이어지지 않으면 None (전체 다운로드 필요).
+    """
+    deltas = sorted(manifest.get('deltas', []), key=lambda d: int(d['from_watermark']))
+    chain, current = [], watermark
+    for delta in deltas:
+        if int(delta['to_watermark']) <= current:
+            continue
+        if int(delta['from_watermark']) != current:
+            return None
+        chain.append(delta)
+        current = int(delta['to_watermark'])
+    return chain
+
+def apply_delta(conn, delta_path, to_watermark, table_name=HISTORY_TABLE):
+    """
+    델타 파일의 행을 한 트랜잭션으로 반영하고 워터마크를 올립니다.
+    historyinspection에는 기본 키가 없으므로 rowid를 함께 복사합니다. 같은 rowid의 행은 새 값으로 바뀌고,
+    새 rowid의 행은 추가됩니다. 검색용 테이블에는 새 SNumber를 추가하고, 바뀐 행에서 사라진 SNumber는 뺍니다.
+    기존 행이 바뀌었으면 app_meta의 delta_seq를 올려 롤업이 다시 만들어지게 합니다.
+    Returns:
+        int: 반영한 행 수.
+    """
+    conn.execute("ATTACH DATABASE ? AS delta", (delta_path,))
+    try:
+        delta_columns = {row[1] for row in conn.execute(f"PRAGMA delta.table_info({quote_identifier(table_name)})")}
+        columns = [col for col in get_table_columns(conn, table_name) if col in delta_columns]
+        if not columns:
+            raise ValueError(f"델타 파일에 '{table_name}' 테이블이 없습니다: {delta_path}")
+        column_list = ', '.join(quote_identifier(col) for col in columns)
+        table = quote_identifier(table_name)
+
+        with conn:
+            serial_table = quote_identifier(serial_index_table(table_name))
+            has_serial_index = conn.execute(
+                "SELECT 1 FROM main.sqlite_master WHERE type='table' AND name=?", (serial_index_table(table_name),)
+            ).fetchone()
+            sync_serials = has_serial_index and 'SNumber' in columns
+            replaced = conn.execute(
+                f"SELECT COUNT(*) FROM main.{table} WHERE rowid IN (SELECT rowid FROM delta.{table})"
+            ).fetchone()[0]
+            if sync_serials and replaced:
+                # 바뀌는 행의 기존 SNumber를 기억해 두었다가, 반영 후 더 이상 없는 시리얼을 검색용 테이블에서 뺍니다.
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS delta_old_serials (SNumber)")
+                conn.execute("DELETE FROM temp.delta_old_serials")
+                conn.execute(
+                    f"INSERT INTO temp.delta_old_serials SELECT DISTINCT SNumber FROM main.{table} "
+                    f"WHERE rowid IN (SELECT rowid FROM delta.{table}) AND SNumber IS NOT NULL"
+                )
+
+            cursor = conn.execute(
+                f"INSERT OR REPLACE INTO main.{table} (rowid, {column_list}) "
+                f"SELECT rowid, {column_list} FROM delta.{table}"
+            )
+            applied = cursor.rowcount
+            if sync_serials:
+                conn.execute(
+                    f"INSERT INTO {serial_table} (SNumber) SELECT DISTINCT SNumber FROM delta.{table} "
+                    f"WHERE SNumber IS NOT NULL AND SNumber NOT IN (SELECT SNumber FROM {serial_table})"
+                )
+                if replaced:
+                    conn.execute(
+                        f"DELETE FROM {serial_table} WHERE SNumber IN ("
+                        f"SELECT o.SNumber FROM temp.delta_old_serials o "
+                        f"WHERE NOT EXISTS (SELECT 1 FROM main.{table} h WHERE h.SNumber = o.SNumber))"
+                    )
+                    conn.execute("DELETE FROM temp.delta_old_serials")
+            if replaced:
+                # 기존 행이 바뀌면 워터마크만으로는 다시 계산할 날짜를 알 수 없으므로,
+                # 파생 데이터(롤업)가 다시 만들어지도록 기록해 둡니다.
+                set_meta(conn, 'delta_seq', int(get_meta(conn, 'delta_seq', 0)) + 1)
+            set_meta(conn, 'watermark', int(to_watermark))
+    finally:
+        conn.execute("DETACH DATABASE delta")
+    return applied
+
+def _apply_delta_chain(db_path, chain, manifest_url, session, timeout):
+    """델타들을 받아 순서대로 반영합니다. 반영한 전체 행 수를 반환합니다."""
+    applied = 0
+    conn = sqlite3.connect(db_path)
+    try:
+        for delta in chain:
+            delta_path = f"{db_path}.delta-{delta['to_watermark']}"
+            try:
+                download_file(urljoin(manifest_url, delta['url']), delta_path, validate=is_sqlite_file,
+                              expected_md5=delta.get('md5'), session=session, timeout=timeout)
+                applied += apply_delta(conn, delta_path, delta['to_watermark'])
+            finally:
+                if os.path.exists(delta_path):
+                    os.remove(delta_path)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    return applied
+
+def _replace_with_full_copy(db_path, url, session, timeout, progress_callback):
+    """새 파일을 옆 경로에 받아 인덱싱까지 마친 뒤 기존 파일과 교체합니다."""
+    new_path = db_path + '.new'
+    info = download_file(url, new_path, progress_callback=progress_callback, validate=is_sqlite_file,
+                         session=session, timeout=timeout)
+    conn = sqlite3.connect(new_path)
+    try:
+        ensure_indexes(conn)
+    finally:
+        conn.close()
+    # 열려 있는 기존 연결은 교체 전 파일을 계속 읽으므로, 새 연결부터 새 파일을 사용합니다.
+    os.replace(new_path, db_path)
+    return info
+
+def refresh_database(db_path, url, manifest_url=None, session=None, timeout=600, progress_callback=None):
+    """
+    로컬 DB를 원격 최신본으로 갱신합니다.
+    Args:
+        db_path (str): 로컬 DB 경로.
+        url (str): 원격 DB URL.
+        manifest_url (str | None): 델타 목록 URL. None이면 '<url>.deltas.json'.
+        session (requests.Session | None): 재사용할 HTTP 세션.
+        timeout (int): 요청별 제한 시간(초).
+        progress_callback (callable | None): 전체 다운로드 시 (받은 바이트, 전체 바이트)를 받는 함수.
+    Returns:
+        dict: {'status': 'current' | 'delta' | 'full', 'rows': 델타로 반영한 행 수, 'elapsed': 걸린 시간(초)}.
+            'delta' 또는 'full'이면 호출한 쪽에서 연결과 캐시를 새로 만들어야 합니다.
+    """
+    session = session or requests.Session()
+    started = time.time()
+    remote = check_remote_update(url, db_path, session=session)
+    if remote is None:
+        return {'status': 'current', 'rows': 0, 'elapsed': time.time() - started}
+
+    manifest_url = manifest_url or url + DELTA_MANIFEST_SUFFIX
+    manifest = fetch_delta_manifest(manifest_url, session=session)
+    if manifest and os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            watermark = get_watermark(conn)
+        finally:
+            conn.close()
+        chain = plan_deltas(manifest, watermark)
+        if chain is not None and manifest.get('target_etag') == remote['etag']:
+            rows = _apply_delta_chain(db_path, chain, manifest_url, session, timeout)
+            meta = load_local_meta(db_path)
+            meta.update({
+                'etag': remote['etag'],
+                'last_modified': remote['last_modified'],
+                'md5': None,
+                'size': None,
+                'refreshed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'source': 'delta',
+            })
+            save_local_meta(db_path, meta)
+            return {'status': 'delta', 'rows': rows, 'elapsed': time.time() - started}
+
+    info = _replace_with_full_copy(db_path, url, session, timeout, progress_callback)
+    record_download(db_path, info)
+    return {'status': 'full', 'rows': 0, 'elapsed': time.time() - started}
@@ -0,0 +1,276 @@
+#
+# rollup_utils.py
+# (Stage, 지그, 날짜)별 일일 집계와 날짜별 PASS/FAIL 시리얼 목록을 DB 옆의 별도 SQLite 파일('<DB>.rollup.sqlite3')에 저장합니다.
+# 과거 날짜의 집계는 한 번만 계산하고, 이후에는 새로 들어온 행(rowid 워터마크 이후)이 속한 날짜만 다시 계산합니다.
+# 델타가 기존 행을 바꾼 경우(app_meta의 delta_seq 증가)에는 전체를 다시 만듭니다.
+# 원본 DB 파일을 수정하지 않으므로 DB 버전 키(크기/수정 시각)와 컬럼형 캐시에 영향을 주지 않습니다.
+# 집계 기준은 analysis_service.analyze_data()와 같습니다 (고유 SNumber 기준).
+
+import os
+import sqlite3
+import threading
+from datetime import timedelta
+
+import pandas as pd
+
+from src.db.index_utils import get_meta
+from src.db.query_utils import HISTORY_TABLE, quote_identifier, database_path, get_date_bounds, detect_timestamp_layout, query_stage_data
+from src.services.analysis_service import AnalysisResult, build_serial_day_counts, summarize_serial_counts, empty_serial_lists
+from src.services.stage_registry import get_stage_spec
+from src.services.stage_schema import parse_stage_timestamps, encode_pass_status, compact_stage_frame
+
+ROLLUP_SUFFIX = '.rollup.sqlite3'
+# 롤업 구성이나 집계 기준이 바뀌면 이 값을 올립니다. 기존 롤업은 다음 갱신 때 다시 만들어집니다.
+ROLLUP_VERSION = 1
+# 다른 프로세스가 롤업 파일에 쓰는 동안 기다릴 최대 시간(초)
+ROLLUP_LOCK_TIMEOUT = 120
+
+_lock = threading.Lock()
+
+def rollup_path_for(db_path):
+    return db_path + ROLLUP_SUFFIX
+
+def _open_rollup(db_path):
+    # 전체 Stage 병렬 분석에서는 여러 프로세스가 같은 롤업 파일을 갱신하므로 잠금을 기다릴 시간을 넉넉히 둡니다.
+    rollup = sqlite3.connect(rollup_path_for(db_path), timeout=ROLLUP_LOCK_TIMEOUT)
+    # jig/SNumber는 원본 값의 타입(숫자/문자)을 그대로 보존하도록 타입을 지정하지 않습니다.
+    rollup.executescript("""
+        CREATE TABLE IF NOT EXISTS rollup_meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            stage TEXT, jig_col TEXT, jig, day TEXT,
+            total_test INTEGER, pass INTEGER, false_defect INTEGER, true_defect INTEGER, fail INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_daily_rollup ON daily_rollup (stage, jig_col, day, jig);
+        CREATE TABLE IF NOT EXISTS daily_serials (
+            stage TEXT, jig_col TEXT, jig, day TEXT, SNumber, has_pass INTEGER, has_fail INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_daily_serials ON daily_serials (stage, jig_col, day, jig);
+        CREATE TABLE IF NOT EXISTS rollup_days (stage TEXT, jig_col TEXT, day TEXT);
+        CREATE INDEX IF NOT EXISTS idx_rollup_days ON rollup_days (stage, jig_col, day);
+    """)
+    return rollup
+
+def _rollup_meta(rollup, key):
+    row = rollup.execute("SELECT value FROM rollup_meta WHERE key=?", (key,)).fetchone()
+    return None if row is None else row[0]
+
+def _set_rollup_meta(rollup, key, value):
+    rollup.execute("INSERT OR REPLACE INTO rollup_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+def _month_spans(start, end):
+    """[start, end] 구간을 월 단위 (시작일, 종료일) 목록으로 나눕니다."""
+    spans = []
+    current = start
+    while current <= end:
+        next_month = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+        spans.append((current, min(end, next_month - timedelta(days=1))))
+        current = next_month
+    return spans
+
+def _day_runs(days):
+    """날짜 집합을 연속된 구간 (시작일, 종료일) 목록으로 묶습니다."""
+    runs = []
+    for day in sorted(days):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+def _python_values(series):
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def _python_scalar(value):
+    return value.item() if hasattr(value, 'item') else value
+
+def _compute_span(conn, spec, jig_col, start_date, end_date):
+    """[start_date, end_date] 구간의 원본 행을 읽어 롤업 행을 만듭니다."""
+    columns = list(dict.fromkeys([spec['serial_col'], spec['date_col'], spec['pass_col'], jig_col]))
+    df = query_stage_data(conn, spec['stage'], columns, start_date, end_date, jig_col=jig_col)
+    day_col = '__rollup_dt'
+    df[day_col] = parse_stage_timestamps(df[spec['date_col']], spec, source='db')
+    if start_date is not None:
+        df = df[(df[day_col].dt.date >= start_date) & (df[day_col].dt.date <= end_date)]
+    df = df.assign(PassStatusCode=encode_pass_status(df[spec['pass_col']]))
+    compact_stage_frame(df, spec, [jig_col])
+
+    days = sorted({d.strftime('%Y-%m-%d') for d in df[day_col].dt.normalize().dropna().unique()})
+    counts = build_serial_day_counts(df, day_col, jig_col)
+
+    summary_rows = [
+        (_python_scalar(jig), day, v['total_test'], v['pass'], v['false_defect'], v['true_defect'], v['fail'])
+        for jig, per_day in summarize_serial_counts(counts).items()
+        for day, v in per_day.items()
+    ]
+    has_pass = (counts['n_pass'] > 0) & counts['SNumber'].notna()
+    serial_rows = list(zip(
+        _python_values(counts['jig']),
+        counts['day'].dt.strftime('%Y-%m-%d').tolist(),
+        _python_values(counts['SNumber']),
+        has_pass.astype(int).tolist(),
+        (counts['n_fail'] > 0).astype(int).tolist(),
+    ))
+    return days, summary_rows, serial_rows
+
+def _store_span(rollup, stage, jig_col, start_date, end_date, days, summary_rows, serial_rows):
+    key = (stage, jig_col)
+    if start_date is None:
+        where, params = "stage=? AND jig_col=?", key
+    else:
+        where, params = "stage=? AND jig_col=? AND day BETWEEN ? AND ?", key + (start_date.isoformat(), end_date.isoformat())
+    for table in ('daily_rollup', 'daily_serials', 'rollup_days'):
+        rollup.execute(f"DELETE FROM {table} WHERE {where}", params)
+
+    rollup.executemany(
+        "INSERT INTO daily_rollup (stage, jig_col, jig, day, total_test, pass, false_defect, true_defect, fail) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [key + row for row in summary_rows])
+    rollup.executemany(
+        "INSERT INTO daily_serials (stage, jig_col, jig, day, SNumber, has_pass, has_fail) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [key + row for row in serial_rows])
+    rollup.executemany("INSERT INTO rollup_days (stage, jig_col, day) VALUES (?, ?, ?)", [key + (day,) for day in days])
+
+def refresh_rollup(conn, stage, jig_col=None, table_name=HISTORY_TABLE, progress_callback=None):
+    """
+    Stage/지그 컬럼 조합의 롤업을 최신 상태로 맞춥니다.
+    처음이거나 DB 파일이 바뀌었으면 월 단위로 전체를 만들고, 그 외에는 새 행이 들어온 날짜만 다시 계산합니다.
+    Args:
+        conn: 원본 DB 연결.
+        stage (str): Stage 이름 또는 탭 키.
+        jig_col (str | None): 지그 컬럼. None이면 Stage 설정의 db_jig_col.
+        table_name (str): 원본 테이블.
+        progress_callback (callable | None): (처리한 구간 수, 전체 구간 수)를 받는 함수.
+    Returns:
+        int: 다시 계산한 구간 수. 이미 최신이면 0.
+    """
+    spec = get_stage_spec(stage)
+    jig_col = jig_col or spec['db_jig_col']
+    db_path = database_path(conn)
+    meta_key = f"{spec['stage']}|{jig_col}"
+    table = quote_identifier(table_name)
+
+    with _lock:
+        rollup = _open_rollup(db_path)
+        try:
+            # 델타가 기존 행을 바꾸면 delta_seq가 올라가므로 롤업 전체를 다시 만듭니다.
+            source_id = f"{ROLLUP_VERSION}:{get_meta(conn, 'db_id', '')}:{get_meta(conn, 'delta_seq', 0)}"
+            max_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+            watermark = _rollup_meta(rollup, meta_key + ':rowid')
+            rebuild = (_rollup_meta(rollup, meta_key + ':source') != source_id
+                       or watermark is None or max_rowid < int(watermark))
+
+            if rebuild:
+                if detect_timestamp_layout(conn, spec['date_col'], table_name) is None:
+                    # 날짜 형식을 SQL 조건으로 만들 수 없으면 한 번에 읽습니다.
+                    spans = [(None, None)]
+                else:
+                    min_date, max_date = get_date_bounds(conn, spec['date_col'], table_name)
+                    spans = _month_spans(min_date, max_date) if min_date is not None else []
+                with rollup:
+                    _store_span(rollup, spec['stage'], jig_col, None, None, [], [], [])
+            elif max_rowid > int(watermark):
+                new_dates = pd.read_sql_query(
+                    f"SELECT {quote_identifier(spec['date_col'])} FROM {table} WHERE rowid > ?", conn,
+                    params=[int(watermark)])[spec['date_col']]
+                parsed = parse_stage_timestamps(new_dates, spec, source='db').dropna()
+                spans = _day_runs({d.date() for d in parsed.dt.normalize().unique()})
+            else:
+                return 0
+
+            for step, (start_date, end_date) in enumerate(spans, start=1):
+                days, summary_rows, serial_rows = _compute_span(conn, spec, jig_col, start_date, end_date)
+                with rollup:
+                    _store_span(rollup, spec['stage'], jig_col, start_date, end_date, days, summary_rows, serial_rows)
+                if progress_callback is not None:
+                    progress_callback(step, len(spans))
+
+            with rollup:
+                _set_rollup_meta(rollup, meta_key + ':rowid', max_rowid)
+                _set_rollup_meta(rollup, meta_key + ':source', source_id)
+            return len(spans)
+        finally:
+            rollup.close()
+
+def _range_filter(stage, jig_col, start_date, end_date, jig=None):
+    where = "stage=? AND jig_col=? AND day BETWEEN ? AND ?"
+    params = [stage, jig_col, start_date.isoformat(), end_date.isoformat()]
+    if jig is not None:
+        where += " AND jig=?"
+        params.append(_python_scalar(jig))
+    return where, params
+
+def load_rollup_analysis(conn, stage, start_date, end_date, jig=None, jig_col=None):
+    """
+    롤업에서 analyze_data()와 같은 형태의 결과를 읽습니다. 기간 길이와 관계없이 (지그 수 × 날짜 수) 행만 읽습니다.
+    Returns:
+        AnalysisResult | None: 지그별 시리얼 목록(load_rollup_serials())까지 담은 결과.
+            롤업이 없거나, 지그 값이 모두 비어 있어 '전체'로 묶어야 하는 경우에는 None (원본 행으로 분석해야 합니다).
+    """
+    spec = get_stage_spec(stage)
+    jig_col = jig_col or spec['db_jig_col']
+    path = rollup_path_for(database_path(conn))
+    if not os.path.exists(path):
+        return None
+
+    rollup = _open_rollup(database_path(conn))
+    try:
+        where, params = _range_filter(spec['stage'], jig_col, start_date, end_date, jig)
+        rows = rollup.execute(
+            f"SELECT jig, day, total_test, pass, false_defect, true_defect, fail FROM daily_rollup "
+            f"WHERE {where} ORDER BY jig, day", params).fetchall()
+        if jig is None:
+            day_rows = rollup.execute(
+                "SELECT DISTINCT day FROM rollup_days WHERE stage=? AND jig_col=? AND day BETWEEN ? AND ? ORDER BY day",
+                params[:4]).fetchall()
+        else:
+            day_rows = sorted({(row[1],) for row in rows})
+    finally:
+        rollup.close()
+
+    if not rows:
+        return None if day_rows else AnalysisResult({}, [], jig_col, {})
+
+    summary_data = {}
+    for jig_value, day, total_test, pass_count, false_defect, true_defect, fail in rows:
+        summary_data.setdefault(jig_value, {})[day] = {
+            'total_test': total_test,
+            'pass': pass_count,
+            'false_defect': false_defect,
+            'true_defect': true_defect,
+            'fail': fail,
+        }
+    all_dates = [pd.Timestamp(day).date() for (day,) in day_rows]
+    serials = load_rollup_serials(conn, stage, start_date, end_date, jig, jig_col)
+    return AnalysisResult(summary_data, all_dates, jig_col, serials)
+
+def load_rollup_serials(conn, stage, start_date, end_date, jig=None, jig_col=None):
+    """
+    기간 전체의 지그별 PASS/가성불량/진성불량/FAIL 시리얼 목록을 롤업에서 읽습니다.
+    PASS는 기간 중 한 번이라도 PASS한 시리얼, FAIL은 그 외 모든 시리얼이며,
+    가성불량/진성불량은 FAIL 이력이 있는 시리얼을 PASS 여부로 나눈 것입니다.
+    SNumber가 없는 행은 메모리/SQL 분석과 같이 목록에서 뺍니다 (요약 집계에는 포함됩니다).
+    Returns:
+        dict: {jig: {'pass': [...], 'false_defect': [...], 'true_defect': [...], 'fail': [...]}}
+    """
+    spec = get_stage_spec(stage)
+    jig_col = jig_col or spec['db_jig_col']
+    rollup = _open_rollup(database_path(conn))
+    try:
+        where, params = _range_filter(spec['stage'], jig_col, start_date, end_date, jig)
+        rows = rollup.execute(
+            f"SELECT jig, SNumber, MAX(has_pass), MAX(has_fail) FROM daily_serials "
+            f"WHERE {where} AND SNumber IS NOT NULL GROUP BY jig, SNumber ORDER BY jig, SNumber", params).fetchall()
+    finally:
+        rollup.close()
+
+    serials = {}
+    for jig_value, serial, has_pass, has_fail in rows:
+        lists = serials.setdefault(jig_value, empty_serial_lists())
+        if has_pass:
+            lists['pass'].append(serial)
+            if has_fail:
+                lists['false_defect'].append(serial)
+        else:
+            lists['fail'].append(serial)
+            if has_fail:
+                lists['true_defect'].append(serial)
+    return serials
@@ -1,58 +1,157 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from collections import namedtuple
 
-def analyze_data(df, date_col_name, jig_col_name):
+from .stage_schema import PASS_STATUS_PASS, PASS_STATUS_FAIL, PASS_STATUS_UNKNOWN, encode_pass_status
+
+# 분석 결과. summary: {jig: {'YYYY-MM-DD': 지표}}, dates: 날짜 목록, jig_col: 실제로 사용된 지그 컬럼명,
+# serials: {jig: {'pass', 'false_defect', 'true_defect', 'fail'}} 기간 전체의 시리얼 목록 (SNumber 순).
+AnalysisResult = namedtuple('AnalysisResult', ['summary', 'dates', 'jig_col', 'serials'])
+
+SERIAL_LIST_KEYS = ('pass', 'false_defect', 'true_defect', 'fail')
+
+def empty_serial_lists():
+    return {key: [] for key in SERIAL_LIST_KEYS}
+
+def build_serial_day_counts(df, date_col_name, jig_col_name):
+    """
+    (지그, 날짜, SNumber) 단위로 한 번에 묶어 시리얼별 테스트/PASS/FAIL 횟수를 계산합니다.
+    Args:
+        df (pd.DataFrame): 'PassStatusCode' 컬럼(stage_schema.encode_pass_status())이 준비된 DataFrame.
+        date_col_name (str): 날짜/시간 정보가 있는 컬럼명.
+        jig_col_name (str): 지그(PC) 정보가 있는 컬럼명.
+    Returns:
+        pd.DataFrame: jig, day, SNumber, n_rows, n_pass, n_fail, first_fail_pos 컬럼을 가진 시리얼 단위 결과.
+            first_fail_pos는 해당 시리얼의 첫 FAIL 행 위치이며, FAIL이 없으면 정수 최대값입니다.
+    """
+    status = df['PassStatusCode'].to_numpy()
+    is_fail = status == PASS_STATUS_FAIL
+    # category 컬럼은 그대로 넘겨 코드 기준으로 묶습니다.
+    work = pd.DataFrame({
+        'jig': df[jig_col_name].array,
+        'day': df[date_col_name].dt.normalize().array,
+        'SNumber': df['SNumber'].array,
+        'n_rows': 1,
+        'n_pass': (status == PASS_STATUS_PASS).astype(np.int64),
+        'n_fail': is_fail.astype(np.int64),
+        'first_fail_pos': np.where(is_fail, np.arange(len(df)), np.iinfo(np.int64).max),
+    })
+    work = work[work['jig'].notna() & work['day'].notna()]
+
+    # SNumber가 비어 있는 행도 총 테스트 수에 포함되도록 dropna=False로 묶습니다.
+    grouped = work.groupby(['jig', 'day', 'SNumber'], sort=False, dropna=False, observed=True)
+    counts = grouped[['n_rows', 'n_pass', 'n_fail']].sum()
+    counts['first_fail_pos'] = grouped['first_fail_pos'].min()
+    return counts.reset_index()
+
+def summarize_serial_counts(counts):
+    """
+    시리얼 단위 결과를 (지그, 날짜) 단위 요약 딕셔너리로 집계합니다. 모든 지표는 고유 SNumber 개수 기준입니다.
+    Args:
+        counts (pd.DataFrame): build_serial_day_counts()의 결과.
+    Returns:
+        dict: {jig: {'YYYY-MM-DD': {'total_test', 'pass', 'false_defect', 'true_defect', 'fail'}}}
+    """
+    summary_data = {}
+    if counts.empty:
+        return summary_data
+
+    # SNumber가 없는 행은 PASS 시리얼로 인정하지 않습니다.
+    has_pass = (counts['n_pass'] > 0) & counts['SNumber'].notna()
+    has_fail = counts['n_fail'] > 0
+    flags = pd.DataFrame({
+        'jig': counts['jig'],
+        'day': counts['day'],
+        'has_pass': has_pass,
+        'false_defect': has_pass & has_fail,
+        'true_defect': ~has_pass & has_fail,
+    })
+    daily = flags.groupby(['jig', 'day'], sort=True, observed=True).agg(
+        total_test=('has_pass', 'size'),
+        pass_count=('has_pass', 'sum'),
+        false_defect=('false_defect', 'sum'),
+        true_defect=('true_defect', 'sum'),
+    )
+
+    for (jig, day), row in zip(daily.index, daily.itertuples(index=False)):
+        if jig not in summary_data:
+            summary_data[jig] = {}
+        summary_data[jig][day.strftime("%Y-%m-%d")] = {
+            'total_test': int(row.total_test),
+            'pass': int(row.pass_count),
+            'false_defect': int(row.false_defect),
+            'true_defect': int(row.true_defect),
+            'fail': int(row.total_test - row.pass_count),
+        }
+    return summary_data
+
+def classify_serials(counts):
+    """
+    시리얼 단위 결과로 지그별 기간 전체의 시리얼 목록을 만듭니다.
+    PASS는 기간 중 한 번이라도 PASS한 시리얼, FAIL은 그 외 모든 시리얼이며,
+    가성불량/진성불량은 FAIL 이력이 있는 시리얼을 PASS 여부로 나눈 것입니다. SNumber가 없는 행은 제외합니다.
+    Args:
+        counts (pd.DataFrame): build_serial_day_counts()의 결과.
+    Returns:
+        dict: {jig: {'pass': [...], 'false_defect': [...], 'true_defect': [...], 'fail': [...]}}
+    """
+    serials = {}
+    counts = counts[counts['SNumber'].notna()]
+    if counts.empty:
+        return serials
+
+    flags = pd.DataFrame({
+        'jig': counts['jig'],
+        'SNumber': counts['SNumber'],
+        'has_pass': counts['n_pass'] > 0,
+        'has_fail': counts['n_fail'] > 0,
+    }).groupby(['jig', 'SNumber'], sort=True, observed=True)[['has_pass', 'has_fail']].any()
+
+    for jig, part in flags.groupby(level='jig', sort=False, observed=True):
+        numbers = np.asarray(part.index.get_level_values('SNumber').astype(object))
+        has_pass = part['has_pass'].to_numpy()
+        has_fail = part['has_fail'].to_numpy()
+        serials[jig] = {
+            'pass': numbers[has_pass].tolist(),
+            'false_defect': numbers[has_pass & has_fail].tolist(),
+            'true_defect': numbers[~has_pass & has_fail].tolist(),
+            'fail': numbers[~has_pass].tolist(),
+        }
+    return serials
+
+def analyze_data(df, date_col_name, jig_col_name, pass_col_name):
     """
     주어진 DataFrame을 날짜와 지그(Jig) 기준으로 분석합니다.
     Args:
         df (pd.DataFrame): 분석할 원본 DataFrame.
         date_col_name (str): 날짜/시간 정보가 있는 컬럼명.
         jig_col_name (str): 지그(PC) 정보가 있는 컬럼명.
+        pass_col_name (str): 합격 여부 컬럼명 (Stage 설정의 'pass_col'). 없으면 모든 행을 판정 불가로 봅니다.
     Returns:
-        tuple: 분석 결과 요약 데이터, 모든 날짜 목록, 실제로 사용된 지그 컬럼명.
+        AnalysisResult: 요약 데이터, 모든 날짜 목록, 실제로 사용된 지그 컬럼명, 지그별 시리얼 목록.
     """
     if df.empty:
-        return {}, [], jig_col_name
+        return AnalysisResult({}, [], jig_col_name, {})
 
-    df['PassStatusNorm'] = ""
-    pass_col = next((col for col in ['PcbPass', 'FwPass', 'RfTxPass', 'SemiAssyPass', 'BatadcPass'] if col in df.columns), None)
-    if pass_col:
-        df['PassStatusNorm'] = df[pass_col].fillna('').astype(str).str.strip().str.upper()
+    df['PassStatusCode'] = np.int8(PASS_STATUS_UNKNOWN)
+    if pass_col_name in df.columns:
+        df['PassStatusCode'] = encode_pass_status(df[pass_col_name])
 
     summary_data = {}
-    
+    serials = {}
+
     used_jig_col_name = jig_col_name
     if jig_col_name not in df.columns or df[jig_col_name].isnull().all():
         used_jig_col_name = '__total_group__'
         df[used_jig_col_name] = '전체'
 
     if used_jig_col_name in df.columns and not df[used_jig_col_name].isnull().all():
-        if 'SNumber' in df.columns and date_col_name in df.columns and not df[date_col_name].dt.date.dropna().empty:
-            for jig, group in df.groupby(used_jig_col_name):
-                for d, day_group in group.groupby(group[date_col_name].dt.date):
-                    if pd.isna(d): continue
-                    date_iso = pd.to_datetime(d).strftime("%Y-%m-%d")
-                    
-                    pass_sns_series = day_group.groupby('SNumber')['PassStatusNorm'].apply(lambda x: 'O' in x.tolist())
-                    pass_sns = pass_sns_series[pass_sns_series].index.tolist()
-
-                    false_defect_count = len(day_group[(day_group['PassStatusNorm'] == 'X') & (day_group['SNumber'].isin(pass_sns))]['SNumber'].unique())
-                    true_defect_count = len(day_group[(day_group['PassStatusNorm'] == 'X') & (~day_group['SNumber'].isin(pass_sns))]['SNumber'].unique())
-                    pass_count = len(pass_sns)
-                    total_test = len(day_group['SNumber'].unique())
-                    fail_count = total_test - pass_count
-
-                    if jig not in summary_data:
-                        summary_data[jig] = {}
-                    summary_data[jig][date_iso] = {
-                        'total_test': total_test,
-                        'pass': pass_count,
-                        'false_defect': false_defect_count,
-                        'true_defect': true_defect_count,
-                        'fail': fail_count,
-                    }
-    
-    all_dates = sorted(list(df[date_col_name].dt.date.dropna().unique()))
-    
-    return summary_data, all_dates, used_jig_col_name
+        if 'SNumber' in df.columns and date_col_name in df.columns and df[date_col_name].notna().any():
+            # 지그/날짜별 반복문 대신 (지그, 날짜, SNumber) 단위로 한 번에 집계합니다.
+            counts = build_serial_day_counts(df, date_col_name, used_jig_col_name)
+            summary_data = summarize_serial_counts(counts)
+            serials = classify_serials(counts)
+
+    all_dates = df[date_col_name].dt.normalize().dropna().drop_duplicates().sort_values().dt.date.tolist()
+
+    return AnalysisResult(summary_data, all_dates, used_jig_col_name, serials)
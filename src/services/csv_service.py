@@ -0,0 +1,547 @@
+#
+# csv_service.py
+# 검사 공정별 CSV 파일을 하나의 로더와 하나의 분석기로 처리합니다.
+# 공정별 차이(컬럼명, 헤더 키워드 등)는 stage_registry.STAGE_SPECS에서 관리합니다.
+
+import pandas as pd
+import numpy as np
+import io
+import os
+import csv
+import codecs
+import hashlib
+import itertools
+import warnings
+
+from .analysis_service import build_serial_day_counts
+from .stage_registry import DEFAULT_STAGE_SPEC, get_stage_spec
+from .stage_schema import stage_read_dtypes, resolve_timestamp_format, parse_timestamps, encode_pass_status, compact_stage_frame
+
+warnings.filterwarnings('ignore')
+
+# '="...' 형식의 문자열을 정리하는 함수
+def clean_excel_string(value):
+    if isinstance(value, str) and value.startswith('="') and value.endswith('"'):
+        return value[2:-1]
+    return value
+
+def clean_quoted_string(value):
+    """다양한 형태의 문자열 포맷을 정리하는 함수"""
+    if pd.isna(value):
+        return value
+
+    value_str = str(value).strip()
+
+    # ="값" 형태 처리
+    if value_str.startswith('="') and value_str.endswith('"'):
+        return value_str[2:-1]
+
+    # ""값"" 형태 처리
+    if value_str.startswith('""') and value_str.endswith('""'):
+        return value_str[2:-2]
+
+    # "값" 형태 처리
+    if value_str.startswith('"') and value_str.endswith('"') and len(value_str) > 2:
+        return value_str[1:-1]
+
+    return value_str
+
+def _clean_excel_series(series):
+    """clean_excel_string()과 같은 규칙을 컬럼 전체에 한 번에 적용합니다."""
+    try:
+        wrapped = series.str.startswith('="', na=False) & series.str.endswith('"', na=False)
+    except AttributeError:
+        # 문자열 값이 하나도 없는 object 컬럼
+        return series
+    if not wrapped.any():
+        return series
+    return series.mask(wrapped, series.str[2:-1])
+
+def _clean_quoted_series(series):
+    """clean_quoted_string()과 같은 규칙을 컬럼 전체에 한 번에 적용합니다."""
+    notna = series.notna()
+    if not notna.any():
+        return series
+
+    values = series[notna].astype(str).str.strip()
+    # ="값" / ""값"" / "값" 순서로 먼저 일치하는 규칙 하나만 적용합니다.
+    excel = values.str.startswith('="') & values.str.endswith('"')
+    doubled = ~excel & values.str.startswith('""') & values.str.endswith('""')
+    quoted = ~excel & ~doubled & values.str.startswith('"') & values.str.endswith('"') & (values.str.len() > 2)
+
+    values = values.mask(excel, values.str[2:-1])
+    values = values.mask(doubled, values.str[2:-2])
+    values = values.mask(quoted, values.str[1:-1])
+    return values.reindex(series.index)
+
+CLEAN_RULES = {
+    'excel': _clean_excel_series,
+    'quoted': _clean_quoted_series,
+}
+
+def clean_string_frame(df, columns=None, rule='excel'):
+    """
+    엑셀 래퍼('="..."', '""...""', '"..."')를 문자열 컬럼 단위로 한 번에 제거합니다.
+    숫자/날짜 컬럼은 건드리지 않으며, DataFrame을 직접 수정합니다.
+    Args:
+        df (pd.DataFrame): 정리할 DataFrame.
+        columns (list | None): 정리할 컬럼 목록. None이면 모든 문자열 컬럼을 정리합니다.
+        rule (str): 'excel'(="..." 만 처리) 또는 'quoted'(공백 제거 + 세 가지 래퍼 모두 처리).
+    Returns:
+        pd.DataFrame: 정리된 DataFrame (입력과 같은 객체).
+    """
+    clean = CLEAN_RULES[rule]
+    string_cols = set(df.select_dtypes(include=['object', 'string']).columns)
+    target_cols = df.columns if columns is None else [col for col in columns if col in df.columns]
+
+    for col in target_cols:
+        if col in string_cols:
+            df[col] = clean(df[col])
+    return df
+
+def _match_header(values, keywords, match):
+    """헤더 후보 행의 값들이 키워드를 모두 포함하는지 확인합니다."""
+    values = [str(x).strip() for x in values if str(x).strip() != '']
+
+    if match == 'contains':
+        matched_keywords = sum(1 for kw in keywords if any(kw in val for val in values))
+    else:
+        matched_keywords = sum(1 for kw in keywords if kw in values)
+    return matched_keywords >= len(keywords)
+
+def _open_binary(uploaded_file):
+    """업로드 파일 객체나 파일 경로를 처음 위치로 되감긴 바이너리 파일 객체로 반환합니다."""
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        return open(uploaded_file, 'rb')
+    if hasattr(uploaded_file, 'seek') and hasattr(uploaded_file, 'read'):
+        uploaded_file.seek(0)
+        return uploaded_file
+    return io.BytesIO(uploaded_file.getvalue())
+
+def _file_size(fh):
+    position = fh.tell()
+    fh.seek(0, os.SEEK_END)
+    size = fh.tell()
+    fh.seek(position)
+    return size
+
+ENCODING_SAMPLE_SIZE = 256 * 1024
+_ENCODING_CACHE = {}
+_ENCODING_CACHE_MAX = 256
+
+def _read_samples(fh, sample_size):
+    """파일의 앞부분과 뒷부분(첫 줄바꿈 이후부터)을 샘플로 읽습니다."""
+    size = _file_size(fh)
+    fh.seek(0)
+    head = fh.read(sample_size)
+    tail = b''
+    if size > sample_size * 2:
+        fh.seek(size - sample_size)
+        tail = fh.read(sample_size)
+        # 멀티바이트 문자 중간에서 잘린 앞부분은 버립니다.
+        tail = tail[tail.find(b'\n') + 1:]
+    fh.seek(0)
+    return size, head, tail
+
+def _fingerprint(size, head, tail):
+    return hashlib.sha1(str(size).encode() + head + tail).hexdigest()
+
+def file_fingerprint(uploaded_file, sample_size=ENCODING_SAMPLE_SIZE):
+    """파일 크기와 앞/뒤 샘플로 만든 해시. 인코딩 캐시의 키로 사용합니다."""
+    fh = _open_binary(uploaded_file)
+    try:
+        size, head, tail = _read_samples(fh, sample_size)
+    finally:
+        if fh is not uploaded_file:
+            fh.close()
+    return _fingerprint(size, head, tail)
+
+def _probe_encoding(samples, candidates):
+    for encoding in candidates:
+        if codecs.lookup(encoding).name == 'utf-8-sig':
+            # BOM이 없는 파일은 utf-8 후보로 판별합니다.
+            continue
+        try:
+            for sample in samples:
+                codecs.getincrementaldecoder(encoding)(errors='strict').decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+def detect_encoding(uploaded_file, candidates=None, sample_size=ENCODING_SAMPLE_SIZE):
+    """
+    BOM 확인과 샘플 디코딩으로 파일 인코딩을 한 번에 판별합니다. 결과는 파일 해시별로 캐시됩니다.
+    Args:
+        uploaded_file: 업로드 파일 객체 또는 파일 경로.
+        candidates (list | None): 인코딩 후보 (앞에서부터 우선). None이면 기본 Stage 설정의 후보.
+        sample_size (int): 앞/뒤에서 각각 읽을 샘플 바이트 수.
+    Returns:
+        tuple: (인코딩, 판별 근거). 판별 근거는 'bom', 'probe', 'cache', 'fallback' 중 하나입니다.
+    """
+    candidates = list(candidates or DEFAULT_STAGE_SPEC['encodings'])
+    fh = _open_binary(uploaded_file)
+    try:
+        size, head, tail = _read_samples(fh, sample_size)
+    finally:
+        if fh is not uploaded_file:
+            fh.close()
+
+    cache_key = (_fingerprint(size, head, tail), tuple(candidates))
+    if cache_key in _ENCODING_CACHE:
+        return _ENCODING_CACHE[cache_key], 'cache'
+
+    if head.startswith(codecs.BOM_UTF8):
+        encoding, source = 'utf-8-sig', 'bom'
+    else:
+        encoding, source = _probe_encoding([head, tail], candidates), 'probe'
+        if encoding is None:
+            encoding, source = candidates[-1], 'fallback'
+
+    if len(_ENCODING_CACHE) >= _ENCODING_CACHE_MAX:
+        _ENCODING_CACHE.pop(next(iter(_ENCODING_CACHE)))
+    _ENCODING_CACHE[cache_key] = encoding
+    return encoding, source
+
+def find_header_offset(fh, keywords, match='exact', encoding=None, max_lines=100):
+    """
+    파일을 파싱하지 않고 원본 줄을 읽어 헤더 행의 바이트 위치를 찾습니다.
+    Args:
+        fh: 처음 위치로 되감긴 바이너리 파일 객체.
+        keywords (list): 헤더 행에 모두 있어야 하는 컬럼명.
+        match (str): 'exact'(값 일치) 또는 'contains'(부분 문자열 포함).
+        encoding (str | None): 줄을 해석할 인코딩. None이면 utf-8.
+        max_lines (int): 검사할 최대 줄 수 (빈 줄 제외).
+    Returns:
+        int | None: 헤더 행이 시작하는 바이트 위치. 찾지 못하면 None.
+    """
+    scanned = 0
+    while scanned < max_lines:
+        offset = fh.tell()
+        raw_line = fh.readline()
+        if not raw_line:
+            break
+
+        line = raw_line.decode(encoding or 'utf-8', errors='replace').lstrip('\ufeff').strip()
+        if not line:
+            continue
+        scanned += 1
+
+        values = next(csv.reader([line]), [])
+        if _match_header(values, keywords, match):
+            return offset
+    return None
+
+def _header_dtypes(fh, header_offset, encoding, spec):
+    """
+    Stage 설정의 dtype을 헤더 행의 실제 컬럼명에 맞춥니다.
+    SemiAssy처럼 헤더에 공백이 섞인 파일도 정리 전 이름으로 dtype을 넘겨야 하기 때문입니다.
+    """
+    fh.seek(header_offset)
+    line = fh.readline().decode(encoding, errors='replace')
+    values = next(csv.reader([line], skipinitialspace=spec['skipinitialspace']), [])
+    dtypes = stage_read_dtypes(spec)
+    return {value: dtypes[value.strip()] for value in values if value.strip() in dtypes}
+
+def _read_kwargs(spec, chunksize=None, dtypes=None):
+    read_kwargs = {}
+    if dtypes:
+        read_kwargs['dtype'] = dtypes
+    if spec['skipinitialspace']:
+        read_kwargs['skipinitialspace'] = True
+    if chunksize:
+        read_kwargs['chunksize'] = chunksize
+    return read_kwargs
+
+def _tidy_header(df, spec):
+    """SemiAssy처럼 헤더에 공백/빈 첫 컬럼이 섞인 파일을 정리합니다. 키워드 컬럼이 없으면 None."""
+    df.columns = df.columns.str.strip()
+
+    if df.columns[0] == '' or pd.isna(df.columns[0]) or str(df.columns[0]).strip() == '':
+        df = df.iloc[:, 1:].copy()
+
+    missing_cols = [col for col in spec['header_keywords'] if col not in df.columns]
+    if missing_cols:
+        return None
+    return df
+
+def read_csv_chunks_for_stage(uploaded_file, stage, chunksize=200000, progress_callback=None, encoding=None):
+    """
+    헤더 행을 찾은 뒤 본문을 chunksize 행씩 나눠서 읽습니다. 전체 파일을 메모리에 올리지 않습니다.
+    Args:
+        uploaded_file: 업로드 파일 객체 또는 파일 경로.
+        stage (str): stage_registry.STAGE_SPECS의 키.
+        chunksize (int | None): 한 번에 읽을 최대 행 수. None이면 한 번에 모두 읽습니다.
+        progress_callback (callable | None): (읽은 바이트 수, 전체 바이트 수)를 받는 함수.
+        encoding (str | None): 파일 인코딩. None이면 detect_encoding()으로 판별합니다.
+    Yields:
+        pd.DataFrame: 헤더가 적용된 본문 조각. attrs['encoding']에 사용한 인코딩이 기록됩니다.
+            헤더를 찾지 못하면 아무것도 내보내지 않습니다.
+    """
+    spec = get_stage_spec(stage)
+    fh = _open_binary(uploaded_file)
+
+    try:
+        if encoding is None:
+            encoding, _ = detect_encoding(fh, spec['encodings'])
+        total_bytes = _file_size(fh)
+
+        fh.seek(0)
+        header_offset = find_header_offset(fh, spec['header_keywords'], spec['header_match'],
+                                           encoding, spec['header_scan_rows'])
+        if header_offset is None:
+            return
+
+        dtypes = _header_dtypes(fh, header_offset, encoding, spec)
+        fh.seek(header_offset)
+        text = io.TextIOWrapper(fh, encoding=encoding, newline='')
+        try:
+            reader = pd.read_csv(text, **_read_kwargs(spec, chunksize, dtypes))
+            for chunk in reader if chunksize else [reader]:
+                if spec['tidy_header']:
+                    chunk = _tidy_header(chunk, spec)
+                    if chunk is None:
+                        return
+                chunk.attrs['encoding'] = encoding
+                yield chunk
+                if progress_callback is not None:
+                    progress_callback(min(fh.tell(), total_bytes), total_bytes)
+        finally:
+            text.detach()
+    finally:
+        if fh is not uploaded_file:
+            fh.close()
+
+def read_csv_with_dynamic_header_for_stage(uploaded_file, stage):
+    """
+    Stage 설정의 키워드로 헤더 행을 찾아 DataFrame을 로드합니다.
+    인코딩은 한 번만 판별하며, 판별 결과는 df.attrs['encoding'], df.attrs['encoding_source']에 기록됩니다.
+    Args:
+        uploaded_file: 업로드 파일 객체 또는 파일 경로.
+        stage (str): stage_registry.STAGE_SPECS의 키.
+    Returns:
+        pd.DataFrame | None: 헤더를 찾지 못하거나 읽기에 실패하면 None.
+    """
+    try:
+        encoding, source = detect_encoding(uploaded_file, get_stage_spec(stage)['encodings'])
+        chunks = list(read_csv_chunks_for_stage(uploaded_file, stage, chunksize=None, encoding=encoding))
+    except Exception as e:
+        return None
+
+    if not chunks:
+        return None
+    df = chunks[0]
+    df.attrs['encoding_source'] = source
+    return df
+
+def _select_jig_column(df, spec):
+    """Stage 설정의 지그 컬럼 → 대체 컬럼 → 기본 지그 순서로 사용할 지그 컬럼을 정합니다."""
+    for col in [spec['jig_col']] + spec['jig_fallback_cols']:
+        if col in df.columns and not df[col].isna().all():
+            return col
+
+    if spec['default_jig'] is None:
+        return spec['jig_col']
+
+    df['DEFAULT_JIG'] = spec['default_jig']
+    return 'DEFAULT_JIG'
+
+def _summarize_stage_counts(counts):
+    """
+    시리얼 단위 결과를 (지그, 날짜) 단위 요약 딕셔너리로 집계합니다. 모든 지표는 테스트 행 수 기준입니다.
+    Args:
+        counts (pd.DataFrame): analysis_service.build_serial_day_counts()의 결과.
+    Returns:
+        dict: {jig: {'YYYY-MM-DD': {'total_test', 'pass', 'false_defect', 'true_defect', 'fail', 'pass_rate', 'false_defect_sns'}}}
+    """
+    summary_data = {}
+    if counts.empty:
+        return summary_data
+
+    has_pass = (counts['n_pass'] > 0) & counts['SNumber'].notna()
+    rows = pd.DataFrame({
+        'jig': counts['jig'],
+        'day': counts['day'],
+        'n_rows': counts['n_rows'],
+        'n_pass': counts['n_pass'],
+        'false_defect': counts['n_fail'].where(has_pass, 0),
+        'true_defect': counts['n_fail'].where(~has_pass, 0),
+    })
+    daily = rows.groupby(['jig', 'day'], sort=True, observed=True)[['n_rows', 'n_pass', 'false_defect', 'true_defect']].sum()
+
+    # 가성불량 시리얼은 원본 파일에서 처음 FAIL이 나온 순서대로 정렬합니다.
+    false_defect = counts[has_pass & (counts['n_fail'] > 0)].sort_values('first_fail_pos')
+    # category SNumber는 리스트로 모을 수 없으므로 값으로 바꿔 둡니다.
+    false_defect = false_defect.assign(SNumber=false_defect['SNumber'].astype(object))
+    false_defect_sns = false_defect.groupby(['jig', 'day'], sort=False, observed=True)['SNumber'].agg(list).to_dict()
+
+    for (jig, day), row in zip(daily.index, daily.itertuples(index=False)):
+        total_test = int(row.n_rows)
+        pass_count = int(row.n_pass)
+        rate = 100 * pass_count / total_test if total_test > 0 else 0
+
+        if jig not in summary_data:
+            summary_data[jig] = {}
+        summary_data[jig][day.strftime("%Y-%m-%d")] = {
+            'total_test': total_test,
+            'pass': pass_count,
+            'false_defect': int(row.false_defect),
+            'true_defect': int(row.true_defect),
+            'fail': int(row.false_defect + row.true_defect),
+            'pass_rate': f"{rate:.1f}%",
+            'false_defect_sns': false_defect_sns.get((jig, day), []),
+        }
+    return summary_data
+
+def _prepare_stage_frame(df, spec, clean_only_needed):
+    """문자열 정리, 날짜 변환, PassStatusCode 생성, 지그/SNumber category 변환 후 날짜가 있는 행만 반환합니다."""
+    date_col = spec['date_col']
+    pass_col = spec['pass_col']
+
+    if spec['strict']:
+        missing_columns = [col for col in spec['required_columns'] if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f"필수 컬럼이 없습니다: {missing_columns}")
+
+    # 데이터 전처리
+    clean_columns = spec['clean_columns']
+    if clean_only_needed and clean_columns is None:
+        clean_columns = [spec['serial_col'], date_col, spec['jig_col'], pass_col] + spec['jig_fallback_cols']
+    clean_string_frame(df, clean_columns, spec['clean_rule'])
+
+    if spec['timestamp_format'] is None:
+        # 형식은 처음 한 번만 판별해 같은 파일의 나머지 조각에도 그대로 사용합니다.
+        spec['timestamp_format'] = resolve_timestamp_format(df[date_col], spec)
+    df[date_col] = parse_timestamps(df[date_col], spec['timestamp_format'])
+    df['PassStatusCode'] = encode_pass_status(df[pass_col])
+    compact_stage_frame(df, spec, [spec['jig_col']] + spec['jig_fallback_cols'])
+
+    return df[df[date_col].notna()].copy()
+
+def _stage_serial_counts(df_valid, spec, jig_col):
+    if spec['strict']:
+        df_valid = df_valid[df_valid[jig_col].astype(str).str.strip() != '']
+    return build_serial_day_counts(df_valid, spec['date_col'], jig_col)
+
+def _combine_serial_counts(parts):
+    """조각별 시리얼 단위 결과를 하나로 합칩니다."""
+    if len(parts) == 1:
+        return parts[0]
+    grouped = pd.concat(parts, ignore_index=True).groupby(['jig', 'day', 'SNumber'], sort=False, dropna=False, observed=True)
+    counts = grouped[['n_rows', 'n_pass', 'n_fail']].sum()
+    counts['first_fail_pos'] = grouped['first_fail_pos'].min()
+    return counts.reset_index()
+
+def _analyze_stage_frame(df, spec, clean_only_needed):
+    df_valid = _prepare_stage_frame(df, spec, clean_only_needed)
+    if spec['strict'] and len(df_valid) == 0:
+        raise ValueError("유효한 날짜 데이터가 없습니다.")
+
+    jig_col = _select_jig_column(df_valid, spec)
+    counts = _stage_serial_counts(df_valid, spec, jig_col)
+    summary_data = _summarize_stage_counts(counts)
+
+    all_dates = df_valid[spec['date_col']].dt.normalize().drop_duplicates().sort_values().dt.date.tolist()
+    return summary_data, all_dates
+
+def _analyze_stage_chunks(chunks, spec):
+    no_fail = np.iinfo(np.int64).max
+    # 지그 컬럼은 파일 전체를 봐야 정할 수 있으므로 후보 컬럼별로 결과를 모아 둡니다.
+    candidates = [spec['jig_col']] + spec['jig_fallback_cols']
+    parts = {}
+    seen_jig_cols = set()
+    all_days = set()
+    row_offset = 0
+    has_rows = False
+
+    for chunk in chunks:
+        df_valid = _prepare_stage_frame(chunk, spec, clean_only_needed=True)
+        chunk_rows = len(chunk)
+        if df_valid.empty:
+            row_offset += chunk_rows
+            continue
+        has_rows = True
+        all_days.update(df_valid[spec['date_col']].dt.normalize().unique())
+
+        jig_cols = []
+        for col in candidates:
+            if col not in df_valid.columns:
+                continue
+            jig_cols.append(col)
+            if df_valid[col].notna().any():
+                seen_jig_cols.add(col)
+            if col in seen_jig_cols:
+                break
+        else:
+            if spec['default_jig'] is not None:
+                df_valid['DEFAULT_JIG'] = spec['default_jig']
+                jig_cols.append('DEFAULT_JIG')
+
+        for col in jig_cols:
+            counts = _stage_serial_counts(df_valid, spec, col)
+            counts['first_fail_pos'] = counts['first_fail_pos'].where(counts['first_fail_pos'] == no_fail,
+                                                                      counts['first_fail_pos'] + row_offset)
+            col_parts = parts.setdefault(col, [])
+            col_parts.append(counts)
+            # 조각별 결과가 쌓이지 않도록 주기적으로 합쳐 둡니다.
+            if len(col_parts) >= 8:
+                parts[col] = [_combine_serial_counts(col_parts)]
+        row_offset += chunk_rows
+
+    if spec['strict'] and not has_rows:
+        raise ValueError("유효한 날짜 데이터가 없습니다.")
+
+    jig_col = next((col for col in candidates if col in seen_jig_cols), None)
+    if jig_col is None:
+        jig_col = 'DEFAULT_JIG' if spec['default_jig'] is not None else spec['jig_col']
+
+    summary_data = {}
+    if parts.get(jig_col):
+        summary_data = _summarize_stage_counts(_combine_serial_counts(parts[jig_col]))
+    all_dates = [pd.Timestamp(d).date() for d in sorted(all_days)]
+    return summary_data, all_dates
+
+def analyze_stage_data(df, stage, clean_only_needed=False):
+    """
+    Stage 설정에 따라 CSV 데이터를 지그/날짜 기준으로 분석합니다.
+    Args:
+        df (pd.DataFrame): read_csv_with_dynamic_header_for_stage()로 읽은 DataFrame.
+        stage (str): stage_registry.STAGE_SPECS의 키.
+        clean_only_needed (bool): True이면 분석에 쓰는 컬럼만 문자열 정리를 합니다.
+    Returns:
+        tuple: 분석 결과 요약 데이터, 모든 날짜 목록.
+    """
+    spec = get_stage_spec(stage)
+    if not spec['strict']:
+        return _analyze_stage_frame(df, spec, clean_only_needed)
+
+    try:
+        return _analyze_stage_frame(df, spec, clean_only_needed)
+    except Exception as e:
+        raise ValueError(f"분석 중 오류가 발생했습니다: {e}")
+
+def analyze_stage_csv_stream(uploaded_file, stage, chunksize=200000, progress_callback=None, encoding=None):
+    """
+    CSV 파일을 조각 단위로 읽으면서 바로 집계합니다. 파일 크기와 관계없이 메모리 사용량이 일정합니다.
+    Args:
+        uploaded_file: 업로드 파일 객체 또는 파일 경로.
+        stage (str): stage_registry.STAGE_SPECS의 키.
+        chunksize (int): 한 번에 읽을 최대 행 수.
+        progress_callback (callable | None): (읽은 바이트 수, 전체 바이트 수)를 받는 함수.
+        encoding (str | None): 파일 인코딩. None이면 detect_encoding()으로 판별합니다.
+    Returns:
+        tuple | None: 분석 결과 요약 데이터, 모든 날짜 목록. 헤더를 찾지 못하면 None.
+    """
+    spec = get_stage_spec(stage)
+    chunks = read_csv_chunks_for_stage(uploaded_file, stage, chunksize, progress_callback, encoding)
+
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        return None
+
+    try:
+        return _analyze_stage_chunks(itertools.chain([first_chunk], chunks), spec)
+    except Exception as e:
+        if not spec['strict']:
+            raise
+        raise ValueError(f"분석 중 오류가 발생했습니다: {e}")
@@ -0,0 +1,83 @@
+#
+# report_export.py
+# 분석 결과(AnalysisResult)를 ZIP 묶음으로 내보냅니다.
+# 지그마다 리포트 표 CSV 하나와 PASS/가성불량/진성불량/FAIL 시리얼 목록 CSV를 담습니다.
+# 각 CSV는 ZIP 항목에 한 줄씩 바로 압축해 임시 파일에 쓰므로, 목록이 길어도 만드는 동안의 메모리 사용량이 일정합니다.
+
+import csv
+import io
+import re
+import tempfile
+import zipfile
+
+import pandas as pd
+
+from .analysis_service import empty_serial_lists
+
+REPORT_METRICS = [('총 테스트 수', 'total_test'), ('PASS', 'pass'), ('가성불량', 'false_defect'),
+                  ('진성불량', 'true_defect'), ('FAIL', 'fail')]
+SERIAL_LIST_LABELS = [('PASS', 'pass'), ('가성불량', 'false_defect'), ('진성불량', 'true_defect'), ('FAIL', 'fail')]
+
+def _report_rows(result, jig):
+    """리포트 표의 머리행과 지표 행을 차례로 돌려줍니다. 날짜에 값이 없으면 'N/A'입니다."""
+    yield ['지표'] + [d.strftime('%y%m%d') for d in result.dates]
+    jig_summary = result.summary.get(jig, {})
+    points = [jig_summary.get(d.strftime('%Y-%m-%d')) for d in result.dates]
+    for label, key in REPORT_METRICS:
+        yield [label] + [point[key] if point else 'N/A' for point in points]
+
+def report_table(result, jig):
+    """
+    지그 하나의 리포트 표 (지표 × 날짜).
+    Returns:
+        pd.DataFrame: '지표' 컬럼과 'yymmdd' 날짜 컬럼.
+    """
+    header, *rows = _report_rows(result, jig)
+    return pd.DataFrame(rows, columns=header)
+
+def _safe_name(value):
+    """ZIP 항목 이름에 쓸 수 없는 문자를 '_'로 바꿉니다."""
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', str(value)).strip('_') or 'jig'
+
+def _write_csv_entry(zf, name, rows):
+    """행을 한 줄씩 ZIP 항목에 씁니다. 엑셀에서 한글이 깨지지 않도록 BOM을 붙입니다."""
+    with zf.open(name, 'w') as raw, io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow(row)
+
+def _chain_header(header, rows):
+    yield header
+    yield from rows
+
+def write_report_bundle(result, fileobj, jigs=None):
+    """
+    분석 결과를 ZIP 묶음으로 fileobj에 씁니다.
+    항목: '<지그>/report.csv' (리포트 표), '<지그>/<목록>.csv' (SNumber, PC).
+    Args:
+        result (AnalysisResult): 분석 결과.
+        fileobj: 쓰기 가능한 바이너리 파일 객체.
+        jigs (list | None): 내보낼 지그. None이면 결과의 모든 지그.
+    """
+    jigs = sorted(result.summary) if jigs is None else jigs
+    serials = result.serials or {}
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for jig in jigs:
+            folder = _safe_name(jig)
+            _write_csv_entry(zf, f"{folder}/report.csv", _report_rows(result, jig))
+            jig_lists = serials.get(jig) or empty_serial_lists()
+            for label, key in SERIAL_LIST_LABELS:
+                rows = ([s_number, jig] for s_number in jig_lists[key])
+                _write_csv_entry(zf, f"{folder}/{key}.csv", _chain_header(['SNumber', 'PC'], rows))
+
+def export_report_bundle(result, jigs=None):
+    """
+    write_report_bundle()로 임시 파일에 ZIP을 쓴 뒤 완성된 압축 파일의 내용을 돌려줍니다.
+    만드는 동안에는 압축 전 CSV 전체를 메모리에 두지 않습니다.
+    Returns:
+        bytes: ZIP 파일 내용.
+    """
+    with tempfile.TemporaryFile() as f:
+        write_report_bundle(result, f, jigs)
+        f.seek(0)
+        return f.read()
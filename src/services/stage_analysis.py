@@ -0,0 +1,211 @@
+#
+# stage_analysis.py
+# Stage 하나의 분석(일일 집계 → SQL 집계 → 메모리 분석 순서로 고르기)을 화면과 무관하게 실행합니다.
+# Streamlit 탭과 전체 Stage 병렬 분석이 같은 함수를 사용합니다.
+# 병렬 분석의 작업 프로세스에는 DataFrame을 넘기지 않습니다. 각 프로세스가 DB 파일을 읽기 전용으로 열고,
+# 컬럼형 캐시('<DB>.arrow')는 메모리 매핑으로 열어 같은 페이지를 나눠 씁니다. 돌려받는 것은 분석 결과뿐입니다.
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from src.db.aggregate_utils import estimate_stage_rows, choose_analysis_mode, analyze_stage_sql
+from src.db.cache_utils import db_cache_key
+from src.db.dataset_store import open_mapped_dataset, dataset_columns, select_stage_rows
+from src.db.query_utils import get_stage_columns, query_stage_data
+from src.db.rollup_utils import refresh_rollup, load_rollup_analysis
+from src.services.analysis_service import analyze_data
+from src.services.stage_registry import TAB_STAGES, get_stage_spec
+from src.services.stage_schema import parse_stage_timestamps, apply_measurement_dtypes, compact_stage_frame
+from src.utils.instrumentation import span, record_span
+
+# result: AnalysisResult, rows: 메모리 분석에 쓴 원본 행 (일일 집계/SQL 집계였으면 None),
+# source: 'rollup' | 'sql' | 'pandas', warnings: 화면에 알릴 대체 경로 안내 문구 목록
+StageAnalysis = namedtuple('StageAnalysis', ['result', 'rows', 'source', 'warnings'])
+
+def load_stage_rows(conn, stage, date_col, jig_col, start_date, end_date, jig=None, dataset=None):
+    """
+    Stage의 분석 대상 원본 행을 읽습니다. 데이터셋이 있으면 거기서, 없으면 DB에서 읽습니다.
+    date_col에는 변환된 날짜가 들어 있고, 날짜 구간은 양 끝을 포함합니다.
+    Args:
+        dataset (Dataset | None): dataset_store의 공유 데이터셋 또는 open_mapped_dataset()의 결과.
+    Returns:
+        pd.DataFrame: compact_stage_frame()으로 정리된 행.
+    """
+    raw_date_col = get_stage_spec(stage)['date_col']
+    stage_columns = get_stage_columns(conn, stage, jig_col)
+    if dataset is not None and date_col in dataset_columns(dataset):
+        # 데이터셋에는 날짜 컬럼이 이미 변환되어 있으므로 필요한 행만 꺼내면 됩니다.
+        with span('select_dataset_rows') as sp:
+            df = select_stage_rows(dataset, stage, columns=stage_columns + [date_col],
+                                   start_date=start_date, end_date=end_date, jig=jig, jig_col=jig_col)
+            sp.set_frame(df)
+    else:
+        with span('query_stage_data') as sp:
+            df = query_stage_data(conn, stage, stage_columns, start_date, end_date, jig, jig_col)
+            sp.set_frame(df)
+        if not df.empty:
+            with span('parse_timestamps'):
+                apply_measurement_dtypes(df, stage)
+                df[date_col] = parse_stage_timestamps(df[raw_date_col], stage, source='db')
+    if not df.empty:
+        with span('compact_frame') as sp:
+            df = df[(df[date_col].dt.date >= start_date) & (df[date_col].dt.date <= end_date)].copy()
+            compact_stage_frame(df, stage, [jig_col])
+            sp.set_frame(df)
+    return df
+
+def run_stage_analysis(conn, stage, date_col, jig_col, start_date, end_date, jig=None, mode='auto',
+                       estimated_rows=None, dataset=None):
+    """
+    Stage 하나를 분석합니다. auto이면 일일 집계를 먼저 쓰고, 대상 행이 많으면 SQL 집계, 그 외에는 메모리에서 분석합니다.
+    Args:
+        conn: SQLite 연결.
+        stage (str): Stage 이름 또는 탭 키.
+        date_col (str): 변환된 날짜 컬럼 ('<날짜 컬럼>_dt').
+        jig_col (str): 지그 컬럼.
+        start_date, end_date (date): 분석 구간 (양 끝 포함).
+        jig: 지그 값. None이면 모든 지그.
+        mode (str): aggregate_utils.ANALYSIS_MODES 중 하나.
+        estimated_rows (int | None): 카탈로그로 추정한 대상 행 수. None이면 필요할 때 DB에서 셉니다.
+        dataset (Dataset | None): 메모리 분석 때 원본 행을 꺼낼 데이터셋.
+    Returns:
+        StageAnalysis
+    """
+    warnings = []
+    result = None
+    source = None
+    if mode == 'auto':
+        try:
+            with span('refresh_rollup'):
+                refresh_rollup(conn, stage, jig_col)
+            with span('load_rollup_analysis'):
+                result = load_rollup_analysis(conn, stage, start_date, end_date, jig, jig_col)
+            source = 'rollup'
+        except Exception as e:
+            warnings.append(f"일일 집계를 사용할 수 없어 원본 데이터로 분석합니다: {e}")
+
+    if result is None:
+        # 행이 많으면 원본 행을 불러오지 않고 SQLite 안에서 집계합니다.
+        if mode == 'auto' and estimated_rows is None:
+            with span('estimate_stage_rows'):
+                estimated_rows = estimate_stage_rows(conn, stage, start_date, end_date, jig, jig_col)
+        if choose_analysis_mode(estimated_rows or 0, mode) == 'sql':
+            with span('analyze_stage_sql'):
+                result = analyze_stage_sql(conn, stage, start_date, end_date, jig, jig_col)
+            source = 'sql'
+            if result is None:
+                warnings.append("날짜 형식을 SQL로 해석할 수 없어 메모리에서 분석합니다.")
+
+    rows = None
+    if result is None:
+        with span('load_stage_rows'):
+            rows = load_stage_rows(conn, stage, date_col, jig_col, start_date, end_date, jig, dataset)
+        with span('analyze_data') as sp:
+            result = analyze_data(rows, date_col, jig_col, get_stage_spec(stage)['pass_col'])
+            sp.set_frame(rows)
+        source = 'pandas'
+    return StageAnalysis(result, rows, source, warnings)
+
+# 작업 프로세스 안에서만 쓰는 상태: DB 경로 → (DB 버전, 읽기 전용 연결, 메모리 매핑 데이터셋)
+_worker_state = {}
+
+def _open_readonly(db_path):
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + '?mode=ro', uri=True)
+
+def _worker_resources(db_path):
+    """작업 프로세스에서 DB 버전마다 한 번만 연결과 데이터셋을 엽니다."""
+    version = db_cache_key(db_path)
+    state = _worker_state.get(db_path)
+    if state is None or state[0] != version:
+        if state is not None:
+            state[1].close()
+        state = (version, _open_readonly(db_path), open_mapped_dataset(db_path))
+        _worker_state[db_path] = state
+    return state[1], state[2]
+
+def _analyze_stage_job(db_path, job, in_worker=True):
+    """
+    작업 프로세스에서 Stage 하나를 분석합니다. 원본 행은 돌려보내지 않습니다.
+    Returns:
+        tuple: (StageAnalysis, 걸린 시간(초)).
+    """
+    started = time.perf_counter()
+    if in_worker:
+        conn, dataset = _worker_resources(db_path)
+        analysis = run_stage_analysis(conn, dataset=dataset, **job)
+    else:
+        conn = _open_readonly(db_path)
+        try:
+            analysis = run_stage_analysis(conn, dataset=open_mapped_dataset(db_path), **job)
+        finally:
+            conn.close()
+    return analysis._replace(rows=None), time.perf_counter() - started
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """프로세스 전체가 함께 쓰는 작업 프로세스 풀. 처음 쓸 때 만들고 이후에는 재사용합니다."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Streamlit 서버는 여러 스레드로 동작하므로 fork 대신 spawn으로 작업 프로세스를 띄웁니다.
+            _pool = ProcessPoolExecutor(max_workers=max(1, min(len(TAB_STAGES), os.cpu_count() or 1)),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def analyze_stages_parallel(db_path, jobs):
+    """
+    여러 Stage를 작업 프로세스에 나눠 동시에 분석합니다. 전체 시간은 가장 오래 걸리는 Stage에 가깝습니다.
+    작업 프로세스를 띄울 수 없는 환경이면 현재 프로세스에서 차례로 분석합니다.
+    Args:
+        db_path (str): SQLite 파일 경로.
+        jobs (dict): {키: run_stage_analysis()의 인자 dict (conn, dataset 제외)}.
+    Returns:
+        dict: {키: StageAnalysis 또는 그 Stage에서 발생한 예외}. StageAnalysis.rows는 항상 None입니다.
+    """
+    results = {}
+    try:
+        pool = _get_pool()
+        futures = {key: pool.submit(_analyze_stage_job, db_path, job) for key, job in jobs.items()}
+    except (OSError, RuntimeError, BrokenProcessPool):
+        futures = None
+
+    if futures is not None:
+        for key, future in futures.items():
+            try:
+                analysis, seconds = future.result()
+            except BrokenProcessPool as e:
+                _discard_pool(pool)
+                results[key] = e
+                continue
+            except Exception as e:
+                results[key] = e
+                continue
+            record_span(f"worker {key}", seconds, source=analysis.source)
+            results[key] = analysis
+        return results
+
+    for key, job in jobs.items():
+        try:
+            analysis, seconds = _analyze_stage_job(db_path, job, in_worker=False)
+        except Exception as e:
+            results[key] = e
+            continue
+        record_span(f"serial {key}", seconds, source=analysis.source)
+        results[key] = analysis
+    return results
@@ -0,0 +1,110 @@
+#
+# stage_registry.py
+# 검사 공정(Stage)별 컬럼명과 헤더 키워드를 한 곳에서 관리합니다.
+# 새 검사 공정을 추가할 때는 STAGE_SPECS에 항목 하나만 추가하면 됩니다.
+
+STAGE_SPECS = {
+    'Pcb': {
+        'date_col': 'PcbStartTime',
+        'jig_col': 'PcbMaxIrPwr',
+        'pass_col': 'PcbPass',
+        'serial_col': 'SNumber',
+        'header_keywords': ['SNumber', 'PcbStartTime', 'PcbMaxIrPwr', 'PcbPass'],
+    },
+    'Fw': {
+        'date_col': 'FwStamp',
+        'jig_col': 'FwPC',
+        'pass_col': 'FwPass',
+        'serial_col': 'SNumber',
+        'header_keywords': ['SNumber', 'FwStamp', 'FwPC', 'FwPass'],
+    },
+    'RfTx': {
+        'date_col': 'RfTxStamp',
+        'jig_col': 'RfTxPC',
+        'pass_col': 'RfTxPass',
+        'serial_col': 'SNumber',
+        'header_keywords': ['SNumber', 'RfTxStamp', 'RfTxPC', 'RfTxPass'],
+    },
+    'SemiAssy': {
+        'date_col': 'SemiAssyStartTime',
+        'jig_col': 'SemiAssyMaxSolarVolt',
+        # historyinspection 테이블에서는 SemiAssyPC 컬럼을 지그로 사용합니다.
+        'db_jig_col': 'SemiAssyPC',
+        'pass_col': 'SemiAssyPass',
+        'serial_col': 'SNumber',
+        'header_keywords': ['SNumber', 'SemiAssyStartTime', 'SemiAssyMaxSolarVolt', 'SemiAssyPass'],
+        # SemiAssy 파일은 헤더 앞뒤에 공백이 섞여 있어 별도 규칙을 사용합니다.
+        'header_scan_rows': 20,
+        'header_match': 'contains',
+        'skipinitialspace': True,
+        'tidy_header': True,
+        'clean_rule': 'quoted',
+        'clean_columns': ['SemiAssyStartTime', 'SemiAssyPass'],
+        'timestamp_format': '%Y%m%d%H%M%S',
+        'required_columns': ['SNumber', 'SemiAssyStartTime', 'SemiAssyPass'],
+        'jig_fallback_cols': ['BatadcPC'],
+        'default_jig': 'SemiAssy_JIG',
+        # strict: 필수 컬럼 검사, 날짜가 없는 행 제외, 빈 지그 제외, 오류를 ValueError로 전달
+        'strict': True,
+    },
+    'Batadc': {
+        'date_col': 'BatadcStamp',
+        'jig_col': 'BatadcPC',
+        'pass_col': 'BatadcPass',
+        'serial_col': 'SNumber',
+        'header_keywords': ['SNumber', 'BatadcStamp', 'BatadcPC', 'BatadcPass'],
+    },
+}
+
+# Streamlit 탭 키 → Stage 이름
+TAB_STAGES = {
+    'pcb': 'Pcb',
+    'fw': 'Fw',
+    'rftx': 'RfTx',
+    'semi': 'SemiAssy',
+    'func': 'Batadc',
+}
+
+# 명시하지 않은 항목은 아래 기본값을 따릅니다.
+DEFAULT_STAGE_SPEC = {
+    'db_jig_col': None,
+    # 인코딩 후보 (앞에서부터 우선). 실제 인코딩은 csv_service.detect_encoding()이 한 번만 판별합니다.
+    'encodings': ['utf-8-sig', 'utf-8', 'cp949', 'euc-kr', 'latin-1'],
+    'header_scan_rows': 100,
+    'header_match': 'exact',
+    'skipinitialspace': False,
+    'tidy_header': False,
+    'clean_rule': 'excel',
+    'clean_columns': None,
+    # 날짜 컬럼 형식. None이면 아래 후보 중 데이터에 맞는 형식을 컬럼마다 한 번 판별해 고정 형식으로 변환합니다.
+    'timestamp_format': None,
+    # historyinspection 테이블의 날짜 형식. CSV 내보내기와 다를 수 있어 따로 둡니다.
+    'db_timestamp_format': None,
+    'timestamp_formats': ['%Y%m%d%H%M%S', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f',
+                          '%Y%m%d', '%Y-%m-%d', 'ISO8601'],
+    # 측정값 컬럼 → dtype (예: {'PcbIrPwr': 'float32'}). SNumber/합격 컬럼은 항상 문자열로 읽습니다.
+    # 지그로 쓰이는 측정 컬럼(PcbMaxIrPwr, SemiAssyMaxSolarVolt 등)은 리포트의 지그 표기가 바뀌므로 넣지 않습니다.
+    'measurement_dtypes': {},
+    'required_columns': [],
+    'jig_fallback_cols': [],
+    'default_jig': None,
+    'strict': False,
+}
+
+def get_stage_spec(stage):
+    """
+    Stage 이름에 해당하는 설정을 기본값과 합쳐 반환합니다.
+    Args:
+        stage (str): STAGE_SPECS의 키 (예: 'Pcb', 'Fw', 'RfTx', 'SemiAssy', 'Batadc') 또는 TAB_STAGES의 탭 키.
+    Returns:
+        dict: 기본값이 채워진 Stage 설정. 'db_jig_col'이 없으면 'jig_col'과 같습니다.
+    """
+    stage = TAB_STAGES.get(stage, stage)
+    if stage not in STAGE_SPECS:
+        raise KeyError(f"알 수 없는 Stage입니다: {stage} (사용 가능: {', '.join(STAGE_SPECS)})")
+    spec = dict(DEFAULT_STAGE_SPEC)
+    spec.update(STAGE_SPECS[stage])
+    spec['stage'] = stage
+    if spec['db_jig_col'] is None:
+        spec['db_jig_col'] = spec['jig_col']
+    return spec
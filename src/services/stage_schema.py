@@ -0,0 +1,156 @@
+#
+# stage_schema.py
+# stage_registry의 Stage 설정(날짜 형식, SNumber/합격 컬럼, 측정값 dtype)을 실제 데이터에 적용합니다.
+# SQLite 조회 결과와 CSV 로더가 같은 함수를 사용하므로, 모든 Stage가 같은 규칙으로 변환됩니다.
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype, is_integer_dtype, is_float_dtype, is_bool_dtype
+
+from .stage_registry import get_stage_spec
+
+TIMESTAMP_SAMPLE_SIZE = 200
+
+# 합격 여부 코드 (int8). encode_pass_status()가 만듭니다.
+PASS_STATUS_UNKNOWN = 0
+PASS_STATUS_PASS = 1
+PASS_STATUS_FAIL = 2
+
+def _timestamp_text(values):
+    """숫자로 저장된 타임스탬프(예: 20240301123000)는 정수 문자열로 바꿉니다. 그대로 두면 epoch 나노초로 해석됩니다."""
+    values = pd.Series(values)
+    if is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.round().astype('Int64').astype('string')
+    return values
+
+def detect_timestamp_format(values, candidates, sample_size=TIMESTAMP_SAMPLE_SIZE):
+    """
+    값 일부로 후보 형식 중 가장 많이 맞는 형식을 고릅니다.
+    Returns:
+        str | None: 맞는 형식이 없으면 None.
+    """
+    sample = _timestamp_text(values).dropna()
+    sample = sample[sample.astype(str).str.strip() != ''].head(sample_size)
+    if sample.empty:
+        return None
+
+    best_format, best_count = None, 0
+    for fmt in candidates:
+        count = pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        if count > best_count:
+            best_format, best_count = fmt, count
+            if count == len(sample):
+                break
+    return best_format
+
+# 숫자만으로 된 형식 → 자릿수. 문자열 파싱 대신 숫자 연산으로 연/월/일/시/분/초를 나눕니다.
+_DIGIT_FORMATS = {'%Y%m%d%H%M%S': 14, '%Y%m%d': 8}
+
+def _parse_digit_timestamps(values, width):
+    """
+    YYYYMMDD[HHMMSS] 값을 숫자로 바꾼 뒤 구성 요소별로 조립합니다. 같은 형식의 strptime보다 몇 배 빠릅니다.
+    자릿수가 정확히 맞는 값만 변환하며, 자릿수가 모자란 값은 NaT가 됩니다.
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    numbers = numbers.where((numbers >= 10 ** (width - 1)) & (numbers < 10 ** width) & (numbers % 1 == 0))
+    if width == 8:
+        numbers = numbers * 1000000
+    parts = pd.DataFrame({
+        'year': numbers // 10 ** 10,
+        'month': numbers // 10 ** 8 % 100,
+        'day': numbers // 10 ** 6 % 100,
+        'hour': numbers // 10 ** 4 % 100,
+        'minute': numbers // 100 % 100,
+        'second': numbers % 100,
+    }, index=values.index)
+    return pd.to_datetime(parts, errors='coerce')
+
+def parse_timestamps(values, fmt=None):
+    """
+    고정 형식으로 날짜를 변환합니다. 변환할 수 없는 값은 NaT가 됩니다.
+    fmt가 None이면 pandas 형식 추론을 사용합니다 (기존 동작).
+    """
+    values = _timestamp_text(values)
+    if fmt is None:
+        return pd.to_datetime(values, errors='coerce')
+    if fmt in _DIGIT_FORMATS:
+        return _parse_digit_timestamps(values, _DIGIT_FORMATS[fmt])
+    return pd.to_datetime(values, format=fmt, errors='coerce')
+
+def resolve_timestamp_format(values, spec, source='csv'):
+    """
+    Stage 설정에 형식이 있으면 그 형식을, 없으면 후보 중 데이터에 맞는 형식을 반환합니다.
+    source가 'db'이면 DB 저장 형식(db_timestamp_format)을 사용합니다. CSV 내보내기와 형식이 다를 수 있기 때문입니다.
+    """
+    fmt = spec['db_timestamp_format'] if source == 'db' else spec['timestamp_format']
+    return fmt or detect_timestamp_format(values, spec['timestamp_formats'])
+
+def parse_stage_timestamps(values, stage, source='csv'):
+    """Stage의 날짜 컬럼 값을 Stage 설정의 형식으로 변환합니다."""
+    spec = get_stage_spec(stage) if isinstance(stage, str) else stage
+    return parse_timestamps(values, resolve_timestamp_format(values, spec, source))
+
+def stage_read_dtypes(stage):
+    """CSV를 읽을 때 넘길 dtype. SNumber와 합격 컬럼은 앞자리 0 등이 바뀌지 않도록 문자열로 읽습니다."""
+    spec = get_stage_spec(stage) if isinstance(stage, str) else stage
+    dtypes = {spec['serial_col']: str, spec['pass_col']: str}
+    dtypes.update(spec['measurement_dtypes'])
+    return dtypes
+
+def apply_measurement_dtypes(df, stage):
+    """측정값 컬럼을 Stage 설정의 dtype으로 바꿉니다. 숫자로 바꿀 수 없는 값은 NaN이 됩니다."""
+    spec = get_stage_spec(stage) if isinstance(stage, str) else stage
+    for col, dtype in spec['measurement_dtypes'].items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return df
+
+def encode_pass_status(values):
+    """
+    합격 컬럼 값을 int8 코드로 바꿉니다. 공백을 제거하고 대문자로 비교해 'O'는 PASS, 'X'는 FAIL, 그 외는 UNKNOWN입니다.
+    문자열 정리는 고유값에만 하므로 행마다 문자열을 새로 만들지 않습니다.
+    Returns:
+        pd.Series: int8 코드. 인덱스는 values와 같습니다.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    normalized = pd.Index(uniques).astype(str).str.strip().str.upper()
+    lookup = np.where(normalized == 'O', PASS_STATUS_PASS,
+                      np.where(normalized == 'X', PASS_STATUS_FAIL, PASS_STATUS_UNKNOWN)).astype(np.int8)
+    # 결측값의 코드(-1)는 마지막 칸(UNKNOWN)을 가리킵니다.
+    lookup = np.append(lookup, np.int8(PASS_STATUS_UNKNOWN))
+    return pd.Series(lookup[codes], index=values.index, dtype=np.int8)
+
+def _downcast_numeric(series):
+    """값이 바뀌지 않는 범위에서 더 작은 숫자 dtype으로 바꿉니다."""
+    if is_bool_dtype(series) or not isinstance(series.dtype, np.dtype):
+        return series
+    if is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if is_float_dtype(series) and series.dtype != np.float32:
+        narrow = series.astype(np.float32)
+        if ((narrow.astype(series.dtype) == series) | series.isna()).all():
+            return narrow
+    return series
+
+def compact_stage_frame(df, stage, jig_cols=()):
+    """
+    분석에 쓰는 DataFrame의 메모리를 줄입니다 (제자리 변경).
+    지그/합격 컬럼과 SNumber는 category로 바꿔 값마다 한 번만 저장하고, 숫자 컬럼은 값이 그대로 유지되는 범위에서 줄입니다.
+    category 컬럼은 groupby도 코드 기준으로 처리되어 빨라집니다.
+    Args:
+        df (pd.DataFrame): 바꿀 DataFrame.
+        stage (str | dict): Stage 이름 또는 Stage 설정.
+        jig_cols (iterable): category로 바꿀 지그 컬럼.
+    Returns:
+        pd.DataFrame: 같은 df.
+    """
+    spec = get_stage_spec(stage) if isinstance(stage, str) else stage
+    categorical = [col for col in dict.fromkeys([spec['serial_col'], spec['pass_col'], *jig_cols]) if col in df.columns]
+    for col in categorical:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in df.columns:
+        if col not in categorical and is_numeric_dtype(df[col]):
+            df[col] = _downcast_numeric(df[col])
+    return df
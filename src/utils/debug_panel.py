@@ -0,0 +1,74 @@
+#
+# debug_panel.py
+# 사이드바의 디버그 패널입니다. instrumentation.py로 측정한 구간별 시간/행 수/메모리와 cProfile 결과를 보여 줍니다.
+# 측정 기록은 세션마다 최근 DEBUG_TRACE_LIMIT개만 보관합니다. SJ_TRACE_LOG를 지정하면 같은 내용이 로그 파일에도 남습니다.
+
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from src.utils.instrumentation import TRACE_LOG_PATH, trace_scope
+
+DEBUG_TRACE_LIMIT = 20
+# 실행 기록 선택 상자에서 항상 가장 최근 기록을 가리키는 값
+LATEST = 'latest'
+
+@contextmanager
+def debug_trace(label):
+    """
+    앱 실행이나 탭 fragment 실행 하나를 측정하고, 새로 시작한 Trace이면 세션의 디버그 기록에 추가합니다.
+    st.stop()/st.rerun()으로 중간에 끝나도 그때까지의 측정은 남깁니다.
+    """
+    measure_memory = st.session_state.get('debug_measure_memory', False)
+    with trace_scope(label, measure_memory) as trace:
+        try:
+            yield trace
+        finally:
+            if trace is not None:
+                traces = st.session_state.setdefault('debug_traces', [])
+                traces.append(trace)
+                del traces[:-DEBUG_TRACE_LIMIT]
+
+def consume_profile_request():
+    """'다음 분석 cProfile 기록'이 예약되어 있으면 True를 반환하고 예약을 지웁니다."""
+    return st.session_state.pop('debug_profile_pending', False)
+
+def _span_table(trace):
+    rows = []
+    for record in trace.spans:
+        rows.append({
+            '구간': ' ' * record['depth'] + record['name'],
+            '시간(ms)': round(record['seconds'] * 1000, 1) if record['seconds'] is not None else None,
+            '행 수': record.get('rows'),
+            '메모리(MB)': record.get('memory_mb'),
+        })
+    return pd.DataFrame(rows, columns=['구간', '시간(ms)', '행 수', '메모리(MB)'])
+
+def render_debug_panel():
+    """사이드바에 접을 수 있는 디버그 패널을 그립니다."""
+    with st.sidebar:
+        with st.expander("🛠 디버그 (성능 측정)", expanded=False):
+            st.toggle("DataFrame 메모리 측정", key='debug_measure_memory',
+                      help="구간마다 DataFrame의 메모리 사용량을 잽니다. 큰 데이터에서는 측정 자체에 시간이 걸립니다.")
+            if st.button("다음 분석 1회 cProfile 기록", key='debug_profile_btn'):
+                st.session_state.debug_profile_pending = True
+            if st.session_state.get('debug_profile_pending'):
+                st.caption("다음 '분석 실행' 때 cProfile을 기록합니다.")
+            st.caption(f"로그 파일: {TRACE_LOG_PATH or '기록하지 않음'}")
+
+            traces = st.session_state.get('debug_traces', [])
+            if not traces:
+                st.caption("측정 기록이 없습니다.")
+                return
+            # 탭 안에서 조작한 기록(fragment 실행)은 다음 전체 실행 때 목록에 나타납니다.
+            by_id = {trace.trace_id: trace for trace in traces}
+            labels = {trace_id: f"{trace.started_at[11:]} {trace.label} ({trace.seconds:.2f}초)"
+                      for trace_id, trace in by_id.items()}
+            selected = st.selectbox("실행 기록", [LATEST] + list(reversed(by_id)), key='debug_trace_select',
+                                    format_func=lambda trace_id: labels.get(trace_id, "최근 실행"))
+            trace = by_id.get(selected, traces[-1])
+            st.dataframe(_span_table(trace), hide_index=True, width='stretch')
+            if trace.profile_text:
+                st.markdown("**cProfile (누적 시간 상위)**")
+                st.code(trace.profile_text, language=None)
@@ -0,0 +1,191 @@
+#
+# instrumentation.py
+# 느린 구간을 찾기 위한 가벼운 측정 도구입니다. streamlit을 import하지 않으므로 어디서든 쓸 수 있습니다.
+# - Trace: 한 번의 실행(앱 실행, 탭 fragment 실행 등)에서 측정한 구간을 모읍니다. 끝나면 로그 파일에 한 줄로 기록합니다.
+# - span(): 구간 하나의 시간을 잽니다. 진행 중인 Trace가 없으면 아무것도 하지 않으므로 항상 감싸 두어도 됩니다.
+# - profile_block(): 진행 중인 Trace에 cProfile 결과(누적 시간 상위 함수)를 붙입니다.
+# 파일 기록은 환경 변수 SJ_TRACE_LOG에 경로를 지정했을 때만 합니다 (기본: 기록하지 않음).
+# 파일이 TRACE_LOG_MAX_BYTES를 넘으면 '<경로>.1'로 옮기고 새 파일에 이어 씁니다.
+
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+TRACE_LOG_PATH = os.environ.get('SJ_TRACE_LOG', '')
+TRACE_LOG_MAX_BYTES = 10 * 1024 * 1024
+PROFILE_LIMIT = 40
+
+_current = contextvars.ContextVar('sj_trace', default=None)
+_log_lock = threading.Lock()
+
+class Trace:
+    """
+    구간 측정 결과를 모읍니다. with 블록 안에서 호출한 span()이 이 Trace에 기록됩니다.
+    Args:
+        label (str): 실행 이름 (예: '앱 실행', '탭 fw').
+        measure_memory (bool): True이면 span에 넘긴 DataFrame의 메모리 사용량(deep)도 잽니다.
+        log_path (str | None): 끝났을 때 기록할 JSON Lines 파일. None이면 TRACE_LOG_PATH.
+    """
+
+    def __init__(self, label, measure_memory=False, log_path=None):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.measure_memory = measure_memory
+        self.log_path = TRACE_LOG_PATH if log_path is None else log_path
+        self.started_at = None
+        self.seconds = None
+        self.spans = []
+        self.profile_text = None
+        self._stack = []
+
+    def __enter__(self):
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._started
+        _current.reset(self._token)
+        try:
+            write_trace_log(self)
+        except OSError:
+            # 로그를 못 쓰더라도 화면 동작에는 영향을 주지 않습니다.
+            pass
+        return False
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'label': self.label,
+            'started_at': self.started_at,
+            'seconds': round(self.seconds, 4) if self.seconds is not None else None,
+            'spans': self.spans,
+            'profile': self.profile_text,
+        }
+
+class SpanHandle:
+    """span() 안에서 행 수, DataFrame 메모리 등 추가 정보를 기록합니다."""
+
+    def __init__(self, record, trace):
+        self.record = record
+        self.trace = trace
+
+    def set(self, **fields):
+        if self.record is not None:
+            self.record.update(fields)
+
+    def set_frame(self, df):
+        """DataFrame의 행 수와 (measure_memory일 때) 메모리 사용량을 기록합니다."""
+        if self.record is None or df is None:
+            return
+        self.record['rows'] = len(df)
+        if self.trace.measure_memory:
+            self.record['memory_mb'] = round(float(df.memory_usage(deep=True).sum()) / 2 ** 20, 2)
+
+_NULL_SPAN = SpanHandle(None, None)
+
+def current_trace():
+    """진행 중인 Trace. 없으면 None."""
+    return _current.get()
+
+@contextmanager
+def span(name, **fields):
+    """
+    구간 하나의 시간을 잽니다. 진행 중인 Trace가 없으면 측정하지 않습니다.
+    Yields:
+        SpanHandle: set()/set_frame()으로 추가 정보를 기록합니다.
+    """
+    trace = _current.get()
+    if trace is None:
+        yield _NULL_SPAN
+        return
+    record = dict(name=name, depth=len(trace._stack), seconds=None, **fields)
+    trace.spans.append(record)
+    trace._stack.append(record)
+    started = time.perf_counter()
+    try:
+        yield SpanHandle(record, trace)
+    finally:
+        record['seconds'] = round(time.perf_counter() - started, 4)
+        trace._stack.pop()
+
+def record_span(name, seconds, **fields):
+    """다른 곳(예: 작업 프로세스)에서 잰 시간을 진행 중인 Trace에 끝난 구간으로 추가합니다."""
+    trace = _current.get()
+    if trace is None:
+        return
+    trace.spans.append(dict(name=name, depth=len(trace._stack), seconds=round(seconds, 4), **fields))
+
+@contextmanager
+def trace_scope(label, measure_memory=False):
+    """
+    진행 중인 Trace가 있으면 그 안의 span으로, 없으면 새 Trace로 측정합니다.
+    fragment처럼 앱 실행 안에서도, 단독으로도 실행되는 부분에 씁니다.
+    Yields:
+        Trace | None: 새로 시작한 Trace. 기존 Trace 안의 span이면 None.
+    """
+    if _current.get() is not None:
+        with span(label):
+            yield None
+        return
+    with Trace(label, measure_memory) as trace:
+        yield trace
+
+@contextmanager
+def profile_block(enabled=True, limit=PROFILE_LIMIT):
+    """
+    블록 안의 실행을 cProfile로 기록해 진행 중인 Trace의 profile_text에 누적 시간 상위 limit개 함수를 남깁니다.
+    다른 프로파일러가 이미 켜져 있으면 기록하지 않습니다.
+    """
+    trace = _current.get()
+    if not enabled or trace is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        trace.profile_text = out.getvalue()
+
+def write_trace_log(trace, path=None):
+    """Trace 하나를 JSON Lines 파일에 한 줄로 추가합니다. 파일이 TRACE_LOG_MAX_BYTES를 넘으면 먼저 교체합니다."""
+    path = trace.log_path if path is None else path
+    if not path:
+        return
+    line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str)
+    with _log_lock:
+        if os.path.exists(path) and os.path.getsize(path) >= TRACE_LOG_MAX_BYTES:
+            # 바로 이전 파일 하나만 남기므로 로그 파일 크기는 최대 약 2 × TRACE_LOG_MAX_BYTES입니다.
+            os.replace(path, path + '.1')
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+def read_trace_log(path=None, limit=None):
+    """
+    로그 파일의 Trace 기록을 읽습니다. 오프라인 비교용입니다.
+    Returns:
+        list: Trace.to_dict() 형태의 기록 (오래된 순). limit이 있으면 마지막 limit개.
+    """
+    path = TRACE_LOG_PATH if path is None else path
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return records[-limit:] if limit else records
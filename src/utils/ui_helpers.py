@@ -1,17 +1,78 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, date
 
-def display_analysis_result(analysis_key, table_name, date_col_name, selected_jig=None, used_jig_col=None):
-    if st.session_state.analysis_results[analysis_key].empty:
+from src.db.db_utils import get_shared_dataset
+from src.db.catalog_utils import get_stage_catalog, catalog_jigs, catalog_date_bounds, estimate_catalog_rows
+from src.db.query_utils import database_path, get_table_columns, search_snumber
+from src.services.analysis_service import analyze_data, empty_serial_lists
+from src.services.report_export import SERIAL_LIST_LABELS, report_table, export_report_bundle
+from src.services.stage_analysis import load_stage_rows, run_stage_analysis, analyze_stages_parallel
+from src.services.stage_registry import get_stage_spec
+from src.utils.instrumentation import span, profile_block
+from src.utils.debug_panel import debug_trace, consume_profile_request
+
+SERIAL_PAGE_SIZE = 200
+
+def _format_serials(serials, jig):
+    return "\n".join(f"S/N: {s_number}, PC: {jig}" for s_number in serials)
+
+def _reset_page(page_key):
+    st.session_state[page_key] = 0
+
+def display_serial_list(list_id, label, jig, serials, table_name):
+    """
+    시리얼 목록 하나를 접힌 expander로 그립니다. 펼쳤을 때만 검색/페이지 단위로 내용을 만들어 보내므로,
+    목록이 길어도 리포트 화면은 가볍게 유지됩니다. 다운로드 파일은 버튼을 누를 때 만듭니다.
+    """
+    expander = st.expander(f"{label} ({len(serials):,}건)", expanded=False, key=f"sn_list_{list_id}", on_change='rerun')
+    if not expander.open:
+        return
+
+    page_key = f"sn_page_{list_id}"
+    with expander:
+        query = st.text_input("S/N 검색", key=f"sn_query_{list_id}", on_change=_reset_page, args=(page_key,))
+        if query:
+            needle = query.strip().lower()
+            matched = [s_number for s_number in serials if needle in str(s_number).lower()]
+        else:
+            matched = serials
+
+        page_count = max(1, -(-len(matched) // SERIAL_PAGE_SIZE))
+        page = min(st.session_state.get(page_key, 0), page_count - 1)
+        col_prev, col_info, col_next = st.columns([1, 3, 1])
+        with col_prev:
+            if st.button("◀ 이전", key=f"sn_prev_{list_id}", disabled=page == 0):
+                page -= 1
+        with col_next:
+            if st.button("다음 ▶", key=f"sn_next_{list_id}", disabled=page >= page_count - 1):
+                page += 1
+        st.session_state[page_key] = page
+
+        start = page * SERIAL_PAGE_SIZE
+        end = min(start + SERIAL_PAGE_SIZE, len(matched))
+        with col_info:
+            st.caption(f"{len(matched):,}건 중 {start + 1 if matched else 0:,}–{end:,} ({page + 1}/{page_count} 페이지)")
+        st.text(_format_serials(matched[start:end], jig))
+
+        st.download_button(
+            label=f"{label} 목록 다운로드",
+            data=lambda: _format_serials(matched, jig).encode('utf-8-sig'),
+            file_name=f"{table_name}_{jig}_{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+            mime="text/plain",
+            key=f"sn_download_{list_id}",
+        )
+
+def display_analysis_result(analysis_key, table_name, selected_jig=None):
+    raw_df = st.session_state.analysis_results[analysis_key]
+    if raw_df is not None and raw_df.empty:
         st.warning("선택한 날짜에 해당하는 분석 데이터가 없습니다.")
         return
 
-    summary_data, all_dates, used_jig_col_name_from_state = st.session_state.analysis_data[analysis_key]
-    
-    if used_jig_col is None:
-        used_jig_col = used_jig_col_name_from_state
-        
+    # 분석 결과(AnalysisResult)를 화면에 옮기기만 합니다. 시리얼 목록도 분석 단계에서 만들어 둔 것을 씁니다.
+    result = st.session_state.analysis_data[analysis_key]
+    summary_data = result.summary
+
     if not summary_data:
         st.warning("선택한 날짜에 해당하는 분석 데이터가 없습니다.")
         return
@@ -24,64 +85,30 @@ def display_analysis_result(analysis_key, table_name, date_col_name, selected_ji
         st.warning("선택한 PC (Jig)에 대한 데이터가 없습니다.")
         return
         
-    kor_date_cols = [f"{d.strftime('%y%m%d')}" for d in all_dates]
-    
     st.write(f"**분석 시간**: {st.session_state.analysis_time[analysis_key]}")
     st.markdown("---")
 
-    all_reports_text = ""
-    
     for jig in jigs_to_display:
         st.subheader(f"구분: {jig}")
-        
-        report_data = {'지표': ['총 테스트 수', 'PASS', '가성불량', '진성불량', 'FAIL']}
-        
-        for date_iso, date_str in zip([d.strftime('%Y-%m-%d') for d in all_dates], kor_date_cols):
-            data_point = summary_data[jig].get(date_iso)
-            if data_point:
-                report_data[date_str] = [data_point['total_test'], data_point['pass'], data_point['false_defect'], data_point['true_defect'], data_point['fail']]
-            else:
-                report_data[date_str] = ['N/A'] * 5
-        
-        report_df = pd.DataFrame(report_data)
+        report_df = report_table(result, jig)
         st.table(report_df)
-        all_reports_text += report_df.to_csv(index=False) + "\n"
 
         st.markdown("#### 상세 내역")
-        df_filtered = st.session_state.analysis_results[analysis_key]
-        
-        jig_filtered_df = df_filtered[df_filtered[used_jig_col] == jig].copy()
-        
-        pass_sns = jig_filtered_df.groupby('SNumber')['PassStatusNorm'].apply(lambda x: 'O' in x.tolist()).loc[lambda x: x].index.tolist()
-        formatted_pass_sns = [f"S/N: {s_number}, PC: {jig}" for s_number in pass_sns]
-        with st.expander(f"PASS ({len(pass_sns)}건)", expanded=False):
-            st.text("\n".join(formatted_pass_sns))
-        
-        false_defect_sns = jig_filtered_df[(jig_filtered_df['PassStatusNorm'] == 'X') & (jig_filtered_df['SNumber'].isin(pass_sns))]['SNumber'].unique().tolist()
-        formatted_false_sns = [f"S/N: {s_number}, PC: {jig}" for s_number in false_defect_sns]
-        with st.expander(f"가성불량 ({len(false_defect_sns)}건)", expanded=False):
-            st.text("\n".join(formatted_false_sns))
-            
-        true_defect_sns = jig_filtered_df[(jig_filtered_df['PassStatusNorm'] == 'X') & (~jig_filtered_df['SNumber'].isin(pass_sns))]['SNumber'].unique().tolist()
-        formatted_true_sns = [f"S/N: {s_number}, PC: {jig}" for s_number in true_defect_sns]
-        with st.expander(f"진성불량 ({len(true_defect_sns)}건)", expanded=False):
-            st.text("\n".join(formatted_true_sns))
-
-        fail_sns = jig_filtered_df['SNumber'].unique().tolist()
-        all_fail_sns = list(set(fail_sns) - set(pass_sns))
-        formatted_fail_sns = [f"S/N: {s_number}, PC: {jig}" for s_number in all_fail_sns]
-        with st.expander(f"FAIL ({len(all_fail_sns)}건)", expanded=False):
-            st.text("\n".join(formatted_fail_sns))
+        jig_lists = result.serials.get(jig) or empty_serial_lists()
+
+        for label, list_key in SERIAL_LIST_LABELS:
+            display_serial_list(f"{analysis_key}_{jig}_{list_key}", label, jig, jig_lists[list_key], table_name)
         
         st.markdown("---")
 
     st.success("분석 완료! 결과가 저장되었습니다.")
 
+    # 지그별 리포트와 시리얼 목록을 담은 ZIP은 버튼을 누를 때만 만듭니다.
     st.download_button(
-        label="분석 결과 다운로드",
-        data=all_reports_text.encode('utf-8-sig'),
-        file_name=f"{table_name}_analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        mime="text/csv",
+        label="분석 결과 다운로드 (ZIP)",
+        data=lambda: export_report_bundle(result, jigs_to_display),
+        file_name=f"{table_name}_analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+        mime="application/zip",
         key=f"download_{analysis_key}"
     )
 
@@ -103,9 +130,11 @@ def display_analysis_result(analysis_key, table_name, date_col_name, selected_ji
         if st.session_state.show_bar_chart.get(analysis_key, False):
             st.bar_chart(chart_data)
 
-def display_data_views(tab_key, df_all_data):
+def display_data_views(tab_key, conn):
     st.markdown("---")
     snumber_query = st.text_input("SNumber를 입력하세요", key=f"snumber_search_bar_{tab_key}")
+    search_modes = {'포함': 'contains', '앞부분 일치': 'prefix', '정확히 일치': 'exact'}
+    search_mode = st.radio("검색 방식", list(search_modes), horizontal=True, key=f"snumber_search_mode_{tab_key}")
     
     col1, col2 = st.columns(2)
     with col1:
@@ -113,9 +142,11 @@ def display_data_views(tab_key, df_all_data):
             if snumber_query:
                 st.session_state.snumber_search[tab_key]['show'] = True
                 with st.spinner("데이터베이스에서 SNumber 검색 중..."):
-                    filtered_df = df_all_data[
-                        df_all_data['SNumber'].fillna('').astype(str).str.contains(snumber_query, case=False, na=False)
-                    ].copy()
+                    try:
+                        filtered_df = search_snumber(conn, snumber_query, search_modes[search_mode])
+                    except Exception as e:
+                        st.error(f"SNumber 검색 중 오류가 발생했습니다: {e}")
+                        filtered_df = pd.DataFrame()
                 
                 if not filtered_df.empty:
                     st.success(f"'{snumber_query}'에 대한 {len(filtered_df)}건의 검색 결과를 찾았습니다.")
@@ -129,9 +160,15 @@ def display_data_views(tab_key, df_all_data):
     with col2:
         if st.button("원본 DB 조회", key=f"view_last_db_{tab_key}"):
             st.session_state.original_db_view[tab_key]['show'] = True
+            analysis_query = st.session_state.get('analysis_query', {}).get(tab_key)
             if st.session_state.analysis_results[tab_key] is not None:
                 st.success(f"{tab_key.upper()} 탭의 원본 데이터를 조회합니다.")
                 st.session_state.original_db_view[tab_key]['results'] = st.session_state.analysis_results[tab_key].copy()
+            elif analysis_query is not None:
+                # 일일 집계로 분석한 경우 원본 행은 조회할 때 읽습니다.
+                st.success(f"{tab_key.upper()} 탭의 원본 데이터를 조회합니다.")
+                with st.spinner("원본 데이터를 불러오는 중..."):
+                    st.session_state.original_db_view[tab_key]['results'] = read_stage_rows(conn, tab_key, **analysis_query)
             else:
                 st.warning(f"먼저 {tab_key.upper()} 탭에서 '분석 실행' 버튼을 눌러 데이터를 분석해주세요.")
                 st.session_state.original_db_view[tab_key]['results'] = pd.DataFrame()
@@ -141,3 +178,158 @@ def display_data_views(tab_key, df_all_data):
 
     if st.session_state.original_db_view[tab_key]['show'] and not st.session_state.original_db_view[tab_key]['results'].empty:
         st.dataframe(st.session_state.original_db_view[tab_key]['results'].reset_index(drop=True))
+
+def read_stage_rows(conn, tab_key, date_col, jig_col, start_date, end_date, jig=None):
+    """
+    탭의 분석 대상 원본 행을 읽습니다. 공유 데이터셋이 있으면 거기서, 없으면 DB에서 읽습니다.
+    date_col에는 변환된 날짜가 들어 있고, 날짜 구간은 양 끝을 포함합니다.
+    """
+    try:
+        return load_stage_rows(conn, tab_key, date_col, jig_col, start_date, end_date, jig, get_shared_dataset())
+    except Exception as e:
+        st.error(f"'{tab_key}' 데이터를 불러오는 중 오류가 발생했습니다: {e}")
+        return pd.DataFrame()
+
+def store_analysis(tab_key, analysis_data, df_filtered, analysis_query):
+    """탭의 분석 결과를 세션에 저장합니다. df_filtered가 None이면 원본 행은 조회 화면에서 필요할 때 읽습니다."""
+    st.session_state.analysis_results[tab_key] = df_filtered
+    st.session_state.analysis_data[tab_key] = analysis_data
+    st.session_state.setdefault('analysis_query', {})[tab_key] = analysis_query
+    st.session_state.analysis_time[tab_key] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    st.session_state.analysis_status[tab_key]['analyzed'] = True
+
+def display_stage_tab(conn, tab_key, header, date_col, jig_col_name):
+    """
+    탭 하나의 PC/날짜 선택, 분석 실행, 결과 및 조회 화면을 그립니다.
+    분석에 필요한 행과 컬럼만 DB에서 읽으므로 전체 테이블을 불러오지 않습니다.
+    """
+    st.header(header)
+
+    table_columns = get_table_columns(conn)
+    if jig_col_name not in table_columns:
+        st.warning(f"⚠️ '{jig_col_name}' 컬럼을 찾을 수 없습니다. 'SNumber'를 사용합니다.")
+        jig_col_name = 'SNumber'
+
+    raw_date_col = get_stage_spec(tab_key)['date_col']
+    if raw_date_col not in table_columns:
+        st.error(f"❌ 날짜 컬럼 '{date_col}'을 찾을 수 없습니다.")
+        return
+
+    # PC 목록과 날짜 범위는 DB 버전마다 한 번 만든 카탈로그에서 가져옵니다.
+    catalog = get_stage_catalog(conn, tab_key, jig_col_name)
+    min_date, max_date = catalog_date_bounds(catalog)
+    pc_options = ['모든 PC'] + catalog_jigs(catalog)
+    selected_jig = st.selectbox("PC (Jig) 선택", pc_options, key=f"pc_select_{tab_key}")
+
+    if min_date is None:
+        min_date = max_date = date.today()
+
+    selected_dates = st.date_input("날짜 범위 선택", value=(min_date, max_date), key=f"dates_{tab_key}")
+    analysis_modes = {'자동': 'auto', '메모리(pandas)': 'pandas', 'SQL 집계': 'sql'}
+    mode = analysis_modes[st.radio("분석 방식", list(analysis_modes), horizontal=True, key=f"analysis_mode_{tab_key}",
+                                   help="자동: 일일 집계를 우선 사용하고, 대상 행이 많으면 SQL 집계를 사용합니다.")]
+    estimated_rows = None
+    if len(selected_dates) == 2:
+        estimated_rows = estimate_catalog_rows(catalog, selected_dates[0], selected_dates[1],
+                                               selected_jig if selected_jig != '모든 PC' else None)
+        if estimated_rows is not None:
+            st.caption(f"예상 분석 대상: 약 {estimated_rows:,}행")
+
+    if st.button("분석 실행", key=f"analyze_{tab_key}"):
+        with st.spinner("데이터 분석 및 저장 중..."), span('analysis', mode=mode) as analysis_span, \
+                profile_block(consume_profile_request()):
+            if len(selected_dates) == 2:
+                start_date, end_date = selected_dates
+                jig = selected_jig if selected_jig != '모든 PC' else None
+                analysis_query = dict(date_col=date_col, jig_col=jig_col_name, start_date=start_date,
+                                      end_date=end_date, jig=jig)
+                try:
+                    stage_analysis = run_stage_analysis(conn, tab_key, **analysis_query, mode=mode,
+                                                        estimated_rows=estimated_rows, dataset=get_shared_dataset())
+                    for message in stage_analysis.warnings:
+                        st.warning(f"⚠️ {message}")
+                    analysis_data, df_filtered = stage_analysis.result, stage_analysis.rows
+                    analysis_span.set(source=stage_analysis.source)
+                except Exception as e:
+                    st.error(f"'{tab_key}' 데이터를 분석하는 중 오류가 발생했습니다: {e}")
+                    df_filtered = pd.DataFrame()
+                    analysis_data = analyze_data(df_filtered, date_col, jig_col_name, get_stage_spec(tab_key)['pass_col'])
+            else:
+                st.warning("날짜 범위를 올바르게 선택해주세요.")
+                df_filtered = pd.DataFrame()
+                analysis_data = analyze_data(df_filtered, date_col, jig_col_name, get_stage_spec(tab_key)['pass_col'])
+                analysis_query = None
+
+            store_analysis(tab_key, analysis_data, df_filtered, analysis_query)
+        st.success("분석 완료! 결과가 저장되었습니다.")
+
+    if st.session_state.analysis_status[tab_key]['analyzed']:
+        with span('display_analysis_result'):
+            display_analysis_result(tab_key, header, selected_jig=selected_jig if selected_jig != '모든 PC' else None)
+
+    st.markdown("---")
+    st.markdown(f"#### {header.split()[1]} 데이터 조회")
+    display_data_views(tab_key, conn)
+
+def display_all_stage_analysis(conn, tab_info):
+    """
+    모든 Stage를 같은 날짜 구간으로 한 번에 분석합니다. Stage마다 작업 프로세스 하나가 동시에 분석하므로
+    전체 시간은 가장 오래 걸리는 Stage에 가깝습니다. 결과는 탭별 분석 결과로 저장되고, 원본 행은 조회할 때 읽습니다.
+    Args:
+        conn: SQLite 연결.
+        tab_info (dict): {탭 키: {'header': ..., 'date_col': ...}}.
+    """
+    with st.expander("전체 Stage 한 번에 분석", expanded=False):
+        table_columns = get_table_columns(conn)
+        jobs = {}
+        bounds = []
+        for tab_key, info in tab_info.items():
+            if get_stage_spec(tab_key)['date_col'] not in table_columns:
+                continue
+            jig_col = st.session_state.jig_col_mapping[tab_key]
+            if jig_col not in table_columns:
+                jig_col = 'SNumber'
+            catalog = get_stage_catalog(conn, tab_key, jig_col)
+            bounds.extend(bound for bound in catalog_date_bounds(catalog) if bound is not None)
+            jobs[tab_key] = dict(stage=tab_key, date_col=info['date_col'], jig_col=jig_col, catalog=catalog)
+        if not jobs:
+            st.warning("분석할 수 있는 Stage가 없습니다.")
+            return
+
+        min_date, max_date = (min(bounds), max(bounds)) if bounds else (date.today(), date.today())
+        selected_dates = st.date_input("날짜 범위 선택", value=(min_date, max_date), key='dates_all')
+        if not st.button("전체 Stage 분석 실행", key='analyze_all'):
+            return
+        if len(selected_dates) != 2:
+            st.warning("날짜 범위를 올바르게 선택해주세요.")
+            return
+
+        start_date, end_date = selected_dates
+        for job in jobs.values():
+            job['estimated_rows'] = estimate_catalog_rows(job.pop('catalog'), start_date, end_date, None)
+            job.update(start_date=start_date, end_date=end_date)
+        with st.spinner("모든 Stage를 동시에 분석하는 중..."), span('analyze_all_stages', stages=len(jobs)):
+            results = analyze_stages_parallel(database_path(conn), jobs)
+
+        for tab_key, outcome in results.items():
+            if isinstance(outcome, Exception):
+                st.error(f"❌ '{tab_key}' 분석 중 오류가 발생했습니다: {outcome}")
+                continue
+            for message in outcome.warnings:
+                st.warning(f"⚠️ [{tab_key}] {message}")
+            job = jobs[tab_key]
+            analysis_query = dict(date_col=job['date_col'], jig_col=job['jig_col'], start_date=start_date,
+                                  end_date=end_date, jig=None)
+            store_analysis(tab_key, outcome.result, None, analysis_query)
+        done = [tab_key for tab_key, outcome in results.items() if not isinstance(outcome, Exception)]
+        if done:
+            st.success(f"분석 완료: {', '.join(done)}. 각 탭에서 결과를 확인하세요.")
+
+@st.fragment
+def display_stage_fragment(conn, tab_key, header, date_col, jig_col_name):
+    """
+    display_stage_tab()을 fragment로 그립니다. 탭 안의 위젯을 조작하면 이 탭만 다시 실행됩니다.
+    fragment만 다시 실행될 때는 따로 측정 기록(debug_trace)을 남깁니다.
+    """
+    with debug_trace(f"탭 {tab_key}"):
+        display_stage_tab(conn, tab_key, header, date_col, jig_col_name)
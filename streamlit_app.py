@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date
 import warnings
 import sys
 import os
@@ -22,9 +21,9 @@ modules_loaded = False
 
 # 프로젝트 내부 모듈을 import 합니다.
 try:
-    from db.db_utils import get_connection, read_data_from_db
-    from services.analysis_service import analyze_data
-    from utils.ui_helpers import display_analysis_result, display_data_views
+    from src.db.db_utils import get_connection, get_shared_dataset, render_database_refresh
+    from src.utils.ui_helpers import display_stage_fragment, display_all_stage_analysis
+    from src.utils.debug_panel import debug_trace, render_debug_panel
     modules_loaded = True
 except (ImportError, ModuleNotFoundError) as e:
     st.error(f"❌ 모듈 로드 실패: {e}")
@@ -94,31 +93,9 @@ def main():
         st.stop()
 
     st.success("✅ 데이터베이스 연결 성공!")
-    
-    st.info("🔄 데이터를 불러오고 있습니다...")
-    try:
-        df_all_data = read_data_from_db(conn, 'historyinspection')
-        if df_all_data is None or df_all_data.empty:
-            st.error("❌ 'historyinspection' 테이블에서 데이터를 불러오지 못했습니다.")
-            st.stop()
-        st.success(f"✅ 'historyinspection' 테이블 로드 완료! (총 {len(df_all_data):,}개 레코드)")
-    except Exception as e:
-        st.error(f"❌ 데이터베이스 조회 중 오류: {e}")
-        st.stop()
-
-    st.info("🔄 날짜 컬럼을 변환하고 있습니다...")
-    try:
-        df_all_data['PcbStartTime_dt'] = pd.to_datetime(df_all_data['PcbStartTime'], errors='coerce')
-        df_all_data['FwStamp_dt'] = pd.to_datetime(df_all_data['FwStamp'], errors='coerce')
-        df_all_data['RfTxStamp_dt'] = pd.to_datetime(df_all_data['RfTxStamp'], errors='coerce')
-        df_all_data['SemiAssyStartTime_dt'] = pd.to_datetime(df_all_data['SemiAssyStartTime'], errors='coerce')
-        df_all_data['BatadcStamp_dt'] = pd.to_datetime(df_all_data['BatadcStamp'], errors='coerce')
-        st.success("✅ 날짜 컬럼 변환 완료")
-    except KeyError as e:
-        st.error(f"❌ 날짜 컬럼을 찾을 수 없습니다: {e}")
-        st.info("데이터베이스의 실제 컬럼명을 확인하고 코드를 수정해주세요.")
-        st.write("현재 데이터베이스 컬럼:", list(df_all_data.columns))
-        st.stop()
+    # 모든 세션이 공유하는 데이터셋은 DB 버전당 한 번만 읽습니다.
+    get_shared_dataset()
+    render_database_refresh()
 
     tab_info = {
         'pcb': {'header': "파일 PCB (Pcb_Process)", 'date_col': 'PcbStartTime_dt'},
@@ -128,65 +105,18 @@ def main():
         'func': {'header': "파일 Func (Func_Process)", 'date_col': 'BatadcStamp_dt'}
     }
 
-    tabs = st.tabs(list(tab_info.keys()))
+    display_all_stage_analysis(conn, tab_info)
+
+    # 탭을 바꿀 때만 앱 전체를 다시 실행하고, 선택된 탭의 내용만 그립니다.
+    tabs = st.tabs(list(tab_info.keys()), key='active_tab', on_change='rerun')
 
     for i, tab_key in enumerate(tab_info.keys()):
+        if not tabs[i].open:
+            continue
         with tabs[i]:
-            st.header(tab_info[tab_key]['header'])
-
             try:
-                jig_col_name = st.session_state.jig_col_mapping[tab_key]
-                if jig_col_name not in df_all_data.columns:
-                    st.warning(f"⚠️ '{jig_col_name}' 컬럼을 찾을 수 없습니다. 'SNumber'를 사용합니다.")
-                    jig_col_name = 'SNumber'
-                
-                unique_jigs = df_all_data[jig_col_name].dropna().unique()
-                pc_options = ['모든 PC'] + sorted(list(unique_jigs))
-                selected_jig = st.selectbox("PC (Jig) 선택", pc_options, key=f"pc_select_{tab_key}")
-
-                date_col = tab_info[tab_key]['date_col']
-                if date_col not in df_all_data.columns:
-                    st.error(f"❌ 날짜 컬럼 '{date_col}'을 찾을 수 없습니다.")
-                    continue
-                
-                df_dates = df_all_data[date_col].dt.date.dropna()
-                if not df_dates.empty:
-                    min_date = df_dates.min()
-                    max_date = df_dates.max()
-                else:
-                    min_date = max_date = date.today()
-                
-                selected_dates = st.date_input("날짜 범위 선택", value=(min_date, max_date), key=f"dates_{tab_key}")
-                
-                if st.button("분석 실행", key=f"analyze_{tab_key}"):
-                    with st.spinner("데이터 분석 및 저장 중..."):
-                        if len(selected_dates) == 2:
-                            start_date, end_date = selected_dates
-                            df_filtered = df_all_data[
-                                (df_all_data[date_col].dt.date >= start_date) &
-                                (df_all_data[date_col].dt.date <= end_date)
-                            ].copy()
-                            if selected_jig != '모든 PC':
-                                df_filtered = df_filtered[df_filtered[jig_col_name] == selected_jig].copy()
-                        else:
-                            st.warning("날짜 범위를 올바르게 선택해주세요.")
-                            df_filtered = pd.DataFrame()
-                        
-                        st.session_state.analysis_results[tab_key] = df_filtered
-                        st.session_state.analysis_data[tab_key] = analyze_data(df_filtered, date_col, jig_col_name)
-                        st.session_state.analysis_time[tab_key] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        st.session_state.analysis_status[tab_key]['analyzed'] = True
-                    st.success("분석 완료! 결과가 저장되었습니다.")
-
-                if st.session_state.analysis_status[tab_key]['analyzed']:
-                    display_analysis_result(tab_key, tab_info[tab_key]['header'], date_col,
-                                            selected_jig=selected_jig if selected_jig != '모든 PC' else None,
-                                            used_jig_col=st.session_state.analysis_data[tab_key][2])
-                
-                st.markdown("---")
-                st.markdown(f"#### {tab_info[tab_key]['header'].split()[1]} 데이터 조회")
-                display_data_views(tab_key, df_all_data)
-                
+                display_stage_fragment(conn, tab_key, tab_info[tab_key]['header'], tab_info[tab_key]['date_col'],
+                                  st.session_state.jig_col_mapping[tab_key])
             except Exception as e:
                 st.error(f"❌ 탭 '{tab_key}' 처리 중 오류: {e}")
                 st.info("이 탭은 건너뛰고 다른 탭을 사용해보세요.")
@@ -196,7 +126,10 @@ def main():
             
 if __name__ == "__main__":
     try:
-        main()
+        # 실행 한 번의 구간별 시간을 기록하고, 끝난 뒤 사이드바 디버그 패널에 보여 줍니다.
+        with debug_trace("앱 실행"):
+            main()
+        render_debug_panel()
     except Exception as e:
         st.error(f"❌ 앱 실행 중 치명적 오류 발생: {e}")
         st.info("개발자에게 문의하거나 로그를 확인해주세요.")
\ No newline at end of file
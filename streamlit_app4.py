@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date
 import warnings
 import sys
 import os
@@ -14,9 +13,9 @@ if project_root not in sys.path:
 
 # 프로젝트 내부 모듈을 import 합니다.
 try:
-    from src.db.db_utils import get_connection
-    from src.services.analysis_service import analyze_data
-    from src.utils.ui_helpers import display_analysis_result, display_data_views
+    from src.db.db_utils import get_connection, get_shared_dataset, render_database_refresh
+    from src.utils.ui_helpers import display_stage_fragment, display_all_stage_analysis
+    from src.utils.debug_panel import debug_trace, render_debug_panel
 except ImportError as e:
     st.error(f"오류: 필요한 모듈을 찾을 수 없습니다. 파일 경로를 확인해주세요.")
     st.error(f"상세 오류: {e}")
@@ -76,19 +75,10 @@ def main():
     conn = get_connection()
     if conn is None:
         return
+    # 모든 세션이 공유하는 데이터셋은 DB 버전당 한 번만 읽습니다.
+    get_shared_dataset()
+    render_database_refresh()
         
-    try:
-        df_all_data = pd.read_sql_query("SELECT * FROM historyinspection;", conn)
-    except Exception as e:
-        st.error(f"데이터베이스에서 'historyinspection' 테이블을 불러오는 중 오류가 발생했습니다: {e}")
-        return
-
-    df_all_data['PcbStartTime_dt'] = pd.to_datetime(df_all_data['PcbStartTime'], errors='coerce')
-    df_all_data['FwStamp_dt'] = pd.to_datetime(df_all_data['FwStamp'], errors='coerce')
-    df_all_data['RfTxStamp_dt'] = pd.to_datetime(df_all_data['RfTxStamp'], errors='coerce')
-    df_all_data['SemiAssyStartTime_dt'] = pd.to_datetime(df_all_data['SemiAssyStartTime'], errors='coerce')
-    df_all_data['BatadcStamp_dt'] = pd.to_datetime(df_all_data['BatadcStamp'], errors='coerce')
-
     tab_info = {
         'pcb': {'header': "파일 PCB (Pcb_Process)", 'date_col': 'PcbStartTime_dt'},
         'fw': {'header': "파일 Fw (Fw_Process)", 'date_col': 'FwStamp_dt'},
@@ -97,59 +87,23 @@ def main():
         'func': {'header': "파일 Func (Func_Process)", 'date_col': 'BatadcStamp_dt'}
     }
 
-    tabs = st.tabs(list(tab_info.keys()))
+    display_all_stage_analysis(conn, tab_info)
+
+    # 탭을 바꿀 때만 앱 전체를 다시 실행하고, 선택된 탭의 내용만 그립니다.
+    tabs = st.tabs(list(tab_info.keys()), key='active_tab', on_change='rerun')
 
     for i, tab_key in enumerate(tab_info.keys()):
+        if not tabs[i].open:
+            continue
         with tabs[i]:
-            st.header(tab_info[tab_key]['header'])
-
-            jig_col_name = st.session_state.jig_col_mapping[tab_key]
-            
-            # DataFrame에 해당 컬럼이 있는지 확인하고 없을 경우 'SNumber'를 사용
-            if jig_col_name not in df_all_data.columns:
-                jig_col_name = 'SNumber'
-                st.warning(f"'{st.session_state.jig_col_mapping[tab_key]}' 컬럼이 없어 'SNumber'로 대체합니다.")
-            
-            unique_jigs = df_all_data[jig_col_name].dropna().unique()
-            pc_options = ['모든 PC'] + sorted(list(unique_jigs))
-            selected_jig = st.selectbox("PC (Jig) 선택", pc_options, key=f"pc_select_{tab_key}")
-
-            df_dates = df_all_data[tab_info[tab_key]['date_col']].dt.date.dropna()
-            min_date = df_dates.min() if not df_dates.empty else date.today()
-            max_date = df_dates.max() if not df_dates.dropna().empty else date.today()
-            selected_dates = st.date_input("날짜 범위 선택", value=(min_date, max_date), key=f"dates_{tab_key}")
-            
-            if st.button("분석 실행", key=f"analyze_{tab_key}"):
-                with st.spinner("데이터 분석 및 저장 중..."):
-                    if len(selected_dates) == 2:
-                        start_date, end_date = selected_dates
-                        df_filtered = df_all_data[
-                            (df_all_data[tab_info[tab_key]['date_col']].dt.date >= start_date) &
-                            (df_all_data[tab_info[tab_key]['date_col']].dt.date <= end_date)
-                        ].copy()
-                        if selected_jig != '모든 PC':
-                            df_filtered = df_filtered[df_filtered[jig_col_name] == selected_jig].copy()
-                    else:
-                        st.warning("날짜 범위를 올바르게 선택해주세요.")
-                        df_filtered = pd.DataFrame()
-                    
-                    st.session_state.analysis_results[tab_key] = df_filtered
-                    st.session_state.analysis_data[tab_key] = analyze_data(df_filtered, tab_info[tab_key]['date_col'], jig_col_name)
-                    st.session_state.analysis_time[tab_key] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    st.session_state.analysis_status[tab_key]['analyzed'] = True
-                st.success("분석 완료! 결과가 저장되었습니다.")
-
-            if st.session_state.analysis_status[tab_key]['analyzed']:
-                display_analysis_result(tab_key, tab_info[tab_key]['header'], tab_info[tab_key]['date_col'],
-                                        selected_jig=selected_jig if selected_jig != '모든 PC' else None,
-                                        used_jig_col=st.session_state.analysis_data[tab_key][2])
-            
-            st.markdown("---")
-            st.markdown(f"#### {tab_info[tab_key]['header'].split()[1]} 데이터 조회")
-            display_data_views(tab_key, df_all_data)
+            display_stage_fragment(conn, tab_key, tab_info[tab_key]['header'], tab_info[tab_key]['date_col'],
+                              st.session_state.jig_col_mapping[tab_key])
 
     st.markdown("---")
     st.markdown("<p style='text-align:center'>Copyright © 2024</p>", unsafe_allow_html=True)
             
 if __name__ == "__main__":
-    main()
+    # 실행 한 번의 구간별 시간을 기록하고, 끝난 뒤 사이드바 디버그 패널에 보여 줍니다.
+    with debug_trace("앱 실행"):
+        main()
+    render_debug_panel()
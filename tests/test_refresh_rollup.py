@@ -0,0 +1,59 @@
+import sqlite3
+from datetime import date
+
+from src.bench.synthetic import write_history_db
+from src.db.index_utils import ensure_indexes, get_meta
+from src.db.query_utils import HISTORY_TABLE, serial_index_table
+from src.db.refresh_utils import apply_delta, get_watermark
+from src.db.rollup_utils import refresh_rollup, load_rollup_analysis
+from src.services.analysis_service import analyze_data
+from src.services.stage_analysis import load_stage_rows
+
+STAGE, DATE_COL, JIG_COL = 'fw', 'FwStamp_dt', 'FwPC'
+START, END = date(2024, 3, 1), date(2024, 3, 30)
+
+
+def _write_delta(path, rows):
+    delta = sqlite3.connect(path)
+    delta.execute(f"CREATE TABLE {HISTORY_TABLE} (SNumber TEXT, FwStamp TEXT, FwPC TEXT, FwPass TEXT)")
+    delta.executemany(f"INSERT INTO {HISTORY_TABLE} (rowid, SNumber, FwStamp, FwPC, FwPass) VALUES (?, ?, ?, ?, ?)", rows)
+    delta.commit()
+    delta.close()
+
+
+def test_delta_replacing_old_row_refreshes_rollup_and_serial_index(tmp_path):
+    db_path = str(tmp_path / 'history.sqlite3')
+    write_history_db(db_path, 2000, chunk_rows=1000)
+    conn = sqlite3.connect(db_path)
+    ensure_indexes(conn)
+    refresh_rollup(conn, STAGE, JIG_COL)
+
+    # 첫날의 행 하나를 다른 시리얼/합격 여부로 바꿉니다. 새 행이 없으므로 워터마크는 그대로입니다.
+    rowid, old_serial, stamp, jig, passed = conn.execute(
+        f"SELECT rowid, SNumber, FwStamp, FwPC, FwPass FROM {HISTORY_TABLE} "
+        f"WHERE FwStamp IS NOT NULL AND SNumber IN "
+        f"(SELECT SNumber FROM {HISTORY_TABLE} GROUP BY SNumber HAVING COUNT(*) = 1) ORDER BY rowid LIMIT 1"
+    ).fetchone()
+    watermark = get_watermark(conn)
+    delta_path = str(tmp_path / 'delta.sqlite3')
+    _write_delta(delta_path, [
+        (rowid, 'SNREPLACED', stamp, jig, 'X' if passed == 'O' else 'O'),
+    ])
+
+    rows_before = conn.execute(f"SELECT COUNT(*) FROM {HISTORY_TABLE}").fetchone()[0]
+    assert apply_delta(conn, delta_path, watermark) == 1
+    assert conn.execute(f"SELECT COUNT(*) FROM {HISTORY_TABLE}").fetchone()[0] == rows_before
+    assert int(get_meta(conn, 'delta_seq')) == 1
+
+    serial_table = serial_index_table()
+    serials = {row[0] for row in conn.execute(f"SELECT SNumber FROM {serial_table}")}
+    assert 'SNREPLACED' in serials
+    assert old_serial not in serials
+
+    assert refresh_rollup(conn, STAGE, JIG_COL) > 0
+    rollup = load_rollup_analysis(conn, STAGE, START, END, jig_col=JIG_COL)
+    rows = load_stage_rows(conn, STAGE, DATE_COL, JIG_COL, START, END)
+    expected = analyze_data(rows, DATE_COL, JIG_COL, 'FwPass')
+    assert rollup.summary == expected.summary
+    assert rollup.serials == expected.serials
+    conn.close()